@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+H-1B LCA ingest benchmark
+Generates synthetic disclosure workbooks (lca_synth) at each --sizes row
+count, then runs the h1b-lca.py stages on each in a fresh process:
+
+  parse      stream the projected columns out of the file (and encode them,
+             as a cold run does for the cache); --format csv/tsv/csv.gz
+             benchmarks the delimited reader instead of the xlsx one
+  aggregate  aggregate_rows() over the rows (--engine vectorized: the NumPy
+             group-bys, which also cover rollup and build)
+  rollup     national_rollup()
+  build      build_rows()
+  upload     SupabaseClient.upsert() against a local stub PostgREST
+             endpoint (in its own process; --stub-latency adds a delay)
+
+and reports seconds, rows/s and peak RSS per stage. Peak RSS is the
+stage's own high-water mark on Linux (VmHWM is reset between stages);
+elsewhere it is the process peak so far.
+
+Usage: python3 scripts/ingest/bench-h1b-lca.py [--sizes 100k,1M,5M] [--json out.json]
+                                               [--baseline prev.json [--tolerance 0.15]]
+
+Generated files are kept under --data-dir and reused while the generator
+options match. With --baseline, any stage more than --tolerance slower
+(rows/s) or bigger (peak RSS) than the baseline run is listed and the
+exit status is 1.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import lca_synth
+from ingest_metrics import reset_peak_rss, peak_rss
+
+FISCAL_YEAR = 'FY2025'
+# Stages faster than this in both runs are too noisy to compare by rate
+NOISE_FLOOR = 0.2
+
+
+# ── Stub endpoint ─────────────────────────────────────
+class StubHandler(BaseHTTPRequestHandler):
+    """Accepts every PostgREST write; reads return an empty result."""
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b''):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply(200, b'[]')
+
+    def do_POST(self):
+        self.reply(201)
+
+    def do_PATCH(self):
+        self.reply(204)
+
+    def do_DELETE(self):
+        self.reply(204)
+
+
+def run_stub(port_out, latency):
+    StubHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    port_out.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_stub(latency=0.0):
+    """Start the stub endpoint in its own process. Returns (process, base URL)."""
+    ports = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=run_stub, args=(ports, latency), daemon=True)
+    proc.start()
+    return proc, f'http://127.0.0.1:{ports.get(timeout=10)}'
+
+
+# ── One benchmark run (child process) ─────────────────
+def run_stages(file_path, url, engine, concurrency, batch_kb):
+    """Time each stage on one file. Returns [{'stage', 'seconds', 'rows', 'peak_rss', 'peak_is_stage'}]."""
+    from lca_aggregate import project_columns, aggregate_rows, national_rollup, build_rows
+    from lca_cache import ColumnBuilder
+    from supabase_rest import SupabaseClient
+    from delimited_stream import open_reader
+
+    stages = []
+    per_stage = reset_peak_rss()
+
+    def stage(name, fn, rows_of):
+        reset_peak_rss()
+        start = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - start
+        stages.append({'stage': name, 'seconds': seconds, 'rows': rows_of(result),
+                       'peak_rss': peak_rss(), 'peak_is_stage': per_stage})
+        return result
+
+    def parse():
+        with open_reader(file_path) as reader:
+            col = {h: i for i, h in enumerate(reader.headers()) if h}
+            columns = ColumnBuilder(len(project_columns(col, reader.width)))
+            for row in reader.iter_columns(project_columns(col, reader.width)):
+                columns.add(row)
+        return columns
+
+    columns = stage('parse', parse, lambda c: c.row_count)
+    if engine == 'vectorized':
+        import lca_vectorized
+        state_rows, nat_rows, _, _ = stage('aggregate', lambda: lca_vectorized.build_rows(
+            columns.values, columns.codes, FISCAL_YEAR), lambda _: columns.row_count)
+    else:
+        agg, _ = stage('aggregate', lambda: aggregate_rows(columns.rows()), lambda r: r[1])
+        nat = stage('rollup', lambda: national_rollup(agg), lambda _: len(agg))
+        state_rows, nat_rows = stage('build', lambda: build_rows(agg, FISCAL_YEAR, nat), lambda _: len(agg))
+
+    def upload():
+        with SupabaseClient(url, 'bench', concurrency=concurrency) as client:
+            return client.upsert('intel_h1b_demand', state_rows + nat_rows, batch_bytes=batch_kb * 1024)
+
+    report = stage('upload', upload, lambda r: r.rows_sent)
+    if report.failed:
+        raise RuntimeError(f'stub upload failed:\n{report.summary()}')
+    return stages
+
+
+# ── Reporting ─────────────────────────────────────────
+def fmt_rows(n):
+    return f'{n / 1e6:g}M' if n >= 1000000 else f'{n / 1000:g}k' if n >= 1000 else str(n)
+
+
+def print_table(results):
+    print(f"\n{'rows':>6}  {'stage':<10} {'seconds':>8} {'rows/s':>12} {'peak RSS':>10}")
+    for size, stages in results.items():
+        for s in stages:
+            rate = s['rows'] / s['seconds'] if s['seconds'] else 0
+            print(f"{fmt_rows(int(size)):>6}  {s['stage']:<10} {s['seconds']:>8.2f} {rate:>12,.0f} "
+                  f"{s['peak_rss'] / 2**20:>8,.0f}MB")
+
+
+def regressions(results, baseline, tolerance):
+    """Stages slower or bigger than the baseline by more than tolerance."""
+    found = []
+    for size, stages in results.items():
+        before = {s['stage']: s for s in baseline.get(size, [])}
+        for s in stages:
+            b = before.get(s['stage'])
+            if not b or not b['seconds'] or not s['seconds']:
+                continue
+            old, new = b['rows'] / b['seconds'], s['rows'] / s['seconds']
+            if new < old * (1 - tolerance) and max(b['seconds'], s['seconds']) >= NOISE_FLOOR:
+                found.append(f"{fmt_rows(int(size))} {s['stage']}: {new:,.0f} rows/s vs {old:,.0f}")
+            if s['peak_rss'] > b['peak_rss'] * (1 + tolerance):
+                found.append(f"{fmt_rows(int(size))} {s['stage']}: peak RSS {s['peak_rss'] / 2**20:,.0f}MB "
+                             f"vs {b['peak_rss'] / 2**20:,.0f}MB")
+    return found
+
+
+def data_path(data_dir, rows, options, fmt='xlsx'):
+    tag = lca_synth.cache_tag(options)
+    return os.path.join(data_dir, f'LCA_Disclosure_Data_FY{options["fiscal_year"]}_Q{options["quarter"]}'
+                                  f'_synthetic_{fmt_rows(rows)}_{tag}.{fmt}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the h1b-lca.py ingest stages on synthetic data')
+    parser.add_argument('--sizes', default='100k,1M,5M', help='row counts to run (default: 100k,1M,5M)')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'h1b-lca-bench'),
+                        help='where generated files are kept between runs')
+    parser.add_argument('--engine', choices=['rows', 'vectorized'], default='rows')
+    parser.add_argument('--format', choices=['xlsx', 'csv', 'tsv', 'csv.gz', 'tsv.gz'], default='xlsx',
+                        help='input file format to generate and parse (default: xlsx)')
+    parser.add_argument('--concurrency', type=int, default=4, help='upload batches in flight (default: 4)')
+    parser.add_argument('--batch-kb', type=int, default=512, help='upload batch size in KB (default: 512)')
+    parser.add_argument('--stub-latency', type=float, default=0.0, metavar='MS',
+                        help='delay added by the stub endpoint to every request, in ms (default: 0)')
+    parser.add_argument('--json', metavar='PATH', help='write the results as JSON')
+    parser.add_argument('--baseline', metavar='PATH', help='JSON from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='allowed slowdown / RSS growth against --baseline (default: 0.15)')
+    parser.add_argument('--run-one', nargs=3, metavar=('FILE', 'URL', 'OUT'), help=argparse.SUPPRESS)
+    lca_synth.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.run_one:
+        file_path, url, out = args.run_one
+        stages = run_stages(file_path, url, args.engine, args.concurrency, args.batch_kb)
+        with open(out, 'w') as f:
+            json.dump(stages, f)
+        return
+
+    sizes = [lca_synth.parse_count(s) for s in args.sizes.split(',')]
+    options = lca_synth.generator_options(args)
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    files = {}
+    for rows in sizes:
+        path = data_path(args.data_dir, rows, options, args.format)
+        if not os.path.exists(path):
+            print(f"🧪 Generating {rows:,} rows → {path}")
+            start = time.perf_counter()
+            lca_synth.generate(path, rows, **options)
+            print(f"   {os.path.getsize(path) / 1e6:,.1f} MB in {time.perf_counter() - start:.1f}s")
+        files[rows] = path
+
+    stub, url = start_stub(args.stub_latency / 1000)
+    results = {}
+    try:
+        for rows, path in files.items():
+            print(f"⏱  {fmt_rows(rows)} rows ({args.format}, {args.engine} engine)...")
+            with tempfile.NamedTemporaryFile(suffix='.json') as out:
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--engine', args.engine,
+                                '--concurrency', str(args.concurrency), '--batch-kb', str(args.batch_kb),
+                                '--run-one', path, url, out.name],
+                               check=True, stdout=subprocess.DEVNULL)
+                with open(out.name) as f:
+                    results[str(rows)] = json.load(f)
+    finally:
+        stub.terminate()
+
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+                'engine': args.engine,
+                'format': args.format,
+                'generator': options,
+                'results': results,
+            }, f, indent=1)
+        print(f"\n💾 Results → {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f)['results'], args.tolerance)
+        if found:
+            print(f"\n✗ {len(found)} regressions beyond {args.tolerance:.0%} of {args.baseline}:")
+            for line in found:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✓ Within {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Column-projected streaming CSV/TSV reader (stdlib only)
+Same interface as xlsx_stream.XlsxColumnReader, for disclosure data that
+comes (or has been converted once) as delimited text, optionally gzipped:
+
+    with open_reader(path) as reader:     # .xlsx, .csv, .tsv, .csv.gz, ...
+        headers = reader.headers()
+        col = {h: i for i, h in enumerate(headers) if h}
+        for soc, state in reader.iter_columns([col['SOC_CODE'], col['WORKSITE_STATE']]):
+            ...
+
+open_reader() picks the format from the file name, else from the first
+bytes (zip → xlsx, gzip → delimited); the delimiter comes from the name
+(.tsv/.tab → tab, .csv → comma), else from the header line.
+
+Every value is a str, with empty fields → None like missing xlsx cells.
+Rows are read with the csv module's C parser and projected with one
+itemgetter call, so a wide file costs little more than a narrow one.
+"""
+
+import os
+import csv
+import gzip
+from operator import itemgetter
+
+from xlsx_stream import XlsxColumnReader
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+DELIMITERS = (',', '\t', '|', ';')
+# Suffixes of the files a directory argument expands to
+SUFFIXES = ('.xlsx', '.csv', '.tsv', '.tab', '.csv.gz', '.tsv.gz', '.tab.gz')
+
+# DOL free-text columns can exceed the csv module's default 128 KB field limit
+csv.field_size_limit(1 << 30)
+
+
+def base_name(path):
+    """Lower-cased file name without a trailing .gz."""
+    name = os.path.basename(path).lower()
+    return name[:-3] if name.endswith('.gz') else name
+
+
+def is_gzip(path):
+    with open(path, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def detect_format(path):
+    """'xlsx' or 'delimited', from the file name (ignoring .gz), else from the first bytes."""
+    ext = os.path.splitext(base_name(path))[1]
+    if ext in ('.xlsx', '.xlsm'):
+        return 'xlsx'
+    if ext in ('.csv', '.tsv', '.tab'):
+        return 'delimited'
+    with open(path, 'rb') as f:
+        return 'xlsx' if f.read(4) == ZIP_MAGIC else 'delimited'
+
+
+def detect_delimiter(path):
+    """Tab for .tsv/.tab, comma for .csv, else the DELIMITERS character most frequent in the header line."""
+    ext = os.path.splitext(base_name(path))[1]
+    if ext in ('.tsv', '.tab'):
+        return '\t'
+    if ext == '.csv':
+        return ','
+    with open_text(path) as f:
+        line = f.readline()
+    return max(DELIMITERS, key=line.count)
+
+
+def open_text(path):
+    if is_gzip(path):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', errors='replace', newline='')
+    return open(path, encoding='utf-8-sig', errors='replace', newline='')
+
+
+def open_reader(path):
+    """XlsxColumnReader or DelimitedColumnReader for path, by detect_format()."""
+    if detect_format(path) == 'xlsx':
+        return XlsxColumnReader(path)
+    return DelimitedColumnReader(path)
+
+
+class DelimitedColumnReader:
+    # The row count isn't known without reading the whole file, so callers
+    # can't split it into row-range shards
+    max_row = None
+
+    def __init__(self, path, delimiter=None):
+        self.path = path
+        self.delimiter = delimiter or detect_delimiter(path)
+        self._header = None
+
+    def close(self):
+        pass  # every pass over the file opens and closes its own handle
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _records(self):
+        with open_text(self.path) as f:
+            yield from csv.reader(f, delimiter=self.delimiter)
+
+    @property
+    def width(self):
+        return len(self.headers())
+
+    def headers(self, row=1):
+        """All values of one row (default: the header row)."""
+        if row == 1 and self._header is not None:
+            return self._header
+        records = self._records()
+        for n, values in enumerate(records, 1):
+            if n == row:
+                records.close()
+                values = [v or None for v in values]
+                if row == 1:
+                    self._header = values
+                return values
+        return []
+
+    def iter_columns(self, indices, min_row=2, max_row=None):
+        """Yield a tuple of the given 0-based column indices (None → None) per row.
+
+        Row numbers count the header as row 1, like the xlsx reader; blank
+        lines are not yielded. Short rows are padded with None.
+        """
+        if all(i is None for i in indices):
+            return
+        # Missing columns (None) read a padding slot past the last column
+        width = self.width
+        slots = [width if i is None else i for i in indices]
+        need = max(slots) + 1
+        pad = [''] * need
+        get = itemgetter(*slots) if len(slots) > 1 else (lambda values: (values[slots[0]],))
+
+        records = self._records()
+        try:
+            for n, values in enumerate(records, 1):
+                if n < min_row:
+                    continue
+                if max_row is not None and n > max_row:
+                    return
+                if not values:
+                    continue
+                if len(values) < need:
+                    values += pad[len(values):]
+                yield tuple([v or None for v in get(values)])
+        finally:
+            records.close()
@@ -0,0 +1,19 @@
+"""
+File hashing shared by the ingest scripts
+SHA-256 of a file's bytes, read in chunks: keys the LCA column cache
+(lca_cache), the state-priorities document and SOC-matcher caches, and
+the rule fingerprints of state-priorities.py.
+"""
+
+import hashlib
+
+
+def file_digest(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            b = f.read(chunk)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
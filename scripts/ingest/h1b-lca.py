@@ -1,270 +1,688 @@
 #!/usr/bin/env python3
 """
 H-1B LCA Disclosure Data Ingestion
-Source: DOL OFLC disclosure xlsx (downloaded manually)
+Source: DOL OFLC disclosure xlsx, or a CSV/TSV (optionally gzipped) export of it (downloaded manually)
 Aggregates by SOC code + state → demand signals
 
-Usage: python3 scripts/ingest/h1b-lca.py [path-to-xlsx]
+Usage: python3 scripts/ingest/h1b-lca.py [path-to-xlsx-or-csv | dir ...] [--workers N]
 Default: ~/Downloads/LCA_Disclosure_Data_FY2025_Q4.xlsx
+
+Several files (or a directory) run in batch mode, one upload per fiscal
+year; see --help for every option. Option groups:
+
+  Parsing      --workers, --jobs, --fiscal-year (xlsx_stream, delimited_stream)
+  Caching      --cache-dir, --no-cache (lca_cache)
+  Aggregation  --engine, --topk-capacity, --normalize-employers (lca_aggregate, lca_vectorized)
+  Memory       --memory-budget, --spill-dir (lca_spill)
+  Breakdowns   --breakdown, --breakdown-dir: county/employer rows as JSON lines (lca_spill)
+  Upload       --concurrency, --batch-kb, --delta, --delete-stale (supabase_rest, row_delta)
+  Resume       --resume: re-send only unacknowledged rows (lca_checkpoint)
+  Output       --metrics-dir, --snapshot-dir, --no-snapshot (ingest_metrics, soc_snapshot)
+
+A run that leaves rows unloaded marks intel_data_freshness stale and exits
+with status 1.
 """
 
-import sys, os, json, statistics
-from collections import defaultdict
-from datetime import datetime
+import re, sys, os, json, argparse
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
 
-# Supabase via REST API (avoid Node dependency)
-import urllib.request
-import urllib.parse
+import lca_cache
+import lca_checkpoint
+import lca_spill
+import row_delta
+import ingest_metrics
+import soc_snapshot
+from lca_aggregate import LCA_COLUMNS, project_columns, build_rows, national_rollup, verify_top, top_error
+from lca_cache import ColumnBuilder
+from file_hash import file_digest
+from ingest_metrics import RunMetrics, http_stats
+from supabase_rest import SupabaseClient
+from xlsx_stream import XlsxColumnReader
+from delimited_stream import open_reader, SUFFIXES
 
-# Load env
+# Load env (variables already set in the environment win over .env.local)
 env = {}
 env_path = os.path.join(os.path.dirname(__file__), '../../.env.local')
-with open(env_path) as f:
-    for line in f:
-        line = line.strip()
-        if '=' in line and not line.startswith('#'):
-            k, v = line.split('=', 1)
-            env[k.strip()] = v.strip()
+if os.path.exists(env_path):
+    with open(env_path) as f:
+        for line in f:
+            line = line.strip()
+            if '=' in line and not line.startswith('#'):
+                k, v = line.split('=', 1)
+                env[k.strip()] = v.strip()
+env.update((k, os.environ[k]) for k in ('NEXT_PUBLIC_SUPABASE_URL', 'SUPABASE_SERVICE_ROLE_KEY') if k in os.environ)
 
 SUPABASE_URL = env['NEXT_PUBLIC_SUPABASE_URL']
 SUPABASE_KEY = env['SUPABASE_SERVICE_ROLE_KEY']
-FISCAL_YEAR = 'FY2025'
+FISCAL_YEAR = 'FY2025'  # when a file's fiscal year can't be inferred
+PERIOD_NAME = re.compile(r'FY[ _-]?(\d{4})(?:[ _-]?Q([1-4]))?', re.I)
+# Sampled to infer the fiscal year/quarter of a file whose name doesn't say
+DATE_COLUMNS = ('DECISION_DATE', 'RECEIVED_DATE')
+DEFAULT_FILE = os.path.expanduser('~/Downloads/LCA_Disclosure_Data_FY2025_Q4.xlsx')
+# Options a --resume run takes from the interrupted run rather than its own command line
+RESUMED_OPTIONS = ('delta', 'delete_stale', 'normalize_employers')
+# intel_h1b_demand's natural key, ordered for row_delta.delete_keys() (in.() on soc_code)
+DEMAND_KEY = ('fiscal_year', 'state', 'soc_code')
+
+def scan_shard(shard):
+    """Worker: scan one row range of the sheet. Returns (agg, row_count, columns)."""
+    file_path, indices, min_row, max_row, label, encode, aggregate, capacity, normalize, budget, spill_dir = shard
+    columns = ColumnBuilder(len(indices)) if encode else None
+    with XlsxColumnReader(file_path) as reader:
+        rows = reader.iter_columns(indices, min_row, max_row)
+        if encode:
+            rows = columns.tee(rows)
+        if aggregate:
+            agg, row_count = lca_spill.aggregate_rows(rows, budget, spill_dir, label=label, capacity=capacity,
+                                                      normalize_employers=normalize)
+            return agg, row_count, columns
+        for _ in rows:
+            pass
+    return None, 0, columns
+
+
+def shard_ranges(max_row, workers):
+    """Split data rows 2..max_row into contiguous row ranges, one per worker."""
+    n = max_row - 1
+    size = -(-n // workers)
+    return [(lo, min(lo + size - 1, max_row)) for lo in range(2, max_row + 1, size)]
+
+
+def print_columns(col):
+    print(f"Detected columns: SOC_CODE={col.get('SOC_CODE','?')}, CASE_STATUS={col.get('CASE_STATUS','?')}")
+    print(f"  WORKSITE_STATE={col.get('WORKSITE_STATE','?')}, EMPLOYER_NAME={col.get('EMPLOYER_NAME','?')}")
+    print(f"  PREVAILING_WAGE={col.get('PREVAILING_WAGE','?')}, WAGE_RATE_OF_PAY_FROM={col.get('WAGE_RATE_OF_PAY_FROM','?')}\n")
+
 
-def supabase_request(path, method='GET', data=None, params=None):
-    url = f"{SUPABASE_URL}/rest/v1/{path}"
-    if params:
-        url += '?' + urllib.parse.urlencode(params)
+def scan_workbook(file_path, workers, encode, aggregate=True, capacity=0, normalize_employers=False,
+                  budget=0, spill_dir=None, label='', metrics=None):
+    """Scan the input file (xlsx or delimited). Returns (col, agg, row_count, columns).
+
+    agg/row_count come from aggregate_rows() when aggregate (spilled to disk
+    past budget bytes, see lca_spill); columns is a ColumnBuilder of the
+    projected rows when encode (for the cache or the vectorized engine).
+    label prefixes progress lines (batch mode).
+    """
+    print(f"   {label}Streaming projected columns...\n")
+    metrics = metrics or RunMetrics(None)
+    scope = os.path.basename(file_path)
     
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'resolution=merge-duplicates' if method in ('POST',) else 'return=minimal',
-    }
+    with metrics.stage('file_open', scope):
+        reader = open_reader(file_path)
     
-    body = json.dumps(data).encode() if data else None
-    req = urllib.request.Request(url, data=body, headers=headers, method=method)
+    with metrics.stage('header_detection', scope):
+        # Get headers
+        headers = reader.headers()
+        
+        # Build column index
+        col = {h: i for i, h in enumerate(headers) if h}
+        indices = project_columns(col, reader.width)
+    if not label:
+        print_columns(col)
     
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return json.loads(resp.read()) if resp.read() else None
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode()
-        print(f"  ✗ Supabase error: {e.code} {error_body[:200]}")
-        return None
-
-def supabase_upsert(table, rows):
-    """Upsert via POST with Prefer: resolution=merge-duplicates"""
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'resolution=merge-duplicates',
-    }
-    body = json.dumps(rows).encode()
-    req = urllib.request.Request(url, data=body, headers=headers, method='POST')
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return True
-    except urllib.error.HTTPError as e:
-        print(f"  ✗ Upsert error: {e.code} {e.read().decode()[:200]}")
-        return False
+    # max_row comes from the sheet's <dimension>; without it (or for a
+    # delimited file) we can't shard
+    max_row = reader.max_row
+    if workers > 1 and not max_row:
+        print("  ⚠ Row count not known up front (no sheet dimension record, or a delimited file); "
+              "falling back to serial scan\n")
+        workers = 1
+    
+    if workers > 1 and max_row > 2:
+        reader.close()
+        shards = [(file_path, indices, lo, hi, f'[rows {lo:,}-{hi:,}] ', encode, aggregate, capacity,
+                   normalize_employers, budget, spill_dir)
+                  for lo, hi in shard_ranges(max_row, workers)]
+        print(f"   Scanning {max_row - 1:,} rows in {len(shards)} shards across {workers} processes...\n")
+        # Shards come back in row order, so the merge keeps first-seen titles,
+        # key order and top-N tie order identical to the serial scan.
+        with metrics.stage('row_loop', scope) as stage:
+            stage['shards'] = len(shards)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(scan_shard, shards))
+            agg = lca_spill.merge_parts((part for part, _, _ in results), budget, spill_dir) if aggregate else None
+            row_count = sum(n for _, n, _ in results)
+            columns = None
+            if encode:
+                columns = results[0][2]
+                for _, _, part in results[1:]:
+                    columns.extend(part)
+            stage['rows'] = columns.row_count if columns else row_count
+    else:
+        with metrics.stage('row_loop', scope) as stage:
+            agg, row_count, columns = None, 0, None
+            rows = reader.iter_columns(indices)
+            if encode:
+                columns = ColumnBuilder(len(indices))
+                rows = columns.tee(rows)
+            if aggregate:
+                agg, row_count = lca_spill.aggregate_rows(rows, budget, spill_dir, label=label, capacity=capacity,
+                                                          normalize_employers=normalize_employers)
+            else:
+                for _ in rows:
+                    pass
+            reader.close()
+            stage['rows'] = columns.row_count if columns else row_count
+    
+    return col, agg, row_count, columns
 
-def main():
-    import openpyxl
+
+def rescan_rows(file_path, col):
+    """Projected rows streamed from the file again (when nothing was encoded)."""
+    with open_reader(file_path) as reader:
+        yield from reader.iter_columns(project_columns(col, reader.width))
+
+
+def file_rows(file_path, col, columns, args):
+    """Projected rows of one file again, for the top-K recount: encoded columns, cache, else the file."""
+    if columns is None and not args.no_cache:
+        columns = lca_cache.load(args.cache_dir, lca_cache.cache_key(file_digest(file_path), LCA_COLUMNS))
+    return columns.rows() if columns else rescan_rows(file_path, col)
+
+
+# ── Fiscal year / quarter of a disclosure file ────────
+def fiscal_period(d):
+    """('FY2025', 'Q4') for a date; the federal fiscal year starts October 1."""
+    return f'FY{d.year + (d.month >= 10)}', f'Q{(d.month - 10) % 12 // 3 + 1}'
+
+
+def sheet_date(v):
+    """A date from a cell: Excel serial number or a date string (xlsx or CSV); None otherwise."""
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return date(1899, 12, 30) + timedelta(days=int(v)) if 20000 < v < 80000 else None
+    for fmt in ('%Y-%m-%d', '%m/%d/%Y'):
+        try:
+            return datetime.strptime(str(v or '').strip().split(' ')[0], fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+def infer_period(file_path, sample=1000):
+    """(fiscal year, quarter) from the file name (…_FY2025_Q4.xlsx), else from the
+    latest decision/received date in the first rows. Either may be None."""
+    m = PERIOD_NAME.search(os.path.basename(file_path))
+    fy, quarter = (f'FY{m.group(1)}', m.group(2) and f'Q{m.group(2)}') if m else (None, None)
+    if fy and quarter:
+        return fy, quarter
+    with open_reader(file_path) as reader:
+        headers = reader.headers()
+        for name in DATE_COLUMNS:
+            if name in headers:
+                dates = [d for (v,) in reader.iter_columns([headers.index(name)], 2, sample + 1)
+                         if (d := sheet_date(v))]
+                if dates:
+                    found = fiscal_period(max(dates))
+                    return (fy, found[1] if found[0] == fy else None) if fy else found
+    return fy, quarter
+
+
+def input_files(paths):
+    """Files named on the command line, with directories expanded to the xlsx/CSV/TSV files they hold."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files += sorted(os.path.join(p, f) for f in os.listdir(p)
+                            if f.lower().endswith(SUFFIXES) and not f.startswith('~$'))
+        else:
+            files.append(p)
+    return files
+
+
+# ── Parse + aggregate one file ────────────────────────
+def load_file(file_path, args, workers=1, label='', metrics=None):
+    """Parse one file (from the cache when possible). Returns (col, agg, row_count, columns).
+
+    agg is None with the vectorized engine, which works on columns instead.
+    """
+    vectorized = args.engine == 'vectorized'
+    metrics = metrics or RunMetrics(None)
+    scope = os.path.basename(file_path)
+    cached = None
+    if not args.no_cache:
+        with metrics.stage('cache_lookup', scope):
+            key = lca_cache.cache_key(file_digest(file_path), LCA_COLUMNS)
+            cached = lca_cache.load(args.cache_dir, key)
+    
+    if cached:
+        print(f"   {label}Loading {cached.row_count:,} projected rows from cache ({lca_cache.cache_path(args.cache_dir, key)})\n")
+        col = cached.meta['col']
+        if not label:
+            print_columns(col)
+        if vectorized:
+            return col, None, cached.row_count, cached
+        with metrics.stage('row_loop', scope) as stage:
+            agg, row_count = lca_spill.aggregate_rows(cached.rows(), args.memory_budget << 20, args.spill_dir,
+                                                      label=label, capacity=args.topk_capacity,
+                                                      normalize_employers=args.normalize_employers)
+            stage['rows'] = row_count
+        return col, agg, row_count, cached
+    
+    col, agg, row_count, columns = scan_workbook(file_path, workers,
+                                                 encode=vectorized or not args.no_cache, aggregate=not vectorized,
+                                                 capacity=args.topk_capacity, normalize_employers=args.normalize_employers,
+                                                 budget=args.memory_budget << 20, spill_dir=args.spill_dir,
+                                                 label=label, metrics=metrics)
+    if columns and not args.no_cache:
+        with metrics.stage('cache_save', scope, rows=columns.row_count):
+            path = lca_cache.save(args.cache_dir, key, columns, {
+                'source': os.path.abspath(file_path),
+                'col': col,
+                'created_at': datetime.now().isoformat(),
+            })
+        print(f"\n💾 {label}Cached {columns.row_count:,} projected rows → {path}")
+    return col, agg, (columns.row_count if vectorized else row_count), columns
+
+
+def load_file_job(job):
+    """Worker: load_file() for one file of a batch. Encoded columns only come back for the vectorized engine.
+
+    Returns (col, agg, row_count, columns, stages measured in the worker).
+    """
+    file_path, args = job
+    metrics = RunMetrics(None)
+    col, agg, row_count, columns = load_file(file_path, args, label=f'[{os.path.basename(file_path)}] ', metrics=metrics)
+    return col, agg, row_count, columns if args.engine == 'vectorized' else None, metrics.stages
+
+
+def build_fiscal_year(fiscal_year, loaded, args, metrics):
+    """Demand rows of one fiscal year from its loaded files (in quarter order).
+
+    Returns (state_rows, nat_rows, row_count, key_count).
+    """
+    if args.engine == 'vectorized':
+        import lca_vectorized
+        with metrics.stage('vectorized_aggregate', fiscal_year) as stage:
+            columns = loaded[0][4]
+            if len(loaded) > 1:
+                columns = ColumnBuilder(len(LCA_COLUMNS))
+                for *_, part in loaded:
+                    columns.extend(part)
+            stage['rows'] = columns.row_count
+            return lca_vectorized.build_rows(columns.values, columns.codes, fiscal_year, args.normalize_employers)
     
-    default_path = os.path.expanduser('~/Downloads/LCA_Disclosure_Data_FY2025_Q4.xlsx')
-    file_path = sys.argv[1] if len(sys.argv) > 1 else default_path
+    row_count = sum(n for _, _, _, n, _ in loaded)
+    if len(loaded) == 1:
+        agg = loaded[0][2]
+    else:
+        with metrics.stage('merge_files', fiscal_year, rows=row_count):
+            agg = lca_spill.merge_parts((a for _, _, a, _, _ in loaded), args.memory_budget << 20, args.spill_dir)
+    if isinstance(agg, lca_spill.SpilledAggregate):
+        try:
+            with metrics.stage('spill_merge', fiscal_year, rows=agg.pieces) as stage:
+                state_rows, nat_rows = agg.build_rows(fiscal_year)
+                stage['spills'], stage['partitions'], stage['splits'] = len(agg.runs), agg.partitions, agg.splits
+        finally:
+            agg.close()
+        print(f"\n💽 {fiscal_year}: over the {args.memory_budget:,} MB memory budget; aggregated in {len(agg.runs)} "
+              f"spills and merged {agg.partitions} partitions one at a time"
+              + (f" ({agg.splits} split again to fit)" if agg.splits else ''))
+        return state_rows, nat_rows, row_count, agg.keys
+    with metrics.stage('national_rollup', fiscal_year, rows=len(agg)):
+        nat = national_rollup(agg)
+    if args.topk_capacity:
+        uncertain, bound = top_error(list(agg.values()) + list(nat.values()))
+        print(f"\n🔎 {fiscal_year} top-K sketch (capacity {args.topk_capacity}): {uncertain:,} of {len(agg) + len(nat):,} "
+              f"top-5 lists not guaranteed exact (max overcount {bound:,})")
+        if uncertain:
+            with metrics.stage('topk_recount', fiscal_year, rows=row_count) as stage:
+                rows = chain.from_iterable(file_rows(path, col, columns, args) for path, col, _, _, columns in loaded)
+                recounted = verify_top(agg, nat, rows)
+                stage['keys'] = len(recounted)
+            print(f"   Recounted {len(recounted):,} SOC × State keys exactly")
+    with metrics.stage('row_building', fiscal_year, rows=len(agg) + len(nat)):
+        state_rows, nat_rows = build_rows(agg, fiscal_year, nat)
+    return state_rows, nat_rows, row_count, len(agg)
+
+
+def write_breakdowns(fiscal_year, loaded, args, metrics):
+    """--breakdown: aggregate the fiscal year's rows again by each finer breakdown and write its rows as JSON lines."""
+    os.makedirs(args.breakdown_dir, exist_ok=True)
+    for name in args.breakdown:
+        with metrics.stage(f'breakdown_{name}', fiscal_year) as stage:
+            rows = chain.from_iterable(file_rows(path, col, columns, args) for path, col, _, _, columns in loaded)
+            out, row_count, spills = lca_spill.build_breakdown(rows, name, fiscal_year, args.memory_budget << 20,
+                                                               args.spill_dir, args.normalize_employers)
+            path = os.path.join(args.breakdown_dir, f'intel_h1b_demand_by_{name}-{fiscal_year}.jsonl')
+            tmp = f'{path}.{os.getpid()}.tmp'
+            written = 0
+            with open(tmp, 'w', encoding='utf-8') as f:
+                for r in out:
+                    f.write(json.dumps(r, ensure_ascii=False) + '\n')
+                    written += 1
+            os.replace(tmp, path)
+            stage['rows'], stage['keys'], stage['spills'] = row_count, written, spills
+        print(f"\n🧮 {fiscal_year} SOC × {'state × county' if name == 'county' else name}: {written:,} rows → {path}"
+              + (f" ({spills} spills)" if spills else ''))
+
+
+# ── Upload ────────────────────────────────────────────
+def upload_fiscal_year(supabase, fiscal_year, state_rows, nat_rows, args, metrics, log):
+    """Upsert one fiscal year's rows (only the changed ones with --delta). Returns (inserted, loaded).
+
+    loaded is the number of this fiscal year's rows the table holds at this load's version.
+    log is the fiscal year's lca_checkpoint.UploadLog: rows it already has
+    acknowledged are not sent again, and each batch that lands is added to it.
+    """
+    all_rows = state_rows + nat_rows
+    fp_path = row_delta.store_path(args.cache_dir, SUPABASE_URL, 'intel_h1b_demand', fiscal_year)
     
-    print(f"📄 Loading H-1B LCA file: {file_path}")
-    print(f"   Reading with openpyxl (streaming mode)...\n")
+    # ── Delta against the last load ───────────────────
+    previous = None
+    upload_rows, current, stale = all_rows, None, []
+    if log.plan is not None:
+        # Resuming: keep the interrupted run's plan, which the acknowledged row indices refer to
+        previous, stale = log.plan['previous'], log.plan['stale']
+        if log.plan['upload'] is not None:
+            upload_rows = [all_rows[i] for i in log.plan['upload']]
+        print(f"↻ {fiscal_year}: {len(log.acked):,} of {len(upload_rows):,} rows already uploaded by the interrupted run")
+    elif args.delta:
+        with metrics.stage('delta', fiscal_year, rows=len(all_rows)) as stage:
+            if args.delta == 'local':
+                previous = row_delta.load_local(fp_path)
+                if previous is None:
+                    print(f"  ⚠ No saved {fiscal_year} fingerprints ({fp_path}); sending every row")
+            else:
+                print(f"🔁 Fetching existing {fiscal_year} rows from intel_h1b_demand...")
+                previous = row_delta.fetch_remote(supabase, 'intel_h1b_demand', DEMAND_KEY,
+                                                  list(all_rows[0]) if all_rows else ['*'],
+                                                  {'fiscal_year': f'eq.{fiscal_year}'})
+                if previous is None:
+                    print("  ⚠ Could not read existing rows; sending every row")
+            if previous is not None:
+                upload_rows, current, stale = row_delta.diff(all_rows, previous, DEMAND_KEY)
+                print(f"🔁 {fiscal_year} delta: {len(upload_rows):,} new or changed, "
+                      f"{len(all_rows) - len(upload_rows):,} unchanged, {len(stale):,} no longer produced")
+            stage['changed'], stage['stale'] = len(upload_rows), len(stale)
+    if log.plan is None:
+        index = None
+        if upload_rows is not all_rows:
+            position = {row_delta.row_key(r, DEMAND_KEY): i for i, r in enumerate(all_rows)}
+            index = [position[row_delta.row_key(r, DEMAND_KEY)] for r in upload_rows]
+        log.begin({'upload': index, 'stale': stale, 'previous': previous})
     
-    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
-    ws = wb.active
+    # Rows of upload_rows still to send; acked batches are recorded by their upload_rows indices
+    pending = [i for i in range(len(upload_rows)) if i not in log.acked]
+    send_rows = upload_rows if len(pending) == len(upload_rows) else [upload_rows[i] for i in pending]
     
-    # Get headers
-    header_row = next(ws.iter_rows(min_row=1, max_row=1))
-    headers = [cell.value for cell in header_row]
+    print(f"📤 Inserting {len(send_rows):,} {fiscal_year} records ({len(state_rows)} state + {len(nat_rows)} national built)...\n")
     
-    # Build column index
-    col = {h: i for i, h in enumerate(headers) if h}
+    step = max(len(send_rows) // 10, 1)
+    shown = 0
     
-    print(f"Detected columns: SOC_CODE={col.get('SOC_CODE','?')}, CASE_STATUS={col.get('CASE_STATUS','?')}")
-    print(f"  WORKSITE_STATE={col.get('WORKSITE_STATE','?')}, EMPLOYER_NAME={col.get('EMPLOYER_NAME','?')}")
-    print(f"  PREVAILING_WAGE={col.get('PREVAILING_WAGE','?')}, WAGE_RATE_OF_PAY_FROM={col.get('WAGE_RATE_OF_PAY_FROM','?')}\n")
+    def progress(sent, failed):
+        nonlocal shown
+        if sent + failed >= shown + step or sent + failed == len(send_rows):
+            shown = sent + failed
+            print(f"  {sent:,} / {len(send_rows):,}" + (f" ({failed:,} failed)" if failed else ''))
     
-    # Aggregate
-    agg = defaultdict(lambda: {
-        'soc_title': None, 'total': 0, 'certified': 0, 'denied': 0, 'withdrawn': 0,
-        'prev_wages': [], 'offered_wages': [], 'employers': defaultdict(int), 'metros': defaultdict(int),
-    })
+    def acked(first, n):
+        log.ack(pending[first:first + n])
     
-    row_count = 0
-    for row in ws.iter_rows(min_row=2):
-        cells = [cell.value for cell in row]
-        if len(cells) < max(col.values()) + 1:
-            continue
-        
-        soc = str(cells[col.get('SOC_CODE', 7)] or '').strip()
-        state = str(cells[col.get('WORKSITE_STATE', -1)] or '').strip() if 'WORKSITE_STATE' in col else ''
-        status = str(cells[col.get('CASE_STATUS', 1)] or '').strip().upper()
-        soc_title = str(cells[col.get('SOC_TITLE', 8)] or '').strip()
-        employer = str(cells[col.get('EMPLOYER_NAME', 19)] or '').strip()
-        metro = str(cells[col.get('WORKSITE_COUNTY', -1)] or '').strip() if 'WORKSITE_COUNTY' in col else ''
-        
-        if not soc or len(soc) < 5 or not state:
-            continue
-        
-        # Normalize SOC
-        norm_soc = soc.replace('.00', '')
-        key = f"{norm_soc}|{state}"
-        
-        entry = agg[key]
-        if not entry['soc_title']:
-            entry['soc_title'] = soc_title
-        entry['total'] += 1
-        
-        if 'CERTIFIED' in status:
-            entry['certified'] += 1
-        elif 'DENIED' in status:
-            entry['denied'] += 1
-        elif 'WITHDRAWN' in status:
-            entry['withdrawn'] += 1
-        
-        # Wages
-        try:
-            pw = float(str(cells[col.get('PREVAILING_WAGE', -1)] or '0').replace(',', '').replace('$', ''))
-            if pw > 0:
-                entry['prev_wages'].append(pw * 2080 if pw < 500 else pw)
-        except (ValueError, TypeError):
-            pass
-        
-        try:
-            ow = float(str(cells[col.get('WAGE_RATE_OF_PAY_FROM', -1)] or '0').replace(',', '').replace('$', ''))
-            if ow > 0:
-                entry['offered_wages'].append(ow * 2080 if ow < 500 else ow)
-        except (ValueError, TypeError):
-            pass
-        
-        if employer:
-            entry['employers'][employer] += 1
-        if metro:
-            entry['metros'][metro] += 1
-        
-        row_count += 1
-        if row_count % 100000 == 0:
-            print(f"  Processed {row_count:,} rows...")
+    with metrics.stage('upload', fiscal_year) as stage:
+        report = supabase.upsert('intel_h1b_demand', send_rows, batch_bytes=args.batch_kb * 1024,
+                                 progress=progress, acked=acked)
+        stage['rows'] = report.rows_sent
+        stage.update(http_stats(report))
+    print(f"\n{report.summary()}")
+    if report.failed:
+        path = report.write(os.path.join(args.cache_dir, 'upsert-failures',
+                                         f"intel_h1b_demand-{fiscal_year}-{datetime.now():%Y%m%d-%H%M%S}.json"))
+        print(f"  ✗ Failed batches saved to {path}")
     
-    wb.close()
-    print(f"\n📊 {row_count:,} LCA records processed")
-    print(f"📈 {len(agg):,} SOC × State combinations\n")
+    undeleted = stale
+    if stale and args.delete_stale:
+        with metrics.stage('delete_stale', fiscal_year, rows=len(stale)):
+            undeleted = row_delta.delete_keys(supabase, 'intel_h1b_demand', stale, DEMAND_KEY)
+        deleted = len(stale) - len(undeleted)
+        print(f"🗑  Deleted {deleted:,} rows no longer produced" + (f" ({len(undeleted):,} failed)" if undeleted else ''))
     
-    def median_val(arr):
-        if not arr: return None
-        return round(statistics.median(arr))
+    # Remember what the table holds: failed rows keep their old fingerprint
+    # (so the next delta retries them), rows not deleted stay as stale
+    if current is None:
+        current = {row_delta.row_key(r, DEMAND_KEY): row_delta.fingerprint(r) for r in all_rows}
+    for f in report.failed:
+        for r in send_rows[f['first_row']:f['first_row'] + f['rows']]:
+            k = row_delta.row_key(r, DEMAND_KEY)
+            if previous and k in previous:
+                current[k] = previous[k]
+            else:
+                del current[k]
+    for k in undeleted:
+        current[k] = previous[k]
+    row_delta.save_local(fp_path, current)
     
-    def top_n(d, n=5):
-        return [k for k, v in sorted(d.items(), key=lambda x: -x[1])[:n]]
+    return len(log.acked), len(all_rows) - report.rows_failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest DOL OFLC LCA disclosure data into intel_h1b_demand')
+    parser.add_argument('files', nargs='*', metavar='file',
+                        help=f'LCA disclosure xlsx/csv/tsv(.gz) files, or directories of them '
+                             f'(several → batch mode; default: {DEFAULT_FILE})')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='parse the sheet in N row-range shards across N processes (default: 1, serial)')
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='batch mode: files parsed at once, one process each (default: one per file, up to the CPU count)')
+    parser.add_argument('--fiscal-year', metavar='FY2025',
+                        help=f'fiscal year of every file, instead of inferring it from the name/contents '
+                             f'(fallback when it can\'t be inferred: {FISCAL_YEAR})')
+    parser.add_argument('--cache-dir', default=lca_cache.DEFAULT_CACHE_DIR,
+                        help=f'columnar cache of parsed files (default: {lca_cache.DEFAULT_CACHE_DIR})')
+    parser.add_argument('--no-cache', action='store_true', help='always parse the input files; don\'t read or write the cache')
+    parser.add_argument('--engine', choices=['rows', 'vectorized'], default='rows',
+                        help='aggregation engine: per-row Python (default) or NumPy group-bys over the encoded columns')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='upload batches in flight at once (default: 4)')
+    parser.add_argument('--batch-kb', type=int, default=512,
+                        help='target upload batch size in KB of JSON (default: 512)')
+    parser.add_argument('--delta', choices=['local', 'remote'],
+                        help='upsert only new/changed rows, diffing against fingerprints saved by the last run (local) '
+                             'or computed from the rows already in the table (remote)')
+    parser.add_argument('--delete-stale', action='store_true',
+                        help='with --delta, delete this fiscal year\'s rows that the new file no longer produces')
+    parser.add_argument('--topk-capacity', type=int, default=0, metavar='K',
+                        help='bound employer/metro counters per key to ~2K entries, recounting uncertain keys (default: 0, exact)')
+    parser.add_argument('--normalize-employers', action='store_true',
+                        help='count employer name variants (case, punctuation, LLC/INC suffixes) as one employer '
+                             'in top_employers, shown under the first variant seen')
+    parser.add_argument('--memory-budget', type=int, default=0, metavar='MB',
+                        help='spill the aggregate to disk once it grows past MB megabytes and build the rows one '
+                             'partition of about MB at a time (default: 0, keep it in memory)')
+    parser.add_argument('--spill-dir', help='where spill files go with --memory-budget (default: the system temp dir)')
+    parser.add_argument('--breakdown', action='append', choices=sorted(lca_spill.BREAKDOWNS), default=[],
+                        help='also write SOC × state × county (county) or SOC × employer (employer) rows of each fiscal '
+                             'year built, aggregated within --memory-budget, to --breakdown-dir (repeatable)')
+    parser.add_argument('--breakdown-dir', default=os.path.join(lca_cache.DEFAULT_CACHE_DIR, 'breakdowns'),
+                        help=f"where --breakdown rows go (default: {os.path.join(lca_cache.DEFAULT_CACHE_DIR, 'breakdowns')})")
+    parser.add_argument('--resume', action='store_true',
+                        help='continue the last interrupted run: reuse the rows of fiscal years it finished building '
+                             'and upload only the rows no batch acknowledged (only uploads resume; a fiscal year '
+                             'interrupted while scanning is aggregated again from the start)')
+    parser.add_argument('--metrics-dir', default=ingest_metrics.DEFAULT_DIR,
+                        help=f'where the per-run JSON stage metrics are written (default: {ingest_metrics.DEFAULT_DIR})')
+    parser.add_argument('--snapshot-dir', default=soc_snapshot.DEFAULT_DIR,
+                        help=f'where the SOC × state snapshot of intel_h1b_demand is written (default: {soc_snapshot.DEFAULT_DIR})')
+    parser.add_argument('--no-snapshot', action='store_true', help="don't write the snapshot")
+    args = parser.parse_args()
+    if args.topk_capacity and args.topk_capacity < 5:
+        parser.error('--topk-capacity must be 0 or at least 5 (the top-N size)')
+    if args.memory_budget and (args.topk_capacity or args.engine == 'vectorized'):
+        parser.error('--memory-budget works with the rows engine and exact top counters (no --topk-capacity)')
+    if args.delete_stale and not args.delta:
+        parser.error('--delete-stale needs --delta')
+    if args.fiscal_year and not re.fullmatch(r'FY\d{4}', args.fiscal_year, re.I):
+        parser.error('--fiscal-year must look like FY2025')
+    checkpoint = lca_checkpoint.Checkpoint(lca_checkpoint.checkpoint_dir(args.cache_dir, SUPABASE_URL))
+    unfinished = checkpoint.load_run()
     
-    # Build state-level rows (3+ applications)
-    state_rows = []
-    for key, e in agg.items():
-        if e['total'] < 3:
-            continue
-        soc, state = key.split('|')
-        state_rows.append({
-            'soc_code': soc,
-            'soc_title': e['soc_title'],
-            'state': state,
-            'fiscal_year': FISCAL_YEAR,
-            'applications_total': e['total'],
-            'applications_certified': e['certified'],
-            'applications_denied': e['denied'],
-            'applications_withdrawn': e['withdrawn'],
-            'median_prevailing_wage': median_val(e['prev_wages']),
-            'median_offered_wage': median_val(e['offered_wages']),
-            'top_employers': top_n(e['employers']),
-            'top_metro_areas': top_n(e['metros']),
-            'source': 'dol_lca',
+    if args.resume:
+        if not unfinished:
+            parser.error(f'no interrupted run to resume in {checkpoint.directory}')
+        years = {fy: [tuple(p) for p in parts] for fy, parts in unfinished['years'].items()}
+        files = [path for parts in years.values() for _, path in parts]
+        if args.files and sorted(map(os.path.abspath, input_files(args.files))) != sorted(files):
+            parser.error(f"the interrupted run was for {', '.join(files)}; run without --resume to start over")
+        for name in RESUMED_OPTIONS:
+            setattr(args, name, unfinished['options'][name])
+        print(f"↻ Resuming the run started {unfinished['created_at']} ({', '.join(sorted(years))})")
+    else:
+        files = input_files(args.files or [DEFAULT_FILE])
+        if not files:
+            parser.error(f"no {'/'.join(SUFFIXES)} files in {', '.join(args.files)}")
+        
+        # ── Group files by fiscal year ────────────────
+        years = {}
+        for path in files:
+            fy, quarter = infer_period(path)
+            if args.fiscal_year:
+                fy, quarter = args.fiscal_year.upper(), (quarter if fy == args.fiscal_year.upper() else None)
+            elif not fy:
+                print(f"  ⚠ Can't tell the fiscal year of {path}; assuming {FISCAL_YEAR}")
+                fy = FISCAL_YEAR
+            years.setdefault(fy, []).append((quarter or '', path))
+        for parts in years.values():
+            parts.sort()
+        
+        if unfinished:
+            print(f"  ⚠ Discarding the interrupted run from {unfinished['created_at']} (--resume continues it)")
+        checkpoint.start({
+            'created_at': datetime.now().isoformat(),
+            'years': {fy: [(q, os.path.abspath(p)) for q, p in parts] for fy, parts in years.items()},
+            'options': {name: getattr(args, name) for name in RESUMED_OPTIONS},
         })
     
-    # Build national aggregates
-    nat = defaultdict(lambda: {
-        'soc_title': None, 'total': 0, 'certified': 0, 'denied': 0, 'withdrawn': 0,
-        'prev_wages': [], 'offered_wages': [], 'employers': defaultdict(int), 'metros': defaultdict(int),
-    })
+    metrics = RunMetrics('h1b-lca', vars(args))
+    supabase = SupabaseClient(SUPABASE_URL, SUPABASE_KEY, concurrency=args.concurrency)
+    results = {}  # fiscal year → (quarter, nat_rows, row_count, built, inserted, loaded)
+    snapshot_rows = []  # every delivered row, for the snapshot
     
-    for key, e in agg.items():
-        soc = key.split('|')[0]
-        n = nat[soc]
-        if not n['soc_title']:
-            n['soc_title'] = e['soc_title']
-        n['total'] += e['total']
-        n['certified'] += e['certified']
-        n['denied'] += e['denied']
-        n['withdrawn'] += e['withdrawn']
-        n['prev_wages'].extend(e['prev_wages'])
-        n['offered_wages'].extend(e['offered_wages'])
-        for k, v in e['employers'].items():
-            n['employers'][k] += v
-        for k, v in e['metros'].items():
-            n['metros'][k] += v
+    def finish(fy, loaded):
+        state_rows, nat_rows, row_count, key_count = build_fiscal_year(fy, loaded, args, metrics)
+        if args.breakdown:
+            write_breakdowns(fy, loaded, args, metrics)
+        with metrics.stage('checkpoint_save', fy, rows=len(state_rows) + len(nat_rows)):
+            checkpoint.save_rows(fy, {'row_count': row_count, 'key_count': key_count}, state_rows, nat_rows)
+        deliver(fy, state_rows, nat_rows, row_count, key_count)
     
-    nat_rows = []
-    for soc, e in nat.items():
-        if e['total'] < 5:
-            continue
-        nat_rows.append({
-            'soc_code': soc,
-            'soc_title': e['soc_title'],
-            'state': 'US',
-            'fiscal_year': FISCAL_YEAR,
-            'applications_total': e['total'],
-            'applications_certified': e['certified'],
-            'applications_denied': e['denied'],
-            'applications_withdrawn': e['withdrawn'],
-            'median_prevailing_wage': median_val(e['prev_wages']),
-            'median_offered_wage': median_val(e['offered_wages']),
-            'top_employers': top_n(e['employers']),
-            'top_metro_areas': top_n(e['metros']),
-            'source': 'dol_lca',
-        })
+    def deliver(fy, state_rows, nat_rows, row_count, key_count):
+        quarter = years[fy][-1][0]
+        print(f"\n📊 {fy}{' ' + quarter if quarter else ''}: {row_count:,} LCA records processed")
+        print(f"📈 {key_count:,} SOC × State combinations\n")
+        inserted, n = upload_fiscal_year(supabase, fy, state_rows, nat_rows, args, metrics, checkpoint.upload_log(fy))
+        results[fy] = (quarter, nat_rows, row_count, len(state_rows) + len(nat_rows), inserted, n)
+        if not args.no_snapshot:
+            snapshot_rows.extend(chain(state_rows, nat_rows))
     
-    all_rows = state_rows + nat_rows
-    print(f"📤 Inserting {len(all_rows):,} records ({len(state_rows)} state + {len(nat_rows)} national)...\n")
+    def write_metrics():
+        print(f"\n{metrics.summary()}")
+        print(f"   Metrics → {metrics.write(args.metrics_dir)}")
     
-    inserted = 0
-    for i in range(0, len(all_rows), 100):
-        chunk = all_rows[i:i+100]
-        if supabase_upsert('intel_h1b_demand', chunk):
-            inserted += len(chunk)
-        if (i // 100) % 10 == 0:
-            print(f"  {inserted:,} / {len(all_rows):,}")
+    # Fiscal years whose rows the interrupted run already built skip parsing
+    to_parse = dict(years)
+    if args.resume:
+        for fy in sorted(years):
+            saved = checkpoint.load_rows(fy)
+            if saved:
+                meta, state_rows, nat_rows = saved
+                print(f"↻ {fy}: {len(state_rows) + len(nat_rows):,} rows restored from the checkpoint")
+                deliver(fy, state_rows, nat_rows, meta['row_count'], meta['key_count'])
+                del to_parse[fy]
+    files = [path for parts in to_parse.values() for _, path in parts]
     
-    # Update freshness
-    supabase_request('intel_data_freshness', method='PATCH', 
-        params={'table_name': 'eq.intel_h1b_demand'},
-        data={
-            'data_period': f'{FISCAL_YEAR} Q4',
-            'data_release_date': '2025-02-11',
-            'next_expected_release': 'May 2025 (FY2026 Q1)',
-            'records_loaded': inserted,
-            'last_refreshed_at': datetime.now().isoformat(),
-            'refreshed_by': 'matt',
-            'refresh_method': 'manual_import',
-            'citation_text': f'U.S. Department of Labor, OFLC LCA Disclosure Data, {FISCAL_YEAR} Q4',
-            'citation_url': 'https://www.dol.gov/agencies/eta/foreign-labor/performance',
-            'coverage_notes': f'{row_count:,} individual LCA applications aggregated to {len(all_rows)} SOC × state demand signals',
-            'known_limitations': 'LCA applications ≠ actual H-1B visas granted; includes renewals/amendments; aggregated to 3+ per SOC/state',
-            'is_stale': False,
-            'stale_reason': None,
-        })
+    if len(files) == 1:
+        path = files[0]
+        print(f"📄 Loading H-1B LCA file: {path}")
+        col, agg, row_count, columns = load_file(path, args, args.workers, metrics=metrics)
+        finish(next(iter(to_parse)), [(path, col, agg, row_count, columns)])
+    elif files:
+        # Batch: one process per file; each fiscal year is built and uploaded
+        # as soon as its last file is parsed, while the others keep parsing
+        jobs = args.jobs or min(len(files), os.cpu_count() or 1)
+        print(f"📄 Loading {len(files)} H-1B LCA files ({', '.join(f'{fy} ×{len(p)}' for fy, p in sorted(to_parse.items()))}) "
+              f"in {jobs} processes")
+        pending = {fy: len(parts) for fy, parts in to_parse.items()}
+        done, failed = {}, set()
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {pool.submit(load_file_job, (path, args)): (fy, path)
+                       for fy, parts in to_parse.items() for _, path in parts}
+            for future in as_completed(futures):
+                fy, path = futures[future]
+                try:
+                    col, agg, row_count, columns, stages = future.result()
+                    done[path] = (path, col, agg, row_count, columns)
+                    metrics.extend(stages)
+                except Exception as e:
+                    print(f"  ✗ {path}: {e!r}; skipping {fy}")
+                    failed.add(fy)
+                pending[fy] -= 1
+                if not pending[fy] and fy not in failed:
+                    finish(fy, [done.pop(p) for _, p in years[fy]])
+        if failed:
+            print(f"\n  ✗ Not loaded (a file failed to parse): {', '.join(sorted(failed))}")
     
-    print(f"\n🎯 Done! {inserted:,} H-1B demand records inserted\n")
-    print("Top 10 occupations by H-1B demand (national):")
-    for i, r in enumerate(sorted(nat_rows, key=lambda x: -x['applications_total'])[:10]):
+    def keep_checkpoint(reason):
+        print(f"\n↻ {reason}; the checkpoint is kept in {checkpoint.directory} — rerun with --resume to continue")
+    
+    if not results:
+        supabase.close()
+        keep_checkpoint('Nothing was loaded')
+        write_metrics()
+        sys.exit(1)
+    
+    # Update freshness (once, for the whole batch)
+    latest = max(results)
+    quarter = results[latest][0]
+    period = f'{latest} {quarter}' if quarter else latest
+    loaded = sum(r[5] for r in results.values())
+    row_count = sum(r[2] for r in results.values())
+    built = sum(r[3] for r in results.values())
+    freshness = {
+        'data_period': period if len(results) == 1 else f"{min(results)}–{period}",
+        'data_release_date': '2025-02-11',
+        'next_expected_release': 'May 2025 (FY2026 Q1)',
+        'records_loaded': loaded,
+        'last_refreshed_at': datetime.now().isoformat(),
+        'refreshed_by': 'matt',
+        'refresh_method': 'manual_import',
+        'citation_text': f'U.S. Department of Labor, OFLC LCA Disclosure Data, {period}',
+        'citation_url': 'https://www.dol.gov/agencies/eta/foreign-labor/performance',
+        'coverage_notes': f'{row_count:,} individual LCA applications aggregated to {built} SOC × state demand signals'
+                          + (f" across {', '.join(sorted(results))}" if len(results) > 1 else ''),
+        'known_limitations': 'LCA applications ≠ actual H-1B visas granted; includes renewals/amendments; aggregated to 3+ per SOC/state',
+        'is_stale': built > loaded,
+        'stale_reason': f'{built - loaded:,} built rows failed to upload' if built > loaded else None,
+    }
+    with metrics.stage('freshness_update'):
+        supabase.request('intel_data_freshness', method='PATCH', params={'table_name': 'eq.intel_h1b_demand'}, data=freshness)
+    if not args.no_snapshot and built > loaded:
+        print(f"\n🗂  Snapshot not written: {built - loaded:,} rows failed to upload "
+              f"(the current one stays until a complete load)")
+    elif not args.no_snapshot:
+        with metrics.stage('snapshot', rows=len(snapshot_rows)):
+            version = soc_snapshot.write_snapshot(args.snapshot_dir, 'intel_h1b_demand', snapshot_rows,
+                                                  'fiscal_year', ('fiscal_year',))
+            stamped = soc_snapshot.stamp_freshness(supabase, 'intel_h1b_demand', version)
+        print(f"\n🗂  Snapshot {version} → {args.snapshot_dir}"
+              + ('' if stamped else ' (⚠ not stamped into intel_data_freshness; is snapshot_version migrated?)'))
+    supabase.close()
+    
+    inserted = sum(r[4] for r in results.values())
+    print(f"\n🎯 Done! {inserted:,} H-1B demand records upserted, {loaded:,} current"
+          + (f" across {len(results)} fiscal years" if len(results) > 1 else '') + "\n")
+    print(f"Top 10 occupations by H-1B demand (national, {latest}):")
+    for i, r in enumerate(sorted(results[latest][1], key=lambda x: -x['applications_total'])[:10]):
         print(f"  {i+1}. {r['soc_title'] or r['soc_code']} — {r['applications_total']:,} applications (median: ${r['median_offered_wage'] or 0:,})")
+    
+    if len(results) < len(years) or built > loaded:
+        keep_checkpoint(f"{built - loaded:,} rows failed to upload" if built > loaded
+                        else f"{', '.join(sorted(set(years) - set(results)))} not loaded")
+        write_metrics()
+        sys.exit(1)
+    checkpoint.clear()
+    write_metrics()
 
 if __name__ == '__main__':
     main()
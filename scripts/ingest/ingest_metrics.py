@@ -0,0 +1,158 @@
+"""
+Run metrics for the Python ingest scripts
+Shared by h1b-lca.py and state-priorities.py: times each stage of a run
+(file open, header detection, row loop, rollup, row building, upload,
+freshness update, ...) with its rows/s and peak RSS, adds HTTP latency
+percentiles for upload stages, and writes one JSON file per run so
+ingest cost can be tracked over time and a regressed stage spotted.
+
+    metrics = RunMetrics('h1b-lca', vars(args))
+    with metrics.stage('row_loop', scope='FY2025') as s:
+        agg, s['rows'] = aggregate_rows(rows)
+    with metrics.stage('upload') as s:
+        report = client.upsert(table, rows)
+        s.update(http_stats(report))
+    print(metrics.summary())
+    metrics.write()   # ~/.cache/ingest-metrics/h1b-lca-<timestamp>.json
+
+Peak RSS is per stage on Linux (the kernel's VmHWM is reset when a stage
+starts); elsewhere it is the process peak so far. Stages run in worker
+processes are measured there and merged in with extend().
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import socket
+import platform
+import resource
+from datetime import datetime
+from contextlib import contextmanager
+
+DEFAULT_DIR = os.path.expanduser('~/.cache/ingest-metrics')
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter for this process; False where unsupported."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Peak resident set size in bytes (since the last reset_peak_rss() on Linux)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return maxrss(resource.RUSAGE_SELF)
+
+
+def maxrss(who):
+    peak = resource.getrusage(who).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentiles(values, ps=(50, 90, 99)):
+    """Nearest-rank percentiles plus the max, e.g. {'p50': …, 'p90': …, 'p99': …, 'max': …}; None when empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    n = len(values)
+    out = {f'p{p}': values[max(0, math.ceil(p / 100 * n) - 1)] for p in ps}
+    out['max'] = values[-1]
+    return out
+
+
+def http_stats(report):
+    """Upload fields of a stage from a supabase_rest UpsertReport; latencies in ms."""
+    latency = percentiles(report.latencies)
+    return {
+        'batches': report.batches_sent,
+        'retries': report.retries,
+        'failed_rows': report.rows_failed,
+        'http_latency_ms': {k: round(v * 1000, 1) for k, v in latency.items()} if latency else None,
+    }
+
+
+class RunMetrics:
+    """Stage timings of one ingest run. Stages are plain dicts, in the order they finished."""
+
+    def __init__(self, script, args=None):
+        self.script = script
+        self.args = args or {}
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.stages = []
+        self.per_stage_rss = reset_peak_rss()
+        self.peak = 0
+
+    @contextmanager
+    def stage(self, name, scope=None, rows=None):
+        """Time a stage. Yields its dict: set 'rows' (and any other fields) inside the block."""
+        s = {'stage': name, 'scope': scope, 'rows': rows}
+        reset_peak_rss()
+        start = time.perf_counter()
+        try:
+            yield s
+        finally:
+            s['seconds'] = round(time.perf_counter() - start, 4)
+            if s['rows'] is not None:
+                s['rows_per_s'] = round(s['rows'] / s['seconds']) if s['seconds'] else None
+            s['peak_rss'] = peak_rss()
+            self.peak = max(self.peak, s['peak_rss'])
+            self.stages.append(s)
+
+    def extend(self, stages):
+        """Add stages measured elsewhere (e.g. returned by a worker process)."""
+        self.stages.extend(stages)
+
+    def summary(self):
+        lines = [f"⏱  {'stage':<20} {'scope':<22} {'seconds':>8} {'rows/s':>11} {'peak RSS':>9}"]
+        for s in self.stages:
+            rate = f"{s['rows_per_s']:,}" if s.get('rows_per_s') else ''
+            scope = str(s['scope'] or '')[-22:]
+            line = (f"   {s['stage']:<20} {scope:<22} {s['seconds']:>8.2f} {rate:>11} "
+                    f"{s['peak_rss'] / 2**20:>7,.0f}MB")
+            if s.get('http_latency_ms'):
+                lat = s['http_latency_ms']
+                line += f"  http p50 {lat['p50']:,.0f}ms p90 {lat['p90']:,.0f}ms p99 {lat['p99']:,.0f}ms"
+            lines.append(line)
+        lines.append(f"   {'total':<20} {'':<22} {time.perf_counter() - self.start:>8.2f}")
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {
+            'script': self.script,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': datetime.now().isoformat(),
+            'seconds': round(time.perf_counter() - self.start, 4),
+            'peak_rss': max(self.peak, peak_rss()),
+            'peak_rss_per_stage': self.per_stage_rss,
+            'children_peak_rss': maxrss(resource.RUSAGE_CHILDREN),
+            'host': {
+                'hostname': socket.gethostname(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+            },
+            'args': self.args,
+            'stages': self.stages,
+        }
+
+    def write(self, directory=None):
+        """Write the run's JSON metrics file. Returns its path."""
+        directory = directory or DEFAULT_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.script}-{self.started_at:%Y%m%d-%H%M%S}.json')
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1, default=str)
+        return path
@@ -0,0 +1,528 @@
+"""
+H-1B LCA aggregation helpers
+Shared by h1b-lca.py and its worker processes: folds LCA rows into a
+SOC × state aggregate, merges partial aggregates, and builds the
+intel_h1b_demand rows (state-level 3+, national 5+).
+
+SOC codes, states, employers and counties are dictionary-encoded as rows
+are folded in: the aggregate is keyed by integers, its employer/metro
+counters count integer codes, and names are only decoded by build_rows().
+Each distinct raw cell value is stripped and normalized once per run, not
+once per row.
+"""
+
+import re
+import heapq
+from array import array
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+from collections import defaultdict
+
+
+class WageSample(array):
+    """Wages of one SOC × state entry, stored as raw doubles.
+
+    8 bytes a wage instead of a boxed float plus a list slot. Sorted in
+    place on first use, so median/quantiles are exact.
+    """
+    __slots__ = ()
+
+    def __new__(cls, values=()):
+        return super().__new__(cls, 'd', values)
+
+    def merge(self, other):
+        self.extend(other)
+
+    def iter_sorted(self):
+        self[:] = array('d', sorted(self))
+        return iter(self)
+
+
+class MergedWages:
+    """Read-only union of WageSamples (the national rollup); never copies them."""
+
+    def __init__(self):
+        self.parts = []
+
+    def __len__(self):
+        return sum(map(len, self.parts))
+
+    def merge(self, other):
+        self.parts.append(other)
+
+    def iter_sorted(self):
+        return heapq.merge(*(p.iter_sorted() for p in self.parts))
+
+
+def order_stats(wages, ranks):
+    """Values at the given ascending 0-based ranks of the sorted wages."""
+    it, pos, out = wages.iter_sorted(), 0, []
+    for r in ranks:
+        out.append(next(islice(it, r - pos, None)))
+        pos = r + 1
+    return out
+
+
+def wage_median(wages):
+    """Exact median, same value as statistics.median(); None when empty."""
+    n = len(wages)
+    if not n:
+        return None
+    if n % 2:
+        return order_stats(wages, [n // 2])[0]
+    lo, hi = order_stats(wages, [n // 2 - 1, n // 2])
+    return (lo + hi) / 2
+
+
+def wage_quantiles(wages, qs=(0.25, 0.5, 0.75)):
+    """Exact quantiles (linear interpolation between order statistics); None when empty."""
+    n = len(wages)
+    if not n:
+        return None
+    points = [(n - 1) * q for q in qs]
+    ranks = sorted({r for p in points for r in (int(p), min(int(p) + 1, n - 1))})
+    at = dict(zip(ranks, order_stats(wages, ranks)))
+    return [at[int(p)] + (at[min(int(p) + 1, n - 1)] - at[int(p)]) * (p - int(p)) for p in points]
+
+
+# ── Dictionary encoding ───────────────────────────────
+# Legal-form words dropped from the end of an employer name by employer_key()
+EMPLOYER_SUFFIXES = {
+    'LLC', 'LLP', 'LP', 'PLLC', 'PC', 'PLC', 'INC', 'INCORPORATED', 'CORP', 'CORPORATION',
+    'CO', 'COMPANY', 'LTD', 'LIMITED', 'NA',
+}
+
+
+def clean_text(v):
+    return str(v or '').strip()
+
+
+def clean_soc(v):
+    """Normalized SOC code ('15-1252.00' → '15-1252'); blank when too short to be one."""
+    s = str(v or '').strip()
+    return s.replace('.00', '') if len(s) >= 5 else ''
+
+
+def employer_key(name):
+    """Matching key for employer name variants: 'Google LLC' and 'GOOGLE, L.L.C.' → 'GOOGLE'."""
+    words = re.sub(r'[^\w\s]', '', name.upper().replace('&', ' AND ')).split()
+    while len(words) > 1 and words[-1] in EMPLOYER_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+class Dictionary:
+    """Dense integer codes for names, in first-seen order.
+
+    key maps a name to what identifies it (default: the name itself), so
+    variants can share one code; names[code] is the first variant seen.
+    """
+
+    def __init__(self, clean=clean_text, key=None):
+        self.clean = clean
+        self.key = key
+        self.codes = {}
+        self.names = []
+        self.raw = {}  # raw cell value → code, memoizing encode()
+
+    def code(self, name):
+        k = self.key(name) if self.key else name
+        c = self.codes.get(k)
+        if c is None:
+            c = self.codes[k] = len(self.names)
+            self.names.append(name)
+        return c
+
+    def encode(self, v):
+        """Code of a raw cell value after clean(); -1 when it cleans to blank."""
+        # Other values are keyed with their type so 1, 1.0 and True stay
+        # apart; strings and None are keyed as is, so raw.get(v) is a valid
+        # fast path for any cell value
+        k = v if v.__class__ is str or v is None else (v.__class__, v)
+        c = self.raw.get(k)
+        if c is None:
+            name = self.clean(v)
+            c = self.raw[k] = self.code(name) if name else -1
+        return c
+
+    def remap(self, other):
+        """Code in this dictionary of each of other's codes (adding missing names)."""
+        return [self.code(name) for name in other.names]
+
+    def __getstate__(self):
+        # The raw-value memo is rebuilt on demand; don't ship it between processes
+        return {**self.__dict__, 'raw': {}}
+
+
+class TopCounter(dict):
+    """Mergeable heavy-hitters counter (Space-Saving) behind top_n().
+
+    With capacity 0 it is an exact counter with the same insertion (tie)
+    order as a defaultdict(int). With a capacity it holds at most
+    2 × capacity items: when full it keeps the capacity largest and raises
+    floor to the largest count it dropped. Every count is then an
+    overestimate by at most floor, and no absent item has more than floor.
+    """
+    __slots__ = ('capacity', 'floor')
+
+    def __init__(self, capacity=0):
+        self.capacity = capacity
+        self.floor = 0
+
+    def add(self, item):
+        c = self.get(item)
+        if c is not None:
+            self[item] = c + 1
+            return
+        self[item] = self.floor + 1
+        if self.capacity and len(self) > 2 * self.capacity:
+            self.compact()
+
+    def merge(self, other):
+        # Items missing from one side count as that side's floor (their upper bound)
+        self.capacity = max(self.capacity, other.capacity)
+        if other.floor:
+            for k in self:
+                if k not in other:
+                    self[k] += other.floor
+        for k, v in other.items():
+            self[k] = self.get(k, self.floor) + v
+        self.floor += other.floor
+        if self.capacity and len(self) > 2 * self.capacity:
+            self.compact()
+
+    def compact(self):
+        ranked = heapq.nlargest(self.capacity + 1, self.items(), key=itemgetter(1))
+        self.floor = max(self.floor, ranked[-1][1])
+        keep = {k for k, _ in ranked[:-1]}
+        items = [(k, v) for k, v in self.items() if k in keep]
+        self.clear()
+        self.update(items)
+
+    def certain(self, n=5):
+        """True when top_n(self, n) is guaranteed to be the exact top n, in order."""
+        if not self.floor:
+            return True
+        ranked = sorted(self.values(), reverse=True)
+        if len(ranked) < n:
+            return False
+        bounds = ranked[1:n] + [max(ranked[n] if len(ranked) > n else 0, self.floor)]
+        return all(a - self.floor > b for a, b in zip(ranked, bounds))
+
+    def remap(self, codes):
+        """Copy with every item replaced by codes[item] (same counts, order and floor)."""
+        out = TopCounter(self.capacity)
+        out.floor = self.floor
+        out.update((codes[k], v) for k, v in self.items())
+        return out
+
+    def __reduce__(self):
+        return (self.__class__, (self.capacity,), {'floor': self.floor}, None, iter(self.items()))
+
+    def __setstate__(self, state):
+        self.floor = state['floor']
+
+
+def new_entry(capacity=0):
+    return {
+        'soc_title': None, 'total': 0, 'certified': 0, 'denied': 0, 'withdrawn': 0,
+        'prev_wages': WageSample(), 'offered_wages': WageSample(),
+        'employers': TopCounter(capacity), 'metros': TopCounter(capacity),
+    }
+
+
+def new_rollup_entry():
+    # National entries reference the state samples instead of copying them;
+    # their top counters take the capacity of what is merged in
+    e = new_entry()
+    e['prev_wages'], e['offered_wages'] = MergedWages(), MergedWages()
+    return e
+
+
+# SOC × state key: soc code << KEY_BITS | state code
+KEY_BITS = 32
+STATE_MASK = (1 << KEY_BITS) - 1
+
+
+class Aggregate(defaultdict):
+    """SOC × state entries keyed by soc code << KEY_BITS | state code.
+
+    Those codes, and the items of every entry's employer/metro counters,
+    index the aggregate's Dictionaries. normalize_employers gives employer
+    name variants (case, punctuation, LLC/INC suffixes) one shared code.
+    """
+
+    def __init__(self, capacity=0, normalize_employers=False):
+        # Module-level factories (not lambdas) so partial aggregates can be
+        # pickled back from worker processes
+        super().__init__(partial(new_entry, capacity) if capacity else new_entry)
+        self.capacity = capacity
+        self.normalize_employers = normalize_employers
+        self.socs = Dictionary(clean_soc)
+        self.states = Dictionary()
+        self.employers = Dictionary(key=employer_key if normalize_employers else None)
+        self.metros = Dictionary()
+
+    def key(self, soc, state):
+        """Key for raw SOC/state cell values; None for rows aggregate_rows() skips."""
+        s, st = self.socs.encode(soc), self.states.encode(state)
+        return None if s < 0 or st < 0 else s << KEY_BITS | st
+
+    def split(self, key):
+        """(SOC code, state) names of a key."""
+        return self.socs.names[key >> KEY_BITS], self.states.names[key & STATE_MASK]
+
+    def __reduce__(self):
+        return (self.__class__, (self.capacity, self.normalize_employers),
+                self.__dict__, None, iter(self.items()))
+
+
+# Columns the aggregation reads, in the order aggregate_rows() unpacks them,
+# with the positional fallback used when a release lacks the header
+# (None → always blank, -1 → last column).
+LCA_COLUMNS = [
+    ('SOC_CODE', 7), ('WORKSITE_STATE', None), ('CASE_STATUS', 1), ('SOC_TITLE', 8),
+    ('EMPLOYER_NAME', 19), ('WORKSITE_COUNTY', None), ('PREVAILING_WAGE', -1), ('WAGE_RATE_OF_PAY_FROM', -1),
+]
+
+
+def project_columns(col, width):
+    """Sheet column index for each LCA_COLUMNS field, given the header index and sheet width."""
+    indices = []
+    for name, fallback in LCA_COLUMNS:
+        i = col.get(name, fallback)
+        if i is not None and i < 0:
+            i += width
+        indices.append(i)
+    return indices
+
+
+def parse_wage(v):
+    """Wage cell ('$95,000', 95000, ...) as a float; 0.0 when blank or unparseable."""
+    if v.__class__ is str:
+        # Plain numeric text (CSV input) needs no cleanup
+        try:
+            return float(v)
+        except ValueError:
+            pass
+    try:
+        return float(str(v or '0').replace(',', '').replace('$', ''))
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def aggregate_rows(rows, agg=None, label='', capacity=0, normalize_employers=False):
+    """Fold projected LCA_COLUMNS tuples into agg. Returns (agg, row_count).
+
+    capacity bounds the employer/metro counters per key (0 = exact); see
+    TopCounter and verify_top().
+    """
+    if agg is None:
+        agg = Aggregate(capacity, normalize_employers)
+    # Memoized codes are looked up inline (raw.get); encode() only runs
+    # for the first occurrence of each distinct raw value
+    socs, states, employers, metros = agg.socs, agg.states, agg.employers, agg.metros
+    soc_get, state_get, employer_get, metro_get = socs.raw.get, states.raw.get, employers.raw.get, metros.raw.get
+    buckets = {}  # raw status → status field (or None)
+
+    row_count = 0
+    for soc, state, status, soc_title, employer, metro, pw, ow in rows:
+        s = soc_get(soc)
+        if s is None:
+            s = socs.encode(soc)
+        st = state_get(state)
+        if st is None:
+            st = states.encode(state)
+        if s < 0 or st < 0:
+            continue
+
+        entry = agg[s << KEY_BITS | st]
+        if not entry['soc_title']:
+            entry['soc_title'] = str(soc_title or '').strip()
+        entry['total'] += 1
+
+        bucket = buckets.get(status, '')
+        if bucket == '':
+            upper = str(status or '').strip().upper()
+            bucket = buckets[status] = ('certified' if 'CERTIFIED' in upper else 'denied' if 'DENIED' in upper
+                                        else 'withdrawn' if 'WITHDRAWN' in upper else None)
+        if bucket:
+            entry[bucket] += 1
+
+        # Wages (float cells, the common case, skip the text cleanup)
+        if pw.__class__ is not float:
+            pw = parse_wage(pw)
+        if pw > 0:
+            entry['prev_wages'].append(pw * 2080 if pw < 500 else pw)
+        if ow.__class__ is not float:
+            ow = parse_wage(ow)
+        if ow > 0:
+            entry['offered_wages'].append(ow * 2080 if ow < 500 else ow)
+
+        e = employer_get(employer)
+        if e is None:
+            e = employers.encode(employer)
+        if e >= 0:
+            entry['employers'].add(e)
+        m = metro_get(metro)
+        if m is None:
+            m = metros.encode(metro)
+        if m >= 0:
+            entry['metros'].add(m)
+
+        row_count += 1
+        if row_count % 100000 == 0:
+            print(f"  {label}Processed {row_count:,} rows...")
+
+    return agg, row_count
+
+
+def merge_entry(dst, src, employers=None, metros=None):
+    """Merge src into dst. Keeps the first non-empty title and first-seen key order.
+
+    employers/metros re-map src's counter items into dst's codes (Dictionary.remap()).
+    """
+    if not dst['soc_title']:
+        dst['soc_title'] = src['soc_title']
+    dst['total'] += src['total']
+    dst['certified'] += src['certified']
+    dst['denied'] += src['denied']
+    dst['withdrawn'] += src['withdrawn']
+    dst['prev_wages'].merge(src['prev_wages'])
+    dst['offered_wages'].merge(src['offered_wages'])
+    dst['employers'].merge(src['employers'] if employers is None else src['employers'].remap(employers))
+    dst['metros'].merge(src['metros'] if metros is None else src['metros'].remap(metros))
+
+
+def identity(codes):
+    return all(i == c for i, c in enumerate(codes))
+
+
+def merge_aggregates(parts):
+    """Merge partial aggregates (each with its own dictionaries) in row order into one aggregate."""
+    agg = None
+    for part in parts:
+        if agg is None:
+            agg = Aggregate(normalize_employers=part.normalize_employers)
+        socs, states = agg.socs.remap(part.socs), agg.states.remap(part.states)
+        employers, metros = agg.employers.remap(part.employers), agg.metros.remap(part.metros)
+        employers = None if identity(employers) else employers
+        metros = None if identity(metros) else metros
+        for key, e in part.items():
+            merge_entry(agg[socs[key >> KEY_BITS] << KEY_BITS | states[key & STATE_MASK]], e, employers, metros)
+    return Aggregate() if agg is None else agg
+
+
+def median_val(wages):
+    m = wage_median(wages)
+    return round(m) if m is not None else None
+
+
+def quartile_vals(wages):
+    """(p25, p75) of wages, rounded like median_val(); (None, None) when empty."""
+    q = wage_quantiles(wages, (0.25, 0.75))
+    return (round(q[0]), round(q[1])) if q else (None, None)
+
+
+def top_n(d, n=5):
+    return [k for k, v in sorted(d.items(), key=lambda x: -x[1])[:n]]
+
+
+def demand_row(agg, soc, state, e, fiscal_year):
+    """intel_h1b_demand row of an entry; agg decodes its employer/metro codes."""
+    p25, p75 = quartile_vals(e['offered_wages'])
+    return {
+        'soc_code': soc,
+        'soc_title': e['soc_title'],
+        'state': state,
+        'fiscal_year': fiscal_year,
+        'applications_total': e['total'],
+        'applications_certified': e['certified'],
+        'applications_denied': e['denied'],
+        'applications_withdrawn': e['withdrawn'],
+        'median_prevailing_wage': median_val(e['prev_wages']),
+        'median_offered_wage': median_val(e['offered_wages']),
+        'p25_offered_wage': p25,
+        'p75_offered_wage': p75,
+        'top_employers': [agg.employers.names[c] for c in top_n(e['employers'])],
+        'top_metro_areas': [agg.metros.names[c] for c in top_n(e['metros'])],
+        'source': 'dol_lca',
+    }
+
+
+def national_rollup(agg):
+    """Roll SOC × state entries up to SOC-level national entries, keyed by SOC code."""
+    nat = defaultdict(new_rollup_entry)
+    for key, e in agg.items():
+        merge_entry(nat[key >> KEY_BITS], e)
+    return nat
+
+
+def verify_top(agg, nat, rows, n=5):
+    """Exact-verification pass for bounded top counters.
+
+    Re-reads rows and recounts employers/metros exactly for every key whose
+    top n isn't certain, plus every key of a SOC whose national top n isn't
+    certain (whose national counters are then rebuilt from the exact ones).
+    Everything else is already guaranteed exact. Returns the recounted keys.
+    """
+    def certain(e):
+        return e['employers'].certain(n) and e['metros'].certain(n)
+
+    socs = {soc for soc, e in nat.items() if not certain(e)}
+    exact = {key: (TopCounter(), TopCounter()) for key, e in agg.items()
+             if key >> KEY_BITS in socs or not certain(e)}
+    if not exact:
+        return exact
+
+    for soc, state, _, _, employer, metro, _, _ in rows:
+        counters = exact.get(agg.key(soc, state))
+        if counters is None:
+            continue
+        e, m = agg.employers.encode(employer), agg.metros.encode(metro)
+        if e >= 0:
+            counters[0].add(e)
+        if m >= 0:
+            counters[1].add(m)
+
+    for key, (employers, metros) in exact.items():
+        agg[key]['employers'], agg[key]['metros'] = employers, metros
+    for soc in socs:
+        nat[soc]['employers'], nat[soc]['metros'] = TopCounter(), TopCounter()
+    for key, e in agg.items():
+        soc = key >> KEY_BITS
+        if soc in socs:
+            nat[soc]['employers'].merge(e['employers'])
+            nat[soc]['metros'].merge(e['metros'])
+    return exact
+
+
+def top_error(entries):
+    """(uncertain count, largest overcount bound) over entries' top counters."""
+    uncertain = bound = 0
+    for e in entries:
+        uncertain += not (e['employers'].certain() and e['metros'].certain())
+        bound = max(bound, e['employers'].floor, e['metros'].floor)
+    return uncertain, bound
+
+
+def build_rows(agg, fiscal_year, nat=None):
+    """Build (state_rows, nat_rows): state-level with 3+ applications, national with 5+.
+
+    nat is national_rollup(agg), when the caller already built it.
+    """
+    state_rows = []
+    for key, e in agg.items():
+        if e['total'] < 3:
+            continue
+        soc, state = agg.split(key)
+        state_rows.append(demand_row(agg, soc, state, e, fiscal_year))
+
+    nat_rows = []
+    for soc, e in (national_rollup(agg) if nat is None else nat).items():
+        if e['total'] < 5:
+            continue
+        nat_rows.append(demand_row(agg, agg.socs.names[soc], 'US', e, fiscal_year))
+
+    return state_rows, nat_rows
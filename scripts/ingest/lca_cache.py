@@ -0,0 +1,165 @@
+"""
+Columnar cache of projected LCA columns
+Re-runs of h1b-lca.py (after an upload error, a threshold change, ...) load
+the eight projected columns from here instead of decoding the xlsx again.
+
+Each column is stored dictionary-encoded: the distinct cell values (JSON)
+plus one unsigned integer code per row (raw array bytes). A cache file is
+keyed by the SHA-256 of the source file and the projected column spec, so
+editing/replacing the file or changing LCA_COLUMNS picks a new key and the
+stale entry is simply never read again.
+
+Layout: MAGIC, 8-byte little-endian header length, JSON header, then each
+column's code array back to back.
+"""
+
+import os
+import sys
+import json
+import struct
+import hashlib
+from array import array
+
+CACHE_VERSION = 1
+MAGIC = b'LCACOL1\n'
+DEFAULT_CACHE_DIR = os.path.expanduser('~/.cache/h1b-lca')
+
+
+def cache_key(digest, columns):
+    spec = json.dumps([CACHE_VERSION, digest, columns], separators=(',', ':'))
+    return hashlib.sha256(spec.encode()).hexdigest()[:32]
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f'{key}.lcacol')
+
+
+def smallest_typecode(n):
+    for tc in ('B', 'H', 'I', 'L', 'Q'):
+        if n <= 1 << (8 * array(tc).itemsize):
+            return tc
+    raise OverflowError(n)
+
+
+class ColumnBuilder:
+    """Dictionary-encodes projected row tuples column by column."""
+
+    def __init__(self, ncols):
+        self.values = [[] for _ in range(ncols)]
+        self.index = [{} for _ in range(ncols)]
+        self.codes = [array('I') for _ in range(ncols)]
+        self.row_count = 0
+
+    def add(self, row):
+        for values, index, codes, v in zip(self.values, self.index, self.codes, row):
+            # Strings are the common case; other values are keyed with their
+            # type so 1, 1.0 and True don't collapse into one code
+            k = v if v.__class__ is str else (v.__class__, v)
+            code = index.get(k)
+            if code is None:
+                code = index[k] = len(values)
+                values.append(v)
+            codes.append(code)
+        self.row_count += 1
+
+    def tee(self, rows):
+        """Pass rows through unchanged while encoding them."""
+        for row in rows:
+            self.add(row)
+            yield row
+
+    def extend(self, other):
+        """Append another builder's rows (e.g. the next shard), re-mapping its codes."""
+        for c, (values, codes) in enumerate(zip(other.values, other.codes)):
+            remap = array('I')
+            for v in values:
+                k = v if v.__class__ is str else (v.__class__, v)
+                code = self.index[c].get(k)
+                if code is None:
+                    code = self.index[c][k] = len(self.values[c])
+                    self.values[c].append(v)
+                remap.append(code)
+            self.codes[c].extend(map(remap.__getitem__, codes))
+        self.row_count += other.row_count
+
+    def rows(self):
+        """Decode the encoded row tuples again, in order."""
+        return zip(*(map(values.__getitem__, codes) for values, codes in zip(self.values, self.codes)))
+
+    def __getstate__(self):
+        # The lookup index is rebuilt on demand; don't ship it between processes
+        return {'values': self.values, 'codes': self.codes, 'row_count': self.row_count}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.index = [{(v if v.__class__ is str else (v.__class__, v)): i for i, v in enumerate(values)}
+                      for values in self.values]
+
+
+class CachedColumns:
+    def __init__(self, meta, values, codes):
+        self.meta = meta
+        self.values = values
+        self.codes = codes
+        self.row_count = meta['row_count']
+
+    def rows(self):
+        """Lazily decode row tuples in the original row order."""
+        return zip(*(map(values.__getitem__, codes) for values, codes in zip(self.values, self.codes)))
+
+
+def save(cache_dir, key, builder, meta):
+    """Write builder's columns atomically. Returns the cache file path."""
+    os.makedirs(cache_dir, exist_ok=True)
+    arrays = []
+    columns = []
+    for values, codes in zip(builder.values, builder.codes):
+        tc = smallest_typecode(len(values))
+        a = codes if tc == codes.typecode else array(tc, codes)
+        arrays.append(a)
+        columns.append({'values': values, 'typecode': tc, 'nbytes': len(a) * a.itemsize})
+    header = json.dumps({
+        **meta,
+        'version': CACHE_VERSION,
+        'byteorder': sys.byteorder,
+        'row_count': builder.row_count,
+        'columns': columns,
+    }, separators=(',', ':')).encode()
+
+    path = cache_path(cache_dir, key)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for a in arrays:
+            a.tofile(f)
+    os.replace(tmp, path)
+    return path
+
+
+def load(cache_dir, key):
+    """CachedColumns for key, or None on a miss / unreadable entry."""
+    path = cache_path(cache_dir, key)
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            (n,) = struct.unpack('<Q', f.read(8))
+            meta = json.loads(f.read(n))
+            if meta.get('version') != CACHE_VERSION:
+                return None
+            values, codes = [], []
+            for column in meta.pop('columns'):
+                a = array(column['typecode'])
+                a.frombytes(f.read(column['nbytes']))
+                if meta['byteorder'] != sys.byteorder:
+                    a.byteswap()
+                values.append(column['values'])
+                codes.append(a)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        print(f"  ⚠ Ignoring unreadable cache {path}: {e}")
+        return None
+    return CachedColumns(meta, values, codes)
@@ -0,0 +1,135 @@
+"""
+Checkpoints for resuming an interrupted h1b-lca.py run
+A run keeps its state under <cache-dir>/checkpoints/<project>/:
+
+  run.json            files, fiscal years and options of the run
+  <FY>.rows.json      the fiscal year's finished aggregate and national
+                      rollup, in their built intel_h1b_demand row form
+  <FY>.upload.jsonl   the upload plan (which rows to send, delta state),
+                      then one line per acknowledged batch: its row ranges
+
+--resume reloads run.json, skips parsing for every fiscal year whose rows
+were saved, and sends only rows no batch has acknowledged yet. Nothing is
+saved before a fiscal year's rows are built, so a run killed mid-scan
+redoes that fiscal year's aggregation (the column cache still spares
+re-decoding files that finished). The upload
+log is append-only, so a kill mid-write loses at most its last line (that
+batch is sent again, which upserts make harmless). The directory is
+removed once a run finishes with every row landed.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+CHECKPOINT_VERSION = 1
+
+
+def checkpoint_dir(cache_dir, supabase_url):
+    project = hashlib.sha1(supabase_url.encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, 'checkpoints', project)
+
+
+def to_ranges(indices):
+    """[3, 4, 5, 9] → [[3, 3], [9, 1]] (first, count) runs of sorted indices."""
+    runs = []
+    for i in indices:
+        if runs and runs[-1][0] + runs[-1][1] == i:
+            runs[-1][1] += 1
+        else:
+            runs.append([i, 1])
+    return runs
+
+
+def write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def read_json(path):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"  ⚠ Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    return data if data.get('version') == CHECKPOINT_VERSION else None
+
+
+class UploadLog:
+    """Append-only record of one fiscal year's upload: the plan, then acknowledged row ranges."""
+
+    def __init__(self, path):
+        self.path = path
+        self.plan = None
+        self.acked = set()
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # torn last line
+                    if 'plan' in entry:
+                        self.plan = entry['plan']
+                    for first, n in entry.get('acked', ()):
+                        self.acked.update(range(first, first + n))
+        except FileNotFoundError:
+            pass
+
+    def _append(self, entry):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, plan):
+        """Record the upload plan: {'upload': row indices or None (all), 'stale': keys, 'previous': fingerprints}."""
+        self.plan = plan
+        self._append({'plan': plan})
+
+    def ack(self, indices):
+        """Record rows (indices into the planned upload rows) as landed."""
+        self.acked.update(indices)
+        self._append({'acked': to_ranges(indices)})
+
+
+class Checkpoint:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def load_run(self):
+        """The unfinished run's description, or None."""
+        return read_json(self._path('run.json'))
+
+    def start(self, run):
+        """Begin a new run, discarding any previous checkpoint."""
+        self.clear()
+        os.makedirs(self.directory, exist_ok=True)
+        write_json(self._path('run.json'), {**run, 'version': CHECKPOINT_VERSION})
+
+    def save_rows(self, fiscal_year, meta, state_rows, nat_rows):
+        write_json(self._path(f'{fiscal_year}.rows.json'), {
+            **meta, 'version': CHECKPOINT_VERSION, 'state_rows': state_rows, 'nat_rows': nat_rows,
+        })
+
+    def load_rows(self, fiscal_year):
+        """(meta, state_rows, nat_rows) saved for the fiscal year, or None."""
+        data = read_json(self._path(f'{fiscal_year}.rows.json'))
+        if data is None:
+            return None
+        return data, data.pop('state_rows'), data.pop('nat_rows')
+
+    def upload_log(self, fiscal_year):
+        return UploadLog(self._path(f'{fiscal_year}.upload.jsonl'))
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
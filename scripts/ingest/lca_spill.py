@@ -0,0 +1,415 @@
+"""
+Disk-spilling LCA aggregation
+Backs h1b-lca.py --memory-budget. Rows are folded into an in-memory
+Aggregate exactly as aggregate_rows() does, but once the aggregate's
+estimated size passes the budget its entries are hash-partitioned by SOC
+code into spill files and folding starts over with an empty aggregate
+(same dictionaries, so codes stay valid). The estimate is checked every
+CHUNK (4,096) rows, so folding overshoots the budget by at most one chunk's
+keys and wages (about 3 MB), plus the dictionaries of distinct names.
+
+Building the rows loads one partition at a time, merges every piece of
+each of its keys in spill order, and runs build_rows() on that partition
+alone. A partition whose spilled size is estimated over the budget is
+split again (FAN_OUT ways, recursively) until its parts fit, so building
+holds about one budget's worth of entries. The bound it can't get under is
+the indivisible unit: partitions hold whole SOC codes, so each SOC's
+national rollup — whose exact median needs every wage of the SOC — is
+complete within one partition, and one SOC's keys (at most one per state)
+and all its wages are loaded together however large. Breakdowns, which
+have no national rollup, are partitioned by their whole key instead, so
+only a single key's entry is indivisible.
+
+Each partition's rows are written to a row file as soon as they are built,
+sorted by the (spill, position in that spill's dict) at which their key
+was first seen, and the row files are then k-way merged on that order
+(FAN_IN files at a time), which puts the rows back in the unspilled dict's
+order without holding them all to sort. The rows are identical to the
+in-memory path: pieces merge in row order (first non-empty title, exact
+counters in first-seen order).
+
+An input that never passes the budget never touches disk: aggregate_rows()
+then returns the plain Aggregate, and merge_parts() merges plain parts in
+memory while they fit.
+
+build_breakdown() runs finer breakdowns (BREAKDOWNS: SOC × state × county,
+SOC × employer) through the same path: the breakdown's detail columns are
+folded into the state slot of each row, so their far larger key counts
+spill like SOC × state keys do, and the rows stream out of the merge.
+
+    agg, n = aggregate_rows(rows, 512 << 20, '/var/tmp')
+    agg = merge_parts([agg, other], 512 << 20, '/var/tmp')   # shards / files, in row order
+    if isinstance(agg, SpilledAggregate):
+        state_rows, nat_rows = agg.build_rows('FY2025')
+        agg.close()
+"""
+
+import os
+import zlib
+import heapq
+import pickle
+import shutil
+import tempfile
+from itertools import islice
+from operator import itemgetter
+
+import lca_aggregate
+from lca_aggregate import (Aggregate, KEY_BITS, STATE_MASK, merge_entry, merge_aggregates, identity, build_rows,
+                           clean_text)
+
+# Size estimate of the in-memory aggregate (measured on synthetic disclosure
+# data; the dictionaries, bounded by distinct names rather than keys, aren't counted)
+KEY_BYTES = 700   # an entry with its empty wage samples and counters
+ROW_BYTES = 120   # two wages, plus at worst a new employer and metro counter item
+CHUNK = 1 << 12   # rows folded between size checks
+PARTITIONS = 32   # per spill; partitions over the budget are split again while building
+FAN_OUT = 64      # most partitions one oversized partition is split into
+MAX_SPLIT_DEPTH = 8
+FAN_IN = 256      # sorted row files merged at once
+MASK64 = (1 << 64) - 1
+
+# Finer breakdowns: name → (fields replacing 'state' in the rows, the LCA_COLUMNS
+# positions they come from, the top list dropped because it would only repeat them)
+BREAKDOWNS = {
+    'county': (('state', 'county'), (1, 5), 'top_metro_areas'),
+    'employer': (('employer',), (4,), 'top_employers'),
+}
+
+
+def estimate(keys, rows):
+    return keys * KEY_BYTES + rows * ROW_BYTES
+
+
+def size(agg):
+    """Estimated bytes of an in-memory Aggregate."""
+    return estimate(len(agg), sum(e['total'] for e in agg.values()))
+
+
+def partition_of(soc, partitions):
+    # crc32, not hash(): spills written by worker processes must agree
+    return zlib.crc32(soc.encode()) % partitions
+
+
+def mix(code, salt):
+    """splitmix64 of an int code, salted so each level of a split buckets differently.
+
+    Not crc32 (a salt would only permute its buckets) nor hash() (its low
+    bits barely change between neighbouring keys).
+    """
+    x = (code + salt * 0x9e3779b97f4a7c15) & MASK64
+    x = (x ^ x >> 30) * 0xbf58476d1ce4e5b9 & MASK64
+    x = (x ^ x >> 27) * 0x94d049bb133111eb & MASK64
+    return x ^ x >> 31
+
+
+def compose(inner, outer):
+    """Remap tables applying inner, then outer (either may be None for identity)."""
+    if inner is None or outer is None:
+        return outer if inner is None else inner
+    return tuple([o[c] for c in i] for i, o in zip(inner, outer))
+
+
+class SpilledAggregate:
+    """SOC × state (or SOC × breakdown detail) entries spilled to per-partition files.
+
+    Each run is one spill: {partition: (path, estimated bytes)} plus the code
+    remap tables (socs, states, employers, metros) into this aggregate's
+    dictionaries, or None when the run was written with them. by_key
+    partitions by the whole key instead of by SOC (there's no national
+    rollup then). Partitions estimated over budget are split again while
+    building.
+    """
+
+    def __init__(self, spill_dir=None, partitions=PARTITIONS, like=None, normalize_employers=False, budget=0,
+                 by_key=False):
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='lca-spill-', dir=spill_dir)
+        self.directories = [self.directory]
+        self.partitions = partitions
+        self.budget = budget
+        self.by_key = by_key
+        like = like or Aggregate(normalize_employers=normalize_employers)
+        self.normalize_employers = like.normalize_employers
+        self.socs, self.states, self.employers, self.metros = like.socs, like.states, like.employers, like.metros
+        self.runs = []
+        self.pieces = 0
+        self.files = 0     # files written to self.directory, for unique names
+        self.splits = 0    # partitions split again because they didn't fit the budget
+        self.keys = None   # distinct keys, known once the rows are built
+        self.largest = 0   # estimated bytes of the largest partition loaded
+
+    def _write(self, prefix, pieces):
+        """Pickle pieces to a new file. Returns (path, estimated in-memory bytes)."""
+        path = os.path.join(self.directory, f'{prefix}-{self.files:06d}.pickle')
+        self.files += 1
+        with open(path, 'wb') as f:
+            pickle.dump(pieces, f, pickle.HIGHEST_PROTOCOL)
+        return path, estimate(len(pieces), sum(e['total'] for _, _, e in pieces))
+
+    def spill(self, agg, remap=None):
+        """Write agg's entries as one run (agg's codes, remap into ours)."""
+        socs, states = agg.socs.names, agg.states.names
+        if self.by_key:
+            def part_of(key):
+                return partition_of(f'{socs[key >> KEY_BITS]}\t{states[key & STATE_MASK]}', self.partitions)
+        else:
+            of_soc = [partition_of(name, self.partitions) for name in socs]
+
+            def part_of(key):
+                return of_soc[key >> KEY_BITS]
+        parts = [[] for _ in range(self.partitions)]
+        for pos, (key, e) in enumerate(agg.items()):
+            parts[part_of(key)].append((pos, key, e))
+        self.runs.append(({p: self._write(f'run{len(self.runs):04d}-p{p:03d}', pieces)
+                           for p, pieces in enumerate(parts) if pieces}, remap))
+        self.pieces += len(agg)
+
+    def absorb(self, part):
+        """Append a later part (Aggregate or SpilledAggregate with its own dictionaries)."""
+        tables = tuple(mine.remap(theirs) for mine, theirs in ((self.socs, part.socs), (self.states, part.states),
+                                                                (self.employers, part.employers),
+                                                                (self.metros, part.metros)))
+        remap = None if all(map(identity, tables)) else tables
+        if isinstance(part, Aggregate):
+            self.spill(part, remap)
+            return
+        if (part.partitions, part.by_key) != (self.partitions, self.by_key):
+            raise ValueError(f'cannot merge {part.partitions} spill partitions (by_key={part.by_key}) '
+                             f'into {self.partitions} (by_key={self.by_key})')
+        for paths, inner in part.runs:
+            self.runs.append((paths, compose(inner, remap)))
+        self.pieces += part.pieces
+        self.directories += part.directories
+
+    def _pieces(self, path, remap):
+        """A spill file's (pos, key, entry) pieces, keys and counter items in our codes."""
+        with open(path, 'rb') as f:
+            pieces = pickle.load(f)
+        if remap:
+            socs, states, employers, metros = remap
+            employers = None if identity(employers) else employers
+            metros = None if identity(metros) else metros
+            for i, (pos, key, e) in enumerate(pieces):
+                if employers:
+                    e['employers'] = e['employers'].remap(employers)
+                if metros:
+                    e['metros'] = e['metros'].remap(metros)
+                pieces[i] = (pos, socs[key >> KEY_BITS] << KEY_BITS | states[key & STATE_MASK], e)
+        return pieces
+
+    def _partitions(self):
+        """Each spill partition's files: (run, path, estimated bytes, remap) in run order."""
+        for p in range(self.partitions):
+            files = [(run, *paths[p], remap) for run, (paths, remap) in enumerate(self.runs) if p in paths]
+            if files:
+                yield files
+
+    def _fitting(self, files, depth=1):
+        """files as partitions whose estimate fits the budget, splitting them again (recursively) when it doesn't.
+
+        What can't be split — one SOC, or with by_key one key — is one partition however large.
+        """
+        total = sum(size for _, _, size, _ in files)
+        if not self.budget or total <= self.budget or depth > MAX_SPLIT_DEPTH:
+            yield files
+            return
+        n = min(FAN_OUT, 2 * -(-total // self.budget))
+        split, self.splits = self.splits, self.splits + 1
+        subs, units = [[] for _ in range(n)], set()
+        for run, path, _, remap in files:
+            parts = [[] for _ in range(n)]
+            for piece in self._pieces(path, remap):
+                unit = piece[1] if self.by_key else piece[1] >> KEY_BITS
+                units.add(unit)
+                parts[mix(unit, depth) % n].append(piece)
+            for s, pieces in enumerate(parts):
+                if pieces:
+                    subs[s].append((run, *self._write(f'split{split:05d}-s{s:02d}', pieces), None))
+            if depth > 1:
+                os.remove(path)  # an earlier split's file, superseded by this one's
+        subs = [sub for sub in subs if sub]
+        if len(units) == 1:
+            yield subs[0]
+            return
+        for sub in subs:
+            yield from self._fitting(sub, depth + 1)
+
+    def _load(self, files):
+        """(Aggregate of the files' keys in first-seen order, {key: (run, position)})."""
+        entries, first = {}, {}
+        for run, path, _, remap in files:
+            for pos, key, e in self._pieces(path, remap):
+                dst = entries.get(key)
+                if dst is not None:
+                    merge_entry(dst, e)
+                    continue
+                entries[key], first[key] = e, (run, pos)
+        agg = Aggregate(normalize_employers=self.normalize_employers)
+        agg.socs, agg.states, agg.employers, agg.metros = self.socs, self.states, self.employers, self.metros
+        for key in sorted(entries, key=first.__getitem__):
+            agg[key] = entries[key]
+        return agg, first
+
+    def _write_records(self, records):
+        """Write (order, row) records, one pickle each, to a new row file. Returns its path."""
+        path = os.path.join(self.directory, f'rows-{self.files:06d}.pickle')
+        self.files += 1
+        with open(path, 'wb') as f:
+            for record in records:
+                pickle.dump(record, f, pickle.HIGHEST_PROTOCOL)
+        return path
+
+    def write_rows(self, fiscal_year, national=True):
+        """Build the rows one partition at a time into row files, each sorted by first-seen order.
+
+        Returns (state row files, national row files); national=False skips
+        the national rollup (no national files then).
+        """
+        state_files, nat_files, self.keys = [], [], 0
+        for part in self._partitions():
+            for files in self._fitting(part):
+                self.largest = max(self.largest, sum(size for _, _, size, _ in files))
+                agg, first = self._load(files)
+                self.keys += len(agg)
+                order = {agg.split(key): seq for key, seq in first.items()}
+                rows, nat = build_rows(agg, fiscal_year, None if national else {})
+                if rows:
+                    state_files.append(self._write_records(
+                        sorted(((order[r['soc_code'], r['state']], r) for r in rows), key=itemgetter(0))))
+                if nat:
+                    soc_order = {}
+                    for (soc, _), seq in order.items():
+                        soc_order[soc] = min(seq, soc_order.get(soc, seq))
+                    nat_files.append(self._write_records(
+                        sorted(((soc_order[r['soc_code']], r) for r in nat), key=itemgetter(0))))
+                # Drop this partition before the next one loads
+                del agg, first, order, rows, nat
+        return state_files, nat_files
+
+    def merged(self, paths):
+        """Rows of sorted row files, k-way merged on first-seen order (in passes of FAN_IN files)."""
+        while len(paths) > FAN_IN:
+            paths = [self._write_records(heapq.merge(*map(read_records, paths[i:i + FAN_IN]), key=itemgetter(0)))
+                     for i in range(0, len(paths), FAN_IN)]
+        for _, row in heapq.merge(*map(read_records, paths), key=itemgetter(0)):
+            yield row
+
+    def build_rows(self, fiscal_year, national=True):
+        """(state_rows, nat_rows) as lca_aggregate.build_rows() gives them, one partition in memory at a time."""
+        state_files, nat_files = self.write_rows(fiscal_year, national)
+        return list(self.merged(state_files)), list(self.merged(nat_files))
+
+    def stream_rows(self, fiscal_year):
+        """The state rows (no national rollup) in first-seen order, streamed from disk; closes the aggregate after."""
+        try:
+            yield from self.merged(self.write_rows(fiscal_year, national=False)[0])
+        finally:
+            self.close()
+
+    def close(self):
+        """Remove the spill files (this aggregate's and every absorbed part's)."""
+        for d in self.directories:
+            shutil.rmtree(d, ignore_errors=True)
+
+
+def read_records(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def aggregate_rows(rows, budget, spill_dir=None, label='', capacity=0, normalize_employers=False,
+                   partitions=PARTITIONS, by_key=False):
+    """lca_aggregate.aggregate_rows() within a memory budget (bytes; 0 = unbounded). Returns (agg, row_count).
+
+    agg is a plain Aggregate unless it passed the budget, then a SpilledAggregate
+    (partitioned by the whole key with by_key, for rows that need no national rollup).
+    """
+    if not budget:
+        return lca_aggregate.aggregate_rows(rows, label=label, capacity=capacity,
+                                            normalize_employers=normalize_employers)
+    if capacity:
+        raise ValueError('spilled aggregates need exact top counters (capacity 0)')
+    agg, spilled = Aggregate(normalize_employers=normalize_employers), None
+    rows = iter(rows)
+    row_count = since = 0
+    while True:
+        chunk = list(islice(rows, CHUNK))
+        if not chunk:
+            break
+        _, n = lca_aggregate.aggregate_rows(chunk, agg)
+        if (row_count + n) // 100000 > row_count // 100000:
+            print(f"  {label}Processed {row_count + n:,} rows...")
+        row_count += n
+        since += n
+        if estimate(len(agg), since) > budget:
+            if spilled is None:
+                spilled = SpilledAggregate(spill_dir, partitions, like=agg, budget=budget, by_key=by_key)
+            spilled.spill(agg)
+            agg.clear()
+            since = 0
+    if spilled is None:
+        return agg, row_count
+    if agg:
+        spilled.spill(agg)
+    return spilled, row_count
+
+
+def merge_parts(parts, budget, spill_dir=None, partitions=PARTITIONS):
+    """merge_aggregates() for parts (in row order) that may have spilled.
+
+    Plain parts that fit the budget together are merged in memory; otherwise
+    every part is appended, in order, to one SpilledAggregate.
+    """
+    parts = list(parts)
+    if not budget or (all(isinstance(p, Aggregate) for p in parts) and sum(map(size, parts)) <= budget):
+        return merge_aggregates(parts)
+    spilled = next((p for p in parts if isinstance(p, SpilledAggregate)), None)
+    merged = SpilledAggregate(spill_dir, spilled.partitions if spilled else partitions,
+                              normalize_employers=parts[0].normalize_employers, budget=budget,
+                              by_key=spilled.by_key if spilled else False)
+    for part in parts:
+        merged.absorb(part)
+    return merged
+
+
+# ── Finer breakdowns ──────────────────────────────────
+def breakdown_rows(rows, breakdown):
+    """Projected rows with the breakdown's detail ('CA\tLOS ANGELES') in the state slot; None when any part is blank."""
+    _, columns, _ = BREAKDOWNS[breakdown]
+    for row in rows:
+        parts = [clean_text(row[i]) for i in columns]
+        yield (row[0], '\t'.join(parts) if all(parts) else None) + tuple(row[2:])
+
+
+def breakdown_row(row, fields, repeated):
+    """A demand row of a breakdown: its detail split into fields in place of 'state', without the repeated top list."""
+    out = {}
+    for k, v in row.items():
+        if k == 'state':
+            out.update(zip(fields, v.split('\t')))
+        elif k != repeated:
+            out[k] = v
+    return out
+
+
+def build_breakdown(rows, breakdown, fiscal_year, budget=0, spill_dir=None, normalize_employers=False):
+    """Rows of a BREAKDOWNS breakdown of projected LCA rows, aggregated within budget bytes like aggregate_rows().
+
+    Returns (rows, row_count, spills). rows is an iterator of demand rows
+    with the breakdown's fields in place of 'state' (3+ applications each;
+    no national rows); when the aggregate spilled (spills > 0) they stream
+    from its sorted row files, which are removed once rows is exhausted.
+    """
+    fields, _, repeated = BREAKDOWNS[breakdown]
+    agg, row_count = aggregate_rows(breakdown_rows(rows, breakdown), budget, spill_dir,
+                                    normalize_employers=normalize_employers, by_key=True)
+    if isinstance(agg, SpilledAggregate):
+        spills, detail_rows = len(agg.runs), agg.stream_rows(fiscal_year)
+    else:
+        spills, detail_rows = 0, build_rows(agg, fiscal_year, {})[0]
+    return (breakdown_row(r, fields, repeated) for r in detail_rows), row_count, spills
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Synthetic LCA disclosure data
+Writes workbooks (or CSV/TSV) shaped like the DOL OFLC disclosure files so
+h1b-lca.py can be benchmarked repeatably without the real downloads:
+
+  - the disclosure header layout (SOC_CODE at H, EMPLOYER_NAME at T, the
+    worksite and wage columns further right), padded to --width columns
+  - Zipf-skewed SOC codes, employers and worksite counties, with a
+    configurable number of distinct values of each
+  - a mostly-certified status mix, log-normal wages per SOC, a share of
+    hourly wages and a share of messy cells ("$85,000.00", blanks, SOC
+    codes without .00)
+  - decision dates inside the requested fiscal quarter, so the fiscal
+    year can be inferred from the contents as well as the file name
+
+Usage: python3 scripts/ingest/lca_synth.py OUT.xlsx|OUT.csv[.gz]|OUT.tsv[.gz] [--rows N] [--seed S] ...
+
+The same arguments and seed always produce the same file. Cells are
+written the way Excel does (shared strings, numbers as <v>), except the
+unique case numbers, which are inline strings so the shared string table
+stays bounded by the value cardinality.
+"""
+
+import os
+import csv
+import gzip
+import json
+import math
+import hashlib
+import random
+import zipfile
+import argparse
+from bisect import bisect
+from datetime import date, timedelta
+from itertools import accumulate, chain
+from xml.sax.saxutils import escape
+
+from xlsx_stream import column_letters
+
+# Disclosure file columns (FY2020+ layout), up to the last one h1b-lca.py reads
+HEADERS = [
+    'CASE_NUMBER', 'CASE_STATUS', 'RECEIVED_DATE', 'DECISION_DATE', 'ORIGINAL_CERT_DATE', 'VISA_CLASS',
+    'JOB_TITLE', 'SOC_CODE', 'SOC_TITLE', 'FULL_TIME_POSITION', 'BEGIN_DATE', 'END_DATE',
+    'TOTAL_WORKER_POSITIONS', 'NEW_EMPLOYMENT', 'CONTINUED_EMPLOYMENT', 'CHANGE_PREVIOUS_EMPLOYMENT',
+    'NEW_CONCURRENT_EMPLOYMENT', 'CHANGE_EMPLOYER', 'AMENDED_PETITION', 'EMPLOYER_NAME', 'TRADE_NAME_DBA',
+    'EMPLOYER_ADDRESS1', 'EMPLOYER_CITY', 'EMPLOYER_STATE', 'EMPLOYER_POSTAL_CODE', 'EMPLOYER_COUNTRY',
+    'EMPLOYER_PHONE', 'NAICS_CODE', 'AGENT_REPRESENTING_EMPLOYER', 'WORKSITE_WORKERS', 'SECONDARY_ENTITY',
+    'WORKSITE_ADDRESS1', 'WORKSITE_CITY', 'WORKSITE_COUNTY', 'WORKSITE_STATE', 'WORKSITE_POSTAL_CODE',
+    'WAGE_RATE_OF_PAY_FROM', 'WAGE_RATE_OF_PAY_TO', 'WAGE_UNIT_OF_PAY', 'PREVAILING_WAGE', 'PW_UNIT_OF_PAY',
+    'PW_WAGE_LEVEL', 'PW_OES_YEAR', 'H_1B_DEPENDENT', 'WILLFUL_VIOLATOR', 'PUBLIC_DISCLOSURE',
+]
+# Trailing columns of the real files, used to pad the sheet to --width
+PADDING = [
+    'AGENT_ATTORNEY_LAST_NAME', 'AGENT_ATTORNEY_FIRST_NAME', 'AGENT_ATTORNEY_CITY', 'AGENT_ATTORNEY_STATE',
+    'LAWFIRM_NAME_BUSINESS_NAME', 'STATE_OF_HIGHEST_COURT', 'PREPARER_LAST_NAME', 'PREPARER_FIRST_NAME',
+    'PREPARER_BUSINESS_NAME', 'APPENDIX_A_ATTACHED', 'SUPPORT_H1B', 'STATUTORY_BASIS',
+    'EMPLOYER_POC_JOB_TITLE', 'EMPLOYER_POC_CITY', 'EMPLOYER_POC_STATE', 'ALTERNATE_PW_SOURCE',
+]
+
+# Highest-volume H-1B occupations first; the rest are generated
+TOP_SOCS = [
+    ('15-1252', 'Software Developers'), ('15-1211', 'Computer Systems Analysts'),
+    ('15-1299', 'Computer Occupations, All Other'), ('15-2051', 'Data Scientists'),
+    ('15-1212', 'Information Security Analysts'), ('17-2072', 'Electronics Engineers, Except Computer'),
+    ('13-2011', 'Accountants and Auditors'), ('15-1253', 'Software Quality Assurance Analysts and Testers'),
+    ('11-3021', 'Computer and Information Systems Managers'), ('17-2141', 'Mechanical Engineers'),
+    ('13-1111', 'Management Analysts'), ('15-1242', 'Database Administrators'),
+    ('29-1141', 'Registered Nurses'), ('25-1071', 'Health Specialties Teachers, Postsecondary'),
+    ('19-1042', 'Medical Scientists, Except Epidemiologists'), ('17-2051', 'Civil Engineers'),
+]
+# Roughly the H-1B worksite share order; the first ones take most rows
+STATES = [
+    'CA', 'TX', 'NY', 'NJ', 'WA', 'IL', 'MA', 'GA', 'PA', 'NC', 'FL', 'VA', 'MI', 'OH', 'MN', 'MD', 'AZ',
+    'CO', 'CT', 'MO', 'WI', 'TN', 'IN', 'OR', 'UT', 'DE', 'DC', 'KY', 'SC', 'IA', 'AL', 'KS', 'LA', 'NE',
+    'AR', 'OK', 'NV', 'RI', 'NH', 'NM', 'MS', 'ID', 'WV', 'ME', 'HI', 'ND', 'SD', 'VT', 'MT', 'WY', 'AK',
+    'PR', 'GU', 'VI', 'MP',
+]
+WORDS = [
+    'Apex', 'Blue', 'Cedar', 'Delta', 'Eagle', 'Falcon', 'Granite', 'Harbor', 'Iron', 'Juniper', 'Keystone',
+    'Lakeside', 'Maple', 'Northern', 'Orion', 'Pioneer', 'Quantum', 'River', 'Summit', 'Tri-State',
+    'Union', 'Valley', 'Western', 'Zenith',
+]
+KINDS = ['Technologies', 'Systems', 'Consulting', 'Solutions', 'Health', 'Labs', 'Analytics', 'Software',
+         'Partners', 'Networks', 'University', 'Infotech']
+SUFFIXES = ['Inc.', 'LLC', 'Corp.', 'Ltd.', 'Inc', 'LLP']
+STATUSES = [('Certified', 0.93), ('Certified - Withdrawn', 0.04), ('Withdrawn', 0.02), ('Denied', 0.01)]
+
+GENERATOR_VERSION = 1  # bump when the same options would produce different rows
+EXCEL_EPOCH = date(1899, 12, 30)
+SHEET_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+
+
+def zipf_cum(n, s=1.1):
+    """Cumulative Zipf(s) weights over n ranks, for bisect sampling."""
+    return list(accumulate(1 / (k ** s) for k in range(1, n + 1)))
+
+
+def pick(rnd, cum):
+    return bisect(cum, rnd.random() * cum[-1])
+
+
+def word_name(i, parts, sep=' '):
+    """Deterministic multi-word name for index i."""
+    out = []
+    for options in parts:
+        i, r = divmod(i, len(options))
+        out.append(options[r])
+    if i:
+        out.insert(1, str(i))
+    return sep.join(out)
+
+
+def quarter_dates(fiscal_year, quarter):
+    """First and last day of a federal fiscal quarter (Q1 = October–December)."""
+    month = (quarter - 1) * 3 + 10
+    year = fiscal_year - 1 + (month > 12)
+    month = (month - 1) % 12 + 1
+    start = date(year, month, 1)
+    end = date(year + (month + 3 > 12), (month + 2) % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+class LcaGenerator:
+    """Rows of synthetic disclosure data, as lists of cell values in header order."""
+
+    def __init__(self, socs=800, states=55, employers=60000, counties=1500, hourly_share=0.05,
+                 wage_sigma=0.35, messy=0.01, fiscal_year=2025, quarter=4, width=len(HEADERS) + len(PADDING), seed=0):
+        self.rnd = random.Random(seed)
+        rnd = random.Random(seed + 1)  # fixed vocabularies don't depend on the row count
+        self.hourly_share = hourly_share
+        self.wage_sigma = wage_sigma
+        self.messy = messy
+        self.headers = (HEADERS + PADDING)[:max(width, HEADERS.index('PREVAILING_WAGE') + 1)]
+        self.headers += [f'COLUMN_{i}' for i in range(len(self.headers), width)]
+
+        self.socs = TOP_SOCS[:socs]
+        codes = {c for c, _ in self.socs}
+        while len(self.socs) < socs:
+            code = f'{rnd.choice((11, 13, 15, 17, 19, 25, 27, 29))}-{rnd.randrange(1000, 10000)}'
+            if code not in codes:
+                codes.add(code)
+                self.socs.append((code, f'Occupation {len(self.socs) + 1}'))
+        # Median annual wage per SOC, ~$55k–$210k
+        self.soc_mu = [math.log(rnd.uniform(55000, 210000)) for _ in self.socs]
+        self.soc_cum = zipf_cum(len(self.socs), 1.2)
+        self.states = STATES[:states]
+        self.state_cum = zipf_cum(len(self.states), 1.0)
+        self.employers = [word_name(i, (WORDS, KINDS, SUFFIXES)) for i in range(employers)]
+        self.employer_cum = zipf_cum(employers, 1.05)
+        per_state = max(1, counties // len(self.states))
+        self.counties = [[word_name(i * 7 + s, (WORDS, ['', 'HILLS', 'PARK', 'FALLS', 'POINT'])).strip().upper()
+                          for i in range(per_state)] for s in range(len(self.states))]
+        self.county_cum = zipf_cum(per_state, 1.3)
+        self.status_cum = list(accumulate(w for _, w in STATUSES))
+
+        start, end = quarter_dates(fiscal_year, quarter)
+        self.first_day = (start - EXCEL_EPOCH).days
+        self.days = (end - start).days + 1
+        self.case_prefix = f'I-200-{fiscal_year % 100:02d}'
+
+    def rows(self, n):
+        rnd = self.rnd
+        hourly_share, messy, sigma = self.hourly_share, self.messy, self.wage_sigma
+        layout = self.headers
+        for i in range(n):
+            s = pick(rnd, self.soc_cum)
+            soc, title = self.socs[s]
+            st = pick(rnd, self.state_cum)
+            decided = self.first_day + rnd.randrange(self.days)
+            offered = round(math.exp(rnd.gauss(self.soc_mu[s], sigma)), -2)
+            prevailing = round(offered * rnd.uniform(0.72, 1.0), 2)
+            unit = 'Year'
+            if rnd.random() < hourly_share:
+                offered, prevailing, unit = round(offered / 2080, 2), round(prevailing / 2080, 2), 'Hour'
+            kind = rnd.randrange(3) if messy and rnd.random() < messy else None
+            # What the real files occasionally hold instead of clean cells
+            if kind == 0:
+                offered = f'${offered:,.2f}'
+            elif kind == 1:
+                prevailing = None
+            if kind != 2:
+                soc += '.00'
+            values = {
+                'CASE_NUMBER': f'{self.case_prefix}{decided % 1000:03d}-{i:07d}',
+                'CASE_STATUS': STATUSES[bisect(self.status_cum, rnd.random() * self.status_cum[-1])][0],
+                'RECEIVED_DATE': decided - 7 - rnd.randrange(4),
+                'DECISION_DATE': decided,
+                'VISA_CLASS': 'H-1B',
+                'JOB_TITLE': title.upper(),
+                'SOC_CODE': soc,
+                'SOC_TITLE': title,
+                'FULL_TIME_POSITION': 'Y',
+                'TOTAL_WORKER_POSITIONS': 1,
+                'EMPLOYER_NAME': self.employers[pick(rnd, self.employer_cum)],
+                'WORKSITE_COUNTY': self.counties[st][pick(rnd, self.county_cum)],
+                'WORKSITE_STATE': self.states[st],
+                'WAGE_RATE_OF_PAY_FROM': offered,
+                'WAGE_UNIT_OF_PAY': unit,
+                'PREVAILING_WAGE': prevailing,
+                'PW_UNIT_OF_PAY': unit,
+                'PW_WAGE_LEVEL': ('I', 'II', 'III', 'IV')[i % 4],
+                'H_1B_DEPENDENT': 'No',
+                'WILLFUL_VIOLATOR': 'No',
+            }
+            yield [values.get(h) for h in layout]
+
+
+def write_xlsx(path, gen, n):
+    """Stream n rows into a single-sheet workbook."""
+    strings = {}
+    case_column = gen.headers.index('CASE_NUMBER')
+
+    def cell(ref, c, v):
+        if v is None:
+            return ''
+        if isinstance(v, str):
+            if c == case_column:
+                # Unique per row: inline, keeps the shared table small
+                return f'<c r="{ref}" t="inlineStr"><is><t>{escape(v)}</t></is></c>'
+            code = strings.get(v)
+            if code is None:
+                code = strings[v] = len(strings)
+            return f'<c r="{ref}" t="s"><v>{code}</v></c>'
+        return f'<c r="{ref}"><v>{v}</v></c>'
+
+    letters = [column_letters(i) for i in range(len(gen.headers))]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        zf.writestr('[Content_Types].xml',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                    '<Default Extension="xml" ContentType="application/xml"/>'
+                    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+                    '</Types>')
+        zf.writestr('_rels/.rels',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+                    '</Relationships>')
+        zf.writestr('xl/workbook.xml',
+                    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><workbook xmlns="{SHEET_NS}" '
+                    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+                    '<sheets><sheet name="LCA_Disclosure_Data" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        zf.writestr('xl/_rels/workbook.xml.rels',
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+                    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+                    '</Relationships>')
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><worksheet xmlns="{SHEET_NS}">'
+                         f'<dimension ref="A1:{letters[-1]}{n + 1}"/><sheetData>').encode())
+            buf = []
+            for r, values in enumerate(chain([gen.headers], gen.rows(n)), 1):
+                buf.append(f'<row r="{r}">' + ''.join(cell(f'{l}{r}', c, v) for c, (l, v) in enumerate(zip(letters, values)))
+                           + '</row>')
+                if len(buf) >= 2000:
+                    sheet.write(''.join(buf).encode())
+                    buf = []
+            sheet.write((''.join(buf) + '</sheetData></worksheet>').encode())
+
+        with zf.open('xl/sharedStrings.xml', 'w', force_zip64=True) as sst:
+            sst.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                      f'<sst xmlns="{SHEET_NS}" uniqueCount="{len(strings)}">'.encode())
+            sst.write(''.join(f'<si><t>{escape(s)}</t></si>' for s in strings).encode())
+            sst.write(b'</sst>')
+
+
+def write_delimited(path, gen, n, delimiter=',', compress=False):
+    """n rows as CSV/TSV (gzipped with compress); dates as YYYY-MM-DD, like the DOL CSV exports."""
+    dates = {i for i, h in enumerate(gen.headers) if h.endswith('_DATE')}
+    with (gzip.open(path, 'wt', newline='') if compress else open(path, 'w', newline='')) as f:
+        w = csv.writer(f, delimiter=delimiter)
+        w.writerow(gen.headers)
+        for values in gen.rows(n):
+            for i in dates:
+                if values[i] is not None:
+                    values[i] = (EXCEL_EPOCH + timedelta(days=values[i])).isoformat()
+            w.writerow(values)
+
+
+def generate(path, rows, **options):
+    """Write rows of synthetic data to path; the format follows the extension (.xlsx, .csv, .tsv, .csv.gz, .tsv.gz)."""
+    gen = LcaGenerator(**options)
+    compress = path.lower().endswith('.gz')
+    ext = os.path.splitext(path[:-3] if compress else path)[1].lower()
+    tmp = f'{path}.{os.getpid()}.tmp'
+    if ext == '.xlsx' and not compress:
+        write_xlsx(tmp, gen, rows)
+    elif ext in ('.csv', '.tsv'):
+        write_delimited(tmp, gen, rows, '\t' if ext == '.tsv' else ',', compress)
+    else:
+        raise ValueError(f'{path}: expected .xlsx, .csv, .tsv, .csv.gz or .tsv.gz')
+    os.replace(tmp, path)
+    return path
+
+
+def cache_tag(options):
+    """Short digest of the generator version and options, for naming reusable generated files."""
+    spec = json.dumps([GENERATOR_VERSION, sorted(options.items())])
+    return hashlib.sha1(spec.encode()).hexdigest()[:8]
+
+
+def parse_count(s):
+    """'100k' → 100000, '5M' → 5000000"""
+    s = s.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(s[-1:], 1)
+    return int(float(s[:-1] if scale > 1 else s) * scale)
+
+
+def add_arguments(parser):
+    """Generator options, shared with the benchmark harness."""
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--socs', type=int, default=800, help='distinct SOC codes (default: 800)')
+    parser.add_argument('--states', type=int, default=55, help=f'distinct worksite states, max {len(STATES)} (default: 55)')
+    parser.add_argument('--employers', type=int, default=60000, help='distinct employers (default: 60000)')
+    parser.add_argument('--counties', type=int, default=1500, help='distinct worksite counties (default: 1500)')
+    parser.add_argument('--hourly-share', type=float, default=0.05, help='share of rows with hourly wages (default: 0.05)')
+    parser.add_argument('--wage-sigma', type=float, default=0.35, help='log-normal wage spread within a SOC (default: 0.35)')
+    parser.add_argument('--messy', type=float, default=0.01,
+                        help='share of rows with a formatted wage, blank wage or bare SOC code (default: 0.01)')
+    parser.add_argument('--fiscal-year', type=int, default=2025)
+    parser.add_argument('--quarter', type=int, choices=[1, 2, 3, 4], default=4)
+    parser.add_argument('--width', type=int, default=len(HEADERS) + len(PADDING),
+                        help=f'sheet width in columns (default: {len(HEADERS) + len(PADDING)})')
+
+
+def generator_options(args):
+    return {k: getattr(args, k) for k in ('seed', 'socs', 'states', 'employers', 'counties', 'hourly_share',
+                                          'wage_sigma', 'messy', 'fiscal_year', 'quarter', 'width')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic LCA disclosure file (xlsx, csv or tsv, optionally gzipped)')
+    parser.add_argument('out', nargs='?', help='output path (default: LCA_Disclosure_Data_FY<year>_Q<q>_synthetic_<rows>.xlsx)')
+    parser.add_argument('--rows', type=parse_count, default=100000, help='data rows, e.g. 100k or 5M (default: 100k)')
+    add_arguments(parser)
+    args = parser.parse_args()
+    out = args.out or f'LCA_Disclosure_Data_FY{args.fiscal_year}_Q{args.quarter}_synthetic_{args.rows}.xlsx'
+    print(f"🧪 Writing {args.rows:,} synthetic LCA rows → {out}")
+    generate(out, args.rows, **generator_options(args))
+    print(f"   {os.path.getsize(out) / 1e6:,.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
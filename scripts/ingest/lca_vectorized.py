@@ -0,0 +1,308 @@
+"""
+Vectorized LCA aggregation engine (NumPy)
+Alternative to the per-row aggregate_rows() → build_rows() path for
+h1b-lca.py --engine vectorized. Works on the dictionary-encoded columns
+from lca_cache (distinct values + one integer code per row):
+
+  1. every per-value transform (strip, SOC normalization, status bucket,
+     wage parse + hourly→annual) runs once per *distinct* value,
+  2. the per-row work is integer gathers, np.unique / bincount group-bys
+     and one sort per median / top-N.
+
+Output rows are identical to build_rows(): same key order (first
+occurrence), same first-non-empty titles, same medians, and top-N ties
+broken by first occurrence just like the stable sort over dict order.
+"""
+
+import numpy as np
+
+from lca_aggregate import LCA_COLUMNS, Dictionary, employer_key
+
+STATUS_CERTIFIED, STATUS_DENIED, STATUS_WITHDRAWN, STATUS_OTHER = range(4)
+
+
+def lookup(values, fn, dtype=np.int64):
+    return np.fromiter((fn(v) for v in values), dtype=dtype, count=len(values))
+
+
+def text_lut(values, dictionary):
+    """Stripped-string code per distinct raw value; -1 for blank."""
+    def fn(v):
+        s = str(v or '').strip()
+        return dictionary.code(s) if s else -1
+    return lookup(values, fn)
+
+
+def soc_lut(values, dictionary):
+    def fn(v):
+        s = str(v or '').strip()
+        if not s or len(s) < 5:
+            return -1
+        return dictionary.code(s.replace('.00', ''))
+    return lookup(values, fn)
+
+
+def status_lut(values):
+    def fn(v):
+        s = str(v or '').strip().upper()
+        if 'CERTIFIED' in s:
+            return STATUS_CERTIFIED
+        if 'DENIED' in s:
+            return STATUS_DENIED
+        if 'WITHDRAWN' in s:
+            return STATUS_WITHDRAWN
+        return STATUS_OTHER
+    return lookup(values, fn, np.int8)
+
+
+def wage_lut(values):
+    """Annualized wage per distinct raw value; NaN when unparseable or not positive."""
+    # Numeric cells (the bulk of the distinct values) convert in one shot;
+    # only text cells like '$95,000' go through the string cleanup
+    numeric = np.fromiter((v.__class__ is float or v.__class__ is int for v in values),
+                          dtype=bool, count=len(values))
+    raw = np.full(len(values), np.nan)
+    idx = np.nonzero(numeric)[0]
+    raw[idx] = np.array([values[i] for i in idx.tolist()], dtype=np.float64)
+    for i in np.nonzero(~numeric)[0].tolist():
+        try:
+            raw[i] = float(str(values[i] or '0').replace(',', '').replace('$', ''))
+        except (ValueError, TypeError):
+            pass
+    with np.errstate(invalid='ignore'):
+        return np.where(raw > 0, np.where(raw < 500, raw * 2080, raw), np.nan)
+
+
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def first_order(ids, bound=None):
+    """Dense group ids numbered by first occurrence, plus each group's first position.
+
+    With a small id bound (ids < bound) the first positions come from one
+    scatter-min over a dense table instead of np.unique's argsort.
+    """
+    n = len(ids)
+    if bound is not None and bound <= 4 * n + 1024:
+        first = np.full(bound, n, dtype=np.int64)
+        np.minimum.at(first, ids, np.arange(n))
+        present = np.nonzero(first < n)[0]
+        order = np.argsort(first[present], kind='stable')
+        rank = np.empty(bound, dtype=np.int64)
+        rank[present[order]] = np.arange(len(order))
+        return rank[ids], first[present[order]]
+    uniq, first, inv = np.unique(ids, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[inv.ravel()], first[order]
+
+
+def group_wages(group, codes, lut, ngroups):
+    """Each group's wages sorted, back to back: (wages, group starts, group counts).
+
+    Rows carry a code into lut (the per-distinct-value wages), so ordering
+    within a group is one integer sort on group * ndistinct + rank(wage)
+    instead of a lexsort over floats.
+    """
+    nd = max(len(lut), 1)
+    order = np.argsort(lut, kind='stable')
+    rank = np.empty(len(lut), dtype=np.int64)
+    rank[order] = np.arange(len(lut))
+    keep = ~np.isnan(lut)[codes]
+    group = group[keep]
+    ordered = lut[order][np.sort(group * nd + rank[codes[keep]]) % nd]
+    counts = np.bincount(group, minlength=ngroups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return ordered, starts, counts
+
+
+def medians(wages, ngroups):
+    """statistics.median per group of group_wages() (None for empty groups), as Python floats."""
+    ordered, starts, counts = wages
+    has = counts > 0
+    lo = (starts + (counts - 1) // 2)[has]
+    hi = (starts + counts // 2)[has]
+    out = [None] * ngroups
+    # (a + a) / 2 == a exactly, so odd counts match statistics.median too
+    for g, m in zip(np.nonzero(has)[0].tolist(), ((ordered[lo] + ordered[hi]) / 2).tolist()):
+        out[g] = m
+    return out
+
+
+def quartiles(wages, ngroups):
+    """(p25, p75) per group of group_wages() as wage_quantiles() computes them; (None, None) for empty groups."""
+    ordered, starts, counts = wages
+    has = counts > 0
+    n, start = counts[has], starts[has]
+    cols = []
+    for q in (0.25, 0.75):
+        # Same float operations, in the same order, as wage_quantiles()
+        p = (n - 1) * q
+        i = p.astype(np.int64)
+        lo, hi = ordered[start + i], ordered[start + np.minimum(i + 1, n - 1)]
+        cols.append((lo + (hi - lo) * (p - i)).tolist())
+    out = [(None, None)] * ngroups
+    for g, p25, p75 in zip(np.nonzero(has)[0].tolist(), *cols):
+        out[g] = (p25, p75)
+    return out
+
+
+def sort_order(group, count, tiebreak):
+    """Permutation ordering by group, then count desc, then tiebreak asc."""
+    if len(group):
+        maxc, maxt = int(count.max()) + 1, int(tiebreak.max()) + 1
+        if int(group.max()) + 1 <= INT64_MAX // maxc // maxt:
+            # Tiebreaks are distinct within a group, so one sort of a packed
+            # key gives the same order as the (slower) lexsort
+            return np.argsort((group * maxc + (maxc - 1 - count)) * maxt + tiebreak)
+    return np.lexsort((tiebreak, -count, group))
+
+
+def top_items(group, item, count, tiebreak, ngroups, names, n=5):
+    """Top n item names per group by count desc, ties by ascending tiebreak."""
+    order = sort_order(group, count, tiebreak)
+    g_sorted = group[order]
+    starts = np.searchsorted(g_sorted, np.arange(ngroups))
+    rank = np.arange(len(order)) - starts[g_sorted]
+    pick = rank < n
+    out = [[] for _ in range(ngroups)]
+    for g, i in zip(g_sorted[pick].tolist(), item[order][pick].tolist()):
+        out[g].append(names[i])
+    return out
+
+
+def pair_counts(key, item, nitems):
+    """Distinct (key, item) pairs with counts and first row position."""
+    keep = item >= 0
+    rows = np.nonzero(keep)[0]
+    pairs = key[keep] * nitems + item[keep]
+    n = len(key) + 1
+    if len(pairs) and int(pairs.max()) < INT64_MAX // n:
+        # Pack the row into the sort key: each run of equal pairs then starts
+        # at its first row, and a plain sort beats unique()'s stable argsort
+        packed = np.sort(pairs * n + rows)
+        pairs, rows = packed // n, packed % n
+        starts = np.flatnonzero(np.concatenate(([True], pairs[1:] != pairs[:-1])))
+        counts = np.diff(np.append(starts, len(pairs)))
+        return pairs[starts] // nitems, pairs[starts] % nitems, counts, rows[starts]
+    uniq, first, counts = np.unique(pairs, return_index=True, return_counts=True)
+    return uniq // nitems, uniq % nitems, counts, rows[first]
+
+
+def top_by_key_and_national(key, item, names, nkeys, nat_of_key, nnat, nrows):
+    """Top-5 item names per SOC × state key and per national SOC."""
+    nitems = max(len(names), 1)
+    pk, pi, pc, pfirst = pair_counts(key, item, nitems)
+    by_key = top_items(pk, pi, pc, pfirst, nkeys, names)
+
+    # National dicts are filled by walking keys in order, so an item's tie
+    # position is (first key containing it, its first row within that key)
+    npair = nat_of_key[pk] * nitems + pi
+    uniq, inv = np.unique(npair, return_inverse=True)
+    inv = inv.ravel()
+    ncount = np.bincount(inv, weights=pc).astype(np.int64)
+    tie = np.full(len(uniq), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(tie, inv, pk * nrows + pfirst)
+    by_nat = top_items(uniq // nitems, uniq % nitems, ncount, tie, nnat, names)
+    return by_key, by_nat
+
+
+def build_rows(values, codes, fiscal_year, normalize_employers=False):
+    """(state_rows, nat_rows, row_count, key_count) from dictionary-encoded LCA_COLUMNS.
+
+    normalize_employers counts employer name variants as one employer, like
+    aggregate_rows() does.
+    """
+    assert len(values) == len(codes) == len(LCA_COLUMNS)
+    arrays = [np.frombuffer(c, dtype=c.typecode) for c in codes]
+    soc_c, state_c, status_c, title_c, employer_c, metro_c, pw_c, ow_c = arrays
+    soc_v, state_v, status_v, title_v, employer_v, metro_v, pw_v, ow_v = values
+
+    socs, states, titles, metros = (Dictionary() for _ in range(4))
+    employers = Dictionary(key=employer_key if normalize_employers else None)
+    soc = soc_lut(soc_v, socs)[soc_c]
+    state = text_lut(state_v, states)[state_c]
+
+    valid = np.nonzero((soc >= 0) & (state >= 0))[0]
+    row_count = len(valid)
+    soc, state = soc[valid], state[valid]
+
+    # SOC × state keys, numbered in first-occurrence order like the agg dict
+    nsoc, nstate = max(len(socs.names), 1), max(len(states.names), 1)
+    key, key_first = first_order(soc * nstate + state, bound=nsoc * nstate)
+    nkeys = len(key_first)
+    key_soc = soc[key_first]
+    key_state = state[key_first]
+
+    # National SOCs, numbered in the order their first key appears
+    nat_of_key, nat_first_key = first_order(key_soc, bound=nsoc)
+    nnat = len(nat_first_key)
+    nat_row = nat_of_key[key]
+
+    status = status_lut(status_v)[status_c[valid]]
+    total = np.bincount(key, minlength=nkeys)
+    bucket = [np.bincount(key[status == s], minlength=nkeys) for s in
+              (STATUS_CERTIFIED, STATUS_DENIED, STATUS_WITHDRAWN)]
+    nat_total = np.bincount(nat_of_key, weights=total, minlength=nnat).astype(np.int64)
+    nat_bucket = [np.bincount(nat_of_key, weights=b, minlength=nnat).astype(np.int64) for b in bucket]
+
+    # First non-empty title per key; nationally, the first titled key's title
+    title = text_lut(title_v, titles)[title_c[valid]]
+    key_title = np.full(nkeys, -1, dtype=np.int64)
+    titled = np.nonzero(title >= 0)[0]
+    k_uniq, k_first = np.unique(key[titled], return_index=True)
+    key_title[k_uniq] = title[titled[k_first]]
+    nat_title = np.full(nnat, -1, dtype=np.int64)
+    titled_keys = np.nonzero(key_title >= 0)[0]
+    n_uniq, n_first = np.unique(nat_of_key[titled_keys], return_index=True)
+    nat_title[n_uniq] = key_title[titled_keys[n_first]]
+
+    pw, pw_lut = pw_c[valid], wage_lut(pw_v)
+    ow, ow_lut = ow_c[valid], wage_lut(ow_v)
+    key_ow_sorted, nat_ow_sorted = group_wages(key, ow, ow_lut, nkeys), group_wages(nat_row, ow, ow_lut, nnat)
+    key_pw, key_ow = medians(group_wages(key, pw, pw_lut, nkeys), nkeys), medians(key_ow_sorted, nkeys)
+    nat_pw, nat_ow = medians(group_wages(nat_row, pw, pw_lut, nnat), nnat), medians(nat_ow_sorted, nnat)
+    key_oq, nat_oq = quartiles(key_ow_sorted, nkeys), quartiles(nat_ow_sorted, nnat)
+
+    employer = text_lut(employer_v, employers)[employer_c[valid]]
+    metro = text_lut(metro_v, metros)[metro_c[valid]]
+    key_emp, nat_emp = top_by_key_and_national(key, employer, employers.names, nkeys, nat_of_key, nnat, row_count)
+    key_metro, nat_metro = top_by_key_and_national(key, metro, metros.names, nkeys, nat_of_key, nnat, row_count)
+
+    def row(soc_code, state_code, title_code, t, c, d, w, prev, offered, offered_q, emp, met):
+        return {
+            'soc_code': soc_code,
+            'soc_title': titles.names[title_code] if title_code >= 0 else '',
+            'state': state_code,
+            'fiscal_year': fiscal_year,
+            'applications_total': t,
+            'applications_certified': c,
+            'applications_denied': d,
+            'applications_withdrawn': w,
+            'median_prevailing_wage': round(prev) if prev is not None else None,
+            'median_offered_wage': round(offered) if offered is not None else None,
+            'p25_offered_wage': round(offered_q[0]) if offered_q[0] is not None else None,
+            'p75_offered_wage': round(offered_q[1]) if offered_q[1] is not None else None,
+            'top_employers': emp,
+            'top_metro_areas': met,
+            'source': 'dol_lca',
+        }
+
+    state_rows = []
+    cols = zip(key_soc.tolist(), key_state.tolist(), key_title.tolist(), total.tolist(),
+               *(b.tolist() for b in bucket), key_pw, key_ow, key_oq, key_emp, key_metro)
+    for s, st, tc, t, c, d, w, prev, offered, offered_q, emp, met in cols:
+        if t < 3:
+            continue
+        state_rows.append(row(socs.names[s], states.names[st], tc, t, c, d, w, prev, offered, offered_q, emp, met))
+
+    nat_rows = []
+    cols = zip(key_soc[nat_first_key].tolist(), nat_title.tolist(), nat_total.tolist(),
+               *(b.tolist() for b in nat_bucket), nat_pw, nat_ow, nat_oq, nat_emp, nat_metro)
+    for s, tc, t, c, d, w, prev, offered, offered_q, emp, met in cols:
+        if t < 5:
+            continue
+        nat_rows.append(row(socs.names[s], 'US', tc, t, c, d, w, prev, offered, offered_q, emp, met))
+
+    return state_rows, nat_rows, row_count, nkeys
@@ -0,0 +1,70 @@
+"""
+Multi-phrase substring matcher (Aho-Corasick, stdlib only)
+Finds every occurrence of any of a fixed set of phrases in one pass over
+the text, so matching cost doesn't grow with the number of phrases. Used
+by soc_matcher (title → SOC code) and sector_rules (title → sector).
+
+    automaton = PhraseAutomaton(['nurse', 'registered nurse', 'it '])
+    for end, i in automaton.scan('registered nurses'):
+        ...   # phrase i ends just before text[end]
+
+Phrases and text are matched as given; callers lower-case both.
+Automatons are plain lists and dicts, so they pickle.
+"""
+
+from collections import deque
+
+
+class PhraseAutomaton:
+    def __init__(self, phrases):
+        self.phrases = list(phrases)
+        goto, fail, out = [{}], [0], [[]]
+        for i, phrase in enumerate(self.phrases):
+            node = 0
+            for ch in phrase:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append([])
+                node = nxt
+            out[node].append(i)
+        # Breadth-first failure links; each node's outputs include those of its fail chain
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                target = goto[f].get(ch, 0)
+                fail[nxt] = target if target != nxt else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self.goto, self.fail, self.out = goto, fail, out
+
+    def scan(self, text):
+        """Yield (end, phrase index) for every phrase occurrence; text[end - len(phrase):end] is the phrase."""
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for i in out[node]:
+                yield pos + 1, i
+
+    def matches(self, text):
+        """Indices of the phrases occurring anywhere in text."""
+        found = set()
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
@@ -0,0 +1,91 @@
+"""
+Delta upserts
+Fingerprints each row under its natural key (e.g. soc_code, state,
+fiscal_year) so a refresh only sends rows that are new or changed, and
+can delete rows the new load no longer produces.
+
+The previous fingerprints come either from a local JSON file written
+after the last load (per Supabase project, table and scope), or from the
+rows already in the table, fetched in bulk.
+"""
+
+import os
+import json
+import hashlib
+
+
+def fingerprint(row):
+    return hashlib.sha1(json.dumps(row, sort_keys=True, separators=(',', ':'), default=str).encode()).hexdigest()[:16]
+
+
+def row_key(row, key_fields):
+    return json.dumps([row[f] for f in key_fields])
+
+
+def store_path(cache_dir, supabase_url, table, scope):
+    project = hashlib.sha1(supabase_url.encode()).hexdigest()[:8]
+    return os.path.join(cache_dir, 'fingerprints', f'{project}-{table}-{scope}.json')
+
+
+def load_local(path):
+    """{row key: fingerprint} from the last load, or None if there is none."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"  ⚠ Ignoring unreadable fingerprints {path}: {e}")
+        return None
+
+
+def save_local(path, fingerprints):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(fingerprints, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+def fetch_remote(client, table, key_fields, columns, params):
+    """{row key: fingerprint} of the rows in the table matching params, or None on error.
+
+    Only the columns we upload are selected, so fingerprints compare equal
+    to those of freshly built rows.
+    """
+    rows = client.select(table, {**params, 'select': ','.join(columns)}, order=','.join(key_fields))
+    if rows is None:
+        return None
+    return {row_key(r, key_fields): fingerprint(r) for r in rows}
+
+
+def diff(rows, previous, key_fields):
+    """(changed rows, {key: fingerprint} of all rows, stale keys only in previous)."""
+    current, changed = {}, []
+    for r in rows:
+        k = row_key(r, key_fields)
+        current[k] = fp = fingerprint(r)
+        if previous.get(k) != fp:
+            changed.append(r)
+    stale = [k for k in previous if k not in current]
+    return changed, current, stale
+
+
+def delete_keys(client, table, keys, key_fields, chunk=100):
+    """Delete rows by key, batched as field=eq.… filters plus last_field=in.(…).
+
+    Returns the keys that could not be deleted.
+    """
+    groups = {}
+    for k in keys:
+        values = json.loads(k)
+        groups.setdefault(tuple(values[:-1]), []).append((k, values[-1]))
+    failed = []
+    for prefix, items in groups.items():
+        params = {f: f'eq.{v}' for f, v in zip(key_fields, prefix)}
+        for i in range(0, len(items), chunk):
+            part = items[i:i + chunk]
+            quoted = ','.join('"{}"'.format(str(v).replace('\\', '\\\\').replace('"', '\\"')) for _, v in part)
+            if client.request(table, method='DELETE', params={**params, key_fields[-1]: f'in.({quoted})'}) is None:
+                failed.extend(k for k, _ in part)
+    return failed
@@ -0,0 +1,93 @@
+"""
+Occupation title → sector classification
+The rule table is an ordered list of sectors, each with title keywords; a
+title belongs to the first sector any of whose keywords occurs in it
+(lower-cased substring match). All keywords are compiled into one
+phrase_match automaton, so a title is scanned once for every sector.
+Titles no keyword matches fall back to their SOC major group (the first two
+digits of the code) when the SOC code is known, else to the default sector.
+
+    sectors = load_sector_rules()            # or load_sector_rules('rules.json')
+    sectors.classify('Registered Nurses')    # 'Healthcare & Biosciences'
+    sectors.classify_many(titles, soc_codes)
+
+A rules file is JSON shaped like DEFAULT_RULES:
+
+    {"sectors": [{"sector": "Healthcare & Biosciences", "keywords": ["nurse", ...]}, ...],
+     "soc_major_groups": {"29": "Healthcare & Biosciences", ...},
+     "default": "Other"}
+"""
+
+import json
+
+from phrase_match import PhraseAutomaton
+
+DEFAULT_RULES = {
+    'sectors': [
+        {'sector': 'Healthcare & Biosciences',
+         'keywords': ['nurse', 'medical', 'health', 'pharma', 'therapy', 'respiratory', 'surgical', 'sonograph',
+                      'emt', 'paramedic', 'radiologic']},
+        {'sector': 'Information Technology',
+         'keywords': ['software', 'computer', 'network', 'information security', 'programmer', 'analyst', 'it ']},
+        {'sector': 'Construction & Engineering',
+         'keywords': ['carpenter', 'electrician', 'plumber', 'pipefitter', 'power-line', 'drafter', 'civil eng',
+                      'electrical eng']},
+        {'sector': 'Advanced Manufacturing',
+         'keywords': ['mechanic', 'welder', 'welding', 'machinist', 'cnc', 'millwright', 'tool & die', 'maintenance',
+                      'wind turbine', 'manufacturing']},
+        {'sector': 'Transportation & Logistics',
+         'keywords': ['truck', 'driver', 'cdl', 'logistics', 'shipping']},
+    ],
+    # SOC 2018 major groups that sit squarely in one sector
+    'soc_major_groups': {
+        '15': 'Information Technology',              # Computer and Mathematical
+        '17': 'Construction & Engineering',          # Architecture and Engineering
+        '29': 'Healthcare & Biosciences',            # Healthcare Practitioners and Technical
+        '31': 'Healthcare & Biosciences',            # Healthcare Support
+        '47': 'Construction & Engineering',          # Construction and Extraction
+        '49': 'Advanced Manufacturing',              # Installation, Maintenance, and Repair
+        '51': 'Advanced Manufacturing',              # Production
+        '53': 'Transportation & Logistics',          # Transportation and Material Moving
+    },
+    'default': 'Other',
+}
+
+
+class SectorClassifier:
+    def __init__(self, rules):
+        self.table = rules
+        self.sectors = [s['sector'] for s in rules['sectors']]
+        self.soc_major_groups = dict(rules.get('soc_major_groups', {}))
+        self.default = rules.get('default', 'Other')
+        # keyword index → rank of its sector in the table (lower wins)
+        keywords, self.keyword_rank = [], []
+        for rank, s in enumerate(rules['sectors']):
+            for k in s['keywords']:
+                keywords.append(k.lower())
+                self.keyword_rank.append(rank)
+        self.automaton = PhraseAutomaton(keywords)
+
+    def classify(self, title, soc_code=None):
+        hits = self.automaton.matches(title.lower())
+        if hits:
+            return self.sectors[min(self.keyword_rank[i] for i in hits)]
+        if soc_code:
+            return self.soc_major_groups.get(soc_code[:2], self.default)
+        return self.default
+
+    def classify_many(self, titles, soc_codes=None):
+        """classify() for each title, with the SOC code at the same position (if given)."""
+        if soc_codes is None:
+            soc_codes = [None] * len(titles)
+        return [self.classify(t, soc) for t, soc in zip(titles, soc_codes)]
+
+
+def load_sector_rules(path=None):
+    """SectorClassifier over the JSON rules file at path, or DEFAULT_RULES."""
+    if path is None:
+        return SectorClassifier(DEFAULT_RULES)
+    with open(path) as f:
+        rules = json.load(f)
+    if not isinstance(rules.get('sectors'), list):
+        raise ValueError(f'{path}: expected a "sectors" list of {{"sector", "keywords"}} rules')
+    return SectorClassifier(rules)
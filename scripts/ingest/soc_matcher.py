@@ -0,0 +1,211 @@
+"""
+Occupation title → SOC code matcher
+Used by state-priorities.py to code the occupation titles of every state's
+in-demand list. Rules are title phrases mapped to SOC codes, from three
+sources (highest priority first):
+
+  alias      state-specific aliases (CSV: state, alias, soc_code; a blank or
+             '*' state applies to every state)
+  builtin    the script's own SOC_LOOKUP phrases
+  taxonomy   the SOC taxonomy's occupation titles (BLS soc_2018_definitions
+             or O*NET Occupation Data, xlsx/csv/tsv)
+
+All phrases are compiled into one phrase_match automaton, so a title is
+scanned once no matter how many rules there are. A rule matches when its
+phrase occurs anywhere in the lower-cased title; of several, a state alias
+wins outright (aliases are explicit overrides), then the longest phrase,
+then the higher-priority source, then the earliest. Titles
+with no phrase match can fall back to fuzzy token matching (Dice overlap of
+stemmed words, via an inverted index) above a minimum score.
+
+    matcher = load_matcher(SOC_LOOKUP, taxonomy_path, aliases_path, cache_dir)
+    for m in matcher.match_many(titles, state='IA'):
+        m.soc_code, m.rule, m.source, m.score   # None when unmatched
+
+Compiled matchers are pickled under cache_dir, keyed by the rules and the
+SHA-256 of the taxonomy/alias files, so later runs skip the build.
+"""
+
+import os
+import re
+import json
+import pickle
+import hashlib
+from collections import namedtuple
+
+from delimited_stream import open_reader
+from file_hash import file_digest
+from phrase_match import PhraseAutomaton
+
+MATCHER_VERSION = 3
+PRIORITY = {'alias': 2, 'builtin': 1, 'taxonomy': 0}
+SOC_CODE = re.compile(r'^(\d\d-\d{4})(?:\.\d\d)?$')
+# Header names of the code/title columns in the supported taxonomy files
+CODE_HEADERS = ('soc code', '2018 soc code', 'o*net-soc code', 'soc_code', 'code')
+TITLE_HEADERS = ('soc title', '2018 soc title', 'title', 'soc_title', 'occupation_title')
+STOP_WORDS = {'and', 'or', 'of', 'the', 'all', 'other', 'except', 'in', 'for', 'a', 'an'}
+WORD = re.compile(r'[a-z0-9]+')
+
+Rule = namedtuple('Rule', 'phrase soc_code source state')
+SocMatch = namedtuple('SocMatch', 'soc_code rule source score')
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def tokens(text):
+    """Stemmed content words of a title, for fuzzy matching."""
+    out = set()
+    for w in WORD.findall(text.lower()):
+        if w not in STOP_WORDS:
+            out.add(w[:-1] if len(w) > 3 and w.endswith('s') else w)
+    return out
+
+
+class SocMatcher:
+    def __init__(self, rules):
+        # One rule per (phrase, state): the highest-priority source wins
+        best = {}
+        for r in rules:
+            r = r._replace(phrase=normalize(r.phrase))
+            key = (r.phrase, r.state)
+            if r.phrase and (key not in best or PRIORITY[r.source] > PRIORITY[best[key].source]):
+                best[key] = r
+        self.rules = list(best.values())
+        self.automaton = PhraseAutomaton([r.phrase for r in self.rules])
+        self._build_index()
+
+    def _build_index(self):
+        self.rule_tokens = [tokens(r.phrase) for r in self.rules]
+        self.index = {}
+        for i, toks in enumerate(self.rule_tokens):
+            for t in toks:
+                self.index.setdefault(t, []).append(i)
+
+    def _applies(self, rule, state):
+        return rule.state is None or rule.state == state
+
+    def match(self, title, state=None, fuzzy=0.0):
+        """SocMatch for one title, or None. fuzzy > 0 enables the token fallback at that minimum score."""
+        text = normalize(title)
+        rules = self.rules
+        best, best_rank = None, None
+        for end, i in self.automaton.scan(text):
+            r = rules[i]
+            if not self._applies(r, state):
+                continue
+            rank = (r.source == 'alias', len(r.phrase), PRIORITY[r.source], -(end - len(r.phrase)))
+            if best_rank is None or rank > best_rank:
+                best, best_rank = r, rank
+        if best:
+            return SocMatch(best.soc_code, best.phrase, best.source if best.state is None else f'alias:{best.state}', 1.0)
+        return self.fuzzy_match(text, state, fuzzy) if fuzzy else None
+
+    def fuzzy_match(self, title, state, min_score):
+        words = tokens(title)
+        if not words:
+            return None
+        overlap = {}
+        for t in words:
+            for i in self.index.get(t, ()):
+                overlap[i] = overlap.get(i, 0) + 1
+        best, best_rank = None, None
+        for i, shared in overlap.items():
+            r = self.rules[i]
+            if not self._applies(r, state):
+                continue
+            score = 2 * shared / (len(words) + len(self.rule_tokens[i]))
+            rank = (score, PRIORITY[r.source], -i)
+            if score >= min_score and (best_rank is None or rank > best_rank):
+                best, best_rank = r, rank
+        if best is None:
+            return None
+        source = best.source if best.state is None else f'alias:{best.state}'
+        return SocMatch(best.soc_code, best.phrase, f'fuzzy:{source}', round(best_rank[0], 3))
+
+    def match_many(self, titles, state=None, fuzzy=0.0):
+        """match() for each title, in order; repeated titles are matched once."""
+        seen = {}
+        return [seen[t] if t in seen else seen.setdefault(t, self.match(t, state, fuzzy)) for t in titles]
+
+
+# ── Rule sources ──────────────────────────────────────
+def header_row(reader, wanted, rows=10):
+    """(row number, {lower-cased header: index}) of the first of the top rows holding all wanted kinds of header."""
+    for n in range(1, rows + 1):
+        cells = {str(h).strip().lower(): i for i, h in enumerate(reader.headers(n)) if h}
+        if all(any(h in cells for h in names) for names in wanted):
+            return n, cells
+    return None, None
+
+
+def taxonomy_rules(path):
+    """Rules from the detailed occupations of a SOC taxonomy file."""
+    with open_reader(path) as reader:
+        n, cells = header_row(reader, (CODE_HEADERS, TITLE_HEADERS))
+        if n is None:
+            raise ValueError(f'{path}: no SOC code/title header in the first rows')
+        code_i = next(cells[h] for h in CODE_HEADERS if h in cells)
+        title_i = next(cells[h] for h in TITLE_HEADERS if h in cells)
+        group_i = cells.get('soc group')
+        rules = []
+        for code, title, group in reader.iter_columns([code_i, title_i, group_i], n + 1):
+            m = SOC_CODE.match(str(code or '').strip())
+            if not m or not title or (group_i is not None and str(group).strip().lower() != 'detailed'):
+                continue
+            rules.append(Rule(str(title), m.group(1), 'taxonomy', None))
+        return rules
+
+
+def alias_rules(path):
+    """Rules from a state, alias, soc_code file; a blank or '*' state applies everywhere."""
+    with open_reader(path) as reader:
+        n, cells = header_row(reader, (('state',), ('alias',), ('soc_code', 'soc code')))
+        if n is None:
+            raise ValueError(f'{path}: expected state, alias and soc_code columns')
+        indices = [cells['state'], cells['alias'], cells.get('soc_code', cells.get('soc code'))]
+        rules = []
+        for state, alias, code in reader.iter_columns(indices, n + 1):
+            m = SOC_CODE.match(str(code or '').strip())
+            if alias and m:
+                state = str(state or '').strip().upper()
+                rules.append(Rule(str(alias), m.group(1), 'alias', None if state in ('', '*') else state))
+        return rules
+
+
+def load_matcher(builtin, taxonomy=None, aliases=None, cache_dir=None):
+    """SocMatcher over the builtin {phrase: soc} dict and the optional taxonomy/alias files.
+
+    With cache_dir the compiled matcher is reused from (or saved to) disk.
+    Its .digest identifies the rule set (to tell when coded rows may change).
+    """
+    spec = json.dumps([MATCHER_VERSION, sorted(builtin.items()),
+                       taxonomy and file_digest(taxonomy), aliases and file_digest(aliases)])
+    digest = hashlib.sha256(spec.encode()).hexdigest()
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f'soc-matcher-{digest[:16]}.pickle')
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            print(f"  ⚠ Ignoring unreadable matcher cache {path}: {e}")
+
+    rules = [Rule(phrase, soc, 'builtin', None) for phrase, soc in builtin.items()]
+    if taxonomy:
+        rules += taxonomy_rules(taxonomy)
+    if aliases:
+        rules += alias_rules(aliases)
+    matcher = SocMatcher(rules)
+    matcher.digest = digest
+
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(matcher, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    return matcher
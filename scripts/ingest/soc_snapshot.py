@@ -0,0 +1,205 @@
+"""
+Versioned SOC × state snapshots of ingested tables
+At the end of a run, h1b-lca.py and state-priorities.py also write the
+table's rows as a sorted snapshot that report builds can read without a
+database round trip:
+
+  <dir>/<table>-<version>.jsonl   one JSON row per line, sorted by soc_code, state, then
+                                  the table's own order fields
+  <dir>/<table>-<version>.idx     offset index, one entry per distinct (soc_code, state)
+  <dir>/<table>.json              the current version and its files (written last)
+
+The .idx file is b'SOCSNAP1', a uint32 key width and a uint32 entry count,
+then fixed-width entries (little-endian): the key "<soc_code>\\t<state>"
+as NUL-padded UTF-8, and the uint64 byte offset and length of the key's
+lines in the .jsonl. Entries are in the same order as the lines, so a
+reader memory-maps both files and binary-searches the index: get(soc,
+state) is O(log n), by_soc(soc) is O(log n) plus one contiguous read.
+
+    version = write_snapshot(directory, 'intel_h1b_demand', rows, 'fiscal_year', ('fiscal_year',))
+    with SnapshotReader(directory, 'intel_h1b_demand') as snap:
+        snap.get('15-1252', 'CA')
+
+The version is <UTC timestamp>-<sha256 of the .jsonl>; scripts stamp it
+into intel_data_freshness.snapshot_version so readers know when to reload.
+A run that reloaded only part of the table (some fiscal years, some
+states) carries the other rows over from the previous snapshot.
+"""
+
+import os
+import json
+import mmap
+import glob
+import struct
+import hashlib
+from datetime import datetime, timezone
+
+DEFAULT_DIR = os.path.expanduser('~/.cache/intel-snapshots')
+MAGIC = b'SOCSNAP1'
+HEADER = struct.Struct('<8sII')
+SPAN = struct.Struct('<QQ')
+
+
+def row_key(row):
+    return f"{row.get('soc_code') or ''}\t{row.get('state') or ''}".encode()
+
+
+def current(directory, table):
+    """The current snapshot's description ({'version', 'data', 'index', ...}), or None."""
+    try:
+        with open(os.path.join(directory, f'{table}.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def previous_rows(directory, table, scope_field, scopes):
+    """Rows of the current snapshot whose scope_field value isn't in scopes."""
+    info = current(directory, table)
+    if info is None:
+        return []
+    rows = []
+    try:
+        with open(os.path.join(directory, info['data']), encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if row.get(scope_field) not in scopes:
+                    rows.append(row)
+    except (OSError, ValueError) as e:
+        print(f"  ⚠ Ignoring unreadable snapshot {info['data']}: {e}")
+        return []
+    return rows
+
+
+def write_snapshot(directory, table, rows, scope_field, order_fields, keep=3):
+    """Write a new snapshot of table: rows, plus the previous snapshot's rows of other scopes.
+
+    scope_field is what a run reloads as a unit (fiscal_year, state); rows of
+    the scopes in rows replace the previous snapshot's. Returns the version.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rows = list(rows)
+    carried = previous_rows(directory, table, scope_field, {r.get(scope_field) for r in rows})
+    lines = sorted(
+        (row_key(r), [str(r.get(f) or '') for f in order_fields],
+         json.dumps(r, sort_keys=True, separators=(',', ':'), default=str).encode() + b'\n')
+        for r in rows + carried
+    )
+
+    # Data file, remembering each key's span of lines
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    tmp = os.path.join(directory, f'.{table}.{os.getpid()}.tmp')
+    digest, spans, offset = hashlib.sha256(), [], 0
+    with open(tmp, 'wb') as f:
+        for key, _, line in lines:
+            if spans and spans[-1][0] == key:
+                spans[-1][2] += len(line)
+            else:
+                spans.append([key, offset, len(line)])
+            f.write(line)
+            digest.update(line)
+            offset += len(line)
+    version = f'{stamp}-{digest.hexdigest()[:12]}'
+    data = f'{table}-{version}.jsonl'
+    os.replace(tmp, os.path.join(directory, data))
+
+    width = max((len(k) for k, _, _ in spans), default=1)
+    index = f'{table}-{version}.idx'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, width, len(spans)))
+        for key, start, length in spans:
+            f.write(key.ljust(width, b'\0') + SPAN.pack(start, length))
+    os.replace(tmp, os.path.join(directory, index))
+
+    info = {'table': table, 'version': version, 'data': data, 'index': index, 'rows': len(lines),
+            'keys': len(spans), 'carried_over': len(carried), 'created_at': datetime.now().isoformat()}
+    tmp_info = tmp + '.json'
+    with open(tmp_info, 'w') as f:
+        json.dump(info, f, indent=1)
+    os.replace(tmp_info, os.path.join(directory, f'{table}.json'))
+
+    # Keep the last few versions: a reader may still have an older one open
+    for old in sorted(glob.glob(os.path.join(directory, f'{table}-*.jsonl')), key=os.path.getmtime)[:-keep]:
+        if os.path.basename(old) == data:
+            continue
+        for path in (old, old[:-len('.jsonl')] + '.idx'):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return version
+
+
+def stamp_freshness(client, table, version):
+    """Record the snapshot version on the table's intel_data_freshness row; False if that failed."""
+    return client.request('intel_data_freshness', method='PATCH', params={'table_name': f'eq.{table}'},
+                          data={'snapshot_version': version}) is not None
+
+
+class SnapshotReader:
+    """Memory-mapped lookups in a table's current snapshot."""
+
+    def __init__(self, directory, table):
+        self.info = current(directory, table)
+        if self.info is None:
+            raise FileNotFoundError(f'no {table} snapshot in {directory}')
+        self.version = self.info['version']
+        self._files = [open(os.path.join(directory, self.info[k]), 'rb') for k in ('data', 'index')]
+        self.data, self.index = (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size
+                                 else b'' for f in self._files)
+        magic, self.width, self.count = HEADER.unpack_from(self.index)
+        if magic != MAGIC:
+            raise ValueError(f"{self.info['index']}: not a snapshot index")
+        self.entry = self.width + SPAN.size
+
+    def close(self):
+        for m in (self.data, self.index):
+            if isinstance(m, mmap.mmap):
+                m.close()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _key(self, i):
+        at = HEADER.size + i * self.entry
+        return self.index[at:at + self.width]
+
+    def _span(self, i):
+        return SPAN.unpack_from(self.index, HEADER.size + i * self.entry + self.width)
+
+    def _lower_bound(self, probe):
+        probe = probe.ljust(self.width, b'\0')[:self.width]
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < probe:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _rows(self, first, last):
+        """Rows of index entries first..last-1 (contiguous in the data file)."""
+        if first >= last:
+            return []
+        start = self._span(first)[0]
+        end = sum(self._span(last - 1))
+        return [json.loads(line) for line in self.data[start:end].splitlines()]
+
+    def get(self, soc_code, state):
+        """Rows of one SOC code in one state (e.g. every fiscal year), [] if none."""
+        key = f'{soc_code}\t{state}'.encode()
+        i = self._lower_bound(key)
+        if i < self.count and self._key(i).rstrip(b'\0') == key:
+            return self._rows(i, i + 1)
+        return []
+
+    def by_soc(self, soc_code):
+        """Rows of one SOC code in every state."""
+        prefix = soc_code.encode()
+        return self._rows(self._lower_bound(prefix + b'\t'), self._lower_bound(prefix + b'\n'))
@@ -0,0 +1,212 @@
+"""
+Concurrent fetcher for state source documents (WIOA lists, PDFs, web pages)
+Used by state-priorities.py to pull every state's in-demand list:
+
+  - a bounded thread pool, with per-host politeness: at most per_host
+    requests in flight to one host and at least interval seconds between
+    request starts to it (URLs are interleaved by host so one slow board
+    doesn't hold up the rest)
+  - an on-disk response cache keyed by URL (<cache>/<sha256(url)>.json
+    metadata + .body), storing ETag/Last-Modified so a repeat fetch is a
+    conditional GET and an unchanged document costs one 304 round trip
+  - retries with exponential backoff (honouring Retry-After) on 429/5xx
+    and connection errors, like supabase_rest
+  - when a fetch fails, the last good cached copy is still returned
+
+    fetcher = SourceFetcher(os.path.join(cache_dir, 'http'))
+    for url, r in fetcher.fetch_all(urls).items():
+        r.status    # 'downloaded' | 'not_modified' | 'cached' (offline) | 'failed'
+        r.path      # cached body file (None if never fetched), r.sha256 its digest
+
+Plain urllib, so it runs unchanged against a local stand-in HTTP server.
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+USER_AGENT = 'Mozilla/5.0 (compatible; workforce-intel-ingest)'
+CHUNK = 1 << 16
+
+FetchResult = namedtuple('FetchResult', 'url status path sha256 bytes http_status error seconds')
+
+
+class ResponseCache:
+    """Bodies and validators of fetched URLs, one .json/.body pair per URL."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _base(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest())
+
+    def body_path(self, url):
+        return self._base(url) + '.body'
+
+    def load(self, url):
+        """The URL's metadata dict, or None if it isn't cached (or its body is gone)."""
+        try:
+            with open(self._base(url) + '.json') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get('url') == url and os.path.exists(self.body_path(url)) else None
+
+    def save_meta(self, url, meta):
+        path = self._base(url) + '.json'
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, path)
+
+    def store(self, url, resp):
+        """Stream a 200 response into the cache. Returns (sha256, bytes)."""
+        path = self.body_path(url)
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        digest, size = hashlib.sha256(), 0
+        try:
+            with open(tmp, 'wb') as f:
+                while True:
+                    chunk = resp.read(CHUNK)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return digest.hexdigest(), size
+
+
+class HostGate:
+    """Per-host concurrency limit and minimum interval between request starts."""
+
+    def __init__(self, per_host=1, interval=1.0):
+        self.per_host = max(1, per_host)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._next = {}
+
+    @contextmanager
+    def slot(self, host):
+        with self._lock:
+            sem = self._slots.setdefault(host, threading.Semaphore(self.per_host))
+        with sem:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next.get(host, now))
+                self._next[host] = start + self.interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+def interleave_by_host(urls):
+    """Reorder URLs round-robin across hosts, keeping each host's own order."""
+    by_host = {}
+    for url in urls:
+        by_host.setdefault(urllib.parse.urlsplit(url).netloc, []).append(url)
+    queues = list(by_host.values())
+    out = []
+    for i in range(max((len(q) for q in queues), default=0)):
+        out.extend(q[i] for q in queues if i < len(q))
+    return out
+
+
+class SourceFetcher:
+    def __init__(self, cache_dir, concurrency=8, per_host=1, interval=1.0, timeout=15, retries=3, backoff=1.0,
+                 offline=False):
+        self.cache = ResponseCache(cache_dir)
+        self.gate = HostGate(per_host, interval)
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.offline = offline
+
+    def _request(self, url, meta):
+        headers = {'User-Agent': USER_AGENT}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return urllib.request.Request(url, headers=headers)
+
+    def fetch(self, url):
+        """Fetch one URL through the cache. Returns a FetchResult."""
+        start = time.perf_counter()
+        meta = self.cache.load(url)
+
+        def result(status, http_status=None, error=None):
+            m = meta or {}
+            return FetchResult(url, status, self.cache.body_path(url) if meta else None, m.get('sha256'),
+                               m.get('bytes'), http_status, error, round(time.perf_counter() - start, 3))
+
+        if self.offline:
+            return result('cached' if meta else 'failed', error=None if meta else 'not cached (offline)')
+
+        host = urllib.parse.urlsplit(url).netloc
+        error, http_status = None, None
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            with self.gate.slot(host):
+                try:
+                    with urllib.request.urlopen(self._request(url, meta), timeout=self.timeout) as resp:
+                        sha, size = self.cache.store(url, resp)
+                        now = datetime.now().isoformat()
+                        meta = {
+                            'url': url,
+                            'final_url': resp.geturl(),
+                            'etag': resp.headers.get('ETag'),
+                            'last_modified': resp.headers.get('Last-Modified'),
+                            'content_type': resp.headers.get('Content-Type'),
+                            'sha256': sha,
+                            'bytes': size,
+                            'fetched_at': now,
+                            'checked_at': now,
+                        }
+                        self.cache.save_meta(url, meta)
+                        return result('downloaded', resp.status)
+                except urllib.error.HTTPError as e:
+                    http_status, error = e.code, f'HTTP {e.code} {e.reason}'
+                    retry_after = e.headers.get('Retry-After') if e.headers else None
+                    e.close()
+                    if e.code == 304 and meta:
+                        meta['checked_at'] = datetime.now().isoformat()
+                        self.cache.save_meta(url, meta)
+                        return result('not_modified', 304)
+                    if e.code not in RETRY_STATUS:
+                        break
+                except (OSError, ValueError) as e:
+                    http_status, error = None, str(getattr(e, 'reason', e))
+            if attempt < self.retries:
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                time.sleep(delay)
+        return result('failed', http_status, error)
+
+    def fetch_all(self, urls):
+        """Fetch URLs concurrently. Returns {url: FetchResult} in the given order."""
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(min(self.concurrency, len(urls) or 1)) as pool:
+            futures = {url: pool.submit(self.fetch, url) for url in interleave_by_host(urls)}
+            return {url: futures[url].result() for url in urls}
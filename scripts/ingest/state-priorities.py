@@ -2,9 +2,56 @@
 """
 State Priority Occupations Ingestion
 Starts with Iowa Future Ready, then scrapes other states' WIOA in-demand lists
+
+Each state's document is parsed by the parser registered for it in
+state_parsers; documents are extracted and parsed in a process pool
+(--jobs), with the extracted text cached by the document's content hash.
+
+Occupation titles are coded to SOC by soc_matcher: the SOC_LOOKUP phrases
+below plus, optionally, the full SOC taxonomy (--soc-taxonomy) and per-state
+aliases (--soc-aliases), compiled once and cached under --cache-dir.
+--soc-report writes which rule coded each title. Sectors come from the
+sector_rules keyword table (or a --sector-rules JSON file), falling back to
+the SOC major group.
+
+Source documents (STATE_SOURCES, plus --sources) are fetched concurrently
+by source_fetch, politely per host, through an on-disk cache that turns
+repeat fetches of unchanged documents into 304s.
+
+--incremental skips states whose source document (and the parsing/coding
+rules) are unchanged since their last load, and for the rest upserts only
+inserted/updated (state, occupation_title, effective_year) rows and deletes
+removed ones, diffing against the row fingerprints the last run saved under
+--cache-dir. Freshness reflects each state's last load.
+
+Whenever a state is loaded, the table's rows are also written as a
+versioned SOC × state snapshot under --snapshot-dir (soc_snapshot; states
+not reloaded are carried over from the previous snapshot), and its version
+is stamped into intel_data_freshness.snapshot_version.
+
+Each run writes per-stage timings (fetching, PDF extraction, parsing, upload with
+HTTP latency percentiles, freshness update) to a JSON file under
+--metrics-dir.
+
+Batches that fail to upload are saved under <cache-dir>/upsert-failures/
+for replay, and the run exits with status 1.
 """
 
-import os, json, re, urllib.request, urllib.parse
+import os, sys, csv, argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import ingest_metrics
+from ingest_metrics import RunMetrics, http_stats
+from supabase_rest import SupabaseClient
+from soc_matcher import load_matcher
+from sector_rules import load_sector_rules
+from source_fetch import SourceFetcher
+import row_delta
+import soc_snapshot
+import state_parsers
+from state_parsers import PARSERS, parse_document
+from file_hash import file_digest
 
 # Load env
 env = {}
@@ -19,32 +66,22 @@ with open(env_path) as f:
 SUPABASE_URL = env['NEXT_PUBLIC_SUPABASE_URL']
 SUPABASE_KEY = env['SUPABASE_SERVICE_ROLE_KEY']
 
-def supabase_upsert(table, rows):
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'resolution=merge-duplicates',
-    }
-    body = json.dumps(rows).encode()
-    req = urllib.request.Request(url, data=body, headers=headers, method='POST')
-    try:
-        with urllib.request.urlopen(req) as resp:
-            return True
-    except urllib.error.HTTPError as e:
-        print(f"  ✗ Upsert error: {e.code} {e.read().decode()[:200]}")
-        return False
+def supabase_upsert(supabase, table, rows, metrics, cache_dir, scope=None):
+    """Upsert via the shared bulk uploader; returns its UpsertReport"""
+    with metrics.stage('upload', scope) as stage:
+        report = supabase.upsert(table, rows)
+        stage['rows'] = report.rows_sent
+        stage.update(http_stats(report))
+    print(f"  {report.summary()}")
+    if report.failed:
+        path = report.write(os.path.join(cache_dir, 'upsert-failures', f"{table}-{datetime.now():%Y%m%d-%H%M%S}.json"))
+        print(f"  ✗ Failed batches saved to {path}")
+    return report
 
-def supabase_update_freshness(records_loaded, states_count):
-    from datetime import datetime
-    url = f"{SUPABASE_URL}/rest/v1/intel_data_freshness?table_name=eq.intel_state_priorities"
-    headers = {
-        'apikey': SUPABASE_KEY,
-        'Authorization': f'Bearer {SUPABASE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=minimal',
-    }
+def supabase_update_freshness(supabase, manifest):
+    """Freshness of the whole table, from the per-state manifest of what each state's load left in it"""
+    records_loaded = sum(e['records'] for e in manifest.values())
+    refreshed = ', '.join(f"{s} {e['refreshed_at'][:10]}" for s, e in sorted(manifest.items()))
     data = {
         'table_name': 'intel_state_priorities',
         'dataset_label': 'State Priority Occupations',
@@ -57,25 +94,13 @@ def supabase_update_freshness(records_loaded, states_count):
         'refresh_method': 'scrape',
         'citation_text': 'State workforce board in-demand occupation designations under WIOA, PY2024-2027',
         'citation_url': 'https://wioaplans.dol.gov',
-        'coverage_notes': f'{states_count} states with in-demand occupation lists',
+        'coverage_notes': f'{len(manifest)} states with in-demand occupation lists (refreshed: {refreshed})',
         'known_limitations': 'States update lists on different cycles; some lists are regional, not statewide; SOC code matching is approximate for some states',
     }
-    # Try upsert first
-    upsert_url = f"{SUPABASE_URL}/rest/v1/intel_data_freshness"
-    upsert_headers = dict(headers)
-    upsert_headers['Prefer'] = 'resolution=merge-duplicates'
-    req = urllib.request.Request(upsert_url, data=json.dumps(data).encode(), headers=upsert_headers, method='POST')
-    try:
-        with urllib.request.urlopen(req) as resp:
-            pass
-    except:
-        # Fallback to PATCH
-        req = urllib.request.Request(url, data=json.dumps(data).encode(), headers=headers, method='PATCH')
-        try:
-            with urllib.request.urlopen(req) as resp:
-                pass
-        except:
-            pass
+    # Try upsert first, fall back to PATCH
+    if supabase.request('intel_data_freshness', method='POST', data=data, prefer='resolution=merge-duplicates') is None:
+        supabase.request('intel_data_freshness', method='PATCH', data=data,
+                         params={'table_name': 'eq.intel_state_priorities'})
 
 # SOC code lookup for common occupations
 SOC_LOOKUP = {
@@ -132,129 +157,282 @@ SOC_LOOKUP = {
     'health technologists': '29-2099',
 }
 
-def lookup_soc(title):
-    t = title.lower()
-    for key, soc in SOC_LOOKUP.items():
-        if key in t:
-            return soc
-    return None
+DEFAULT_CACHE_DIR = os.path.expanduser('~/.cache/state-priorities')
+TABLE = 'intel_state_priorities'
+# The table's natural key, ordered for row_delta.delete_keys() (in.() on occupation_title)
+PRIORITY_KEY = ('state', 'effective_year', 'occupation_title')
 
-def classify_sector(title):
-    t = title.lower()
-    if any(w in t for w in ['nurse', 'medical', 'health', 'pharma', 'therapy', 'respiratory', 'surgical', 'sonograph', 'emt', 'paramedic', 'radiologic']):
-        return 'Healthcare & Biosciences'
-    if any(w in t for w in ['software', 'computer', 'network', 'information security', 'programmer', 'analyst', 'it ']):
-        return 'Information Technology'
-    if any(w in t for w in ['carpenter', 'electrician', 'plumber', 'pipefitter', 'power-line', 'drafter', 'civil eng', 'electrical eng']):
-        return 'Construction & Engineering'
-    if any(w in t for w in ['mechanic', 'welder', 'welding', 'machinist', 'cnc', 'millwright', 'tool & die', 'maintenance', 'wind turbine', 'manufacturing']):
-        return 'Advanced Manufacturing'
-    if any(w in t for w in ['truck', 'driver', 'cdl', 'logistics', 'shipping']):
-        return 'Transportation & Logistics'
-    return 'Other'
+def code_titles(rows, matcher, sectors, state, fuzzy=0.0):
+    """Fill in each row's soc_code and sector from its occupation title; returns the SocMatch (or None) per row"""
+    titles = [r['occupation_title'] for r in rows]
+    matches = matcher.match_many(titles, state, fuzzy)
+    soc_codes = [m.soc_code if m else None for m in matches]
+    for r, soc, sector in zip(rows, soc_codes, sectors.classify_many(titles, soc_codes)):
+        r['soc_code'] = soc
+        r['sector'] = sector
+    return matches
 
+def report_matches(state, rows, matches, report=None):
+    """Print how titles were coded (by rule source) and append them to the --soc-report CSV"""
+    by_source = {}
+    for m in matches:
+        source = m.source.split(':')[0] if m else 'unmatched'
+        by_source[source] = by_source.get(source, 0) + 1
+    print("  SOC codes: " + ', '.join(f"{c} {s}" for s, c in sorted(by_source.items(), key=lambda x: -x[1])))
+    if report:
+        new = not os.path.exists(report)
+        with open(report, 'a', newline='') as f:
+            w = csv.writer(f)
+            if new:
+                w.writerow(['state', 'occupation_title', 'soc_code', 'rule', 'source', 'score'])
+            for r, m in zip(rows, matches):
+                w.writerow([state, r['occupation_title'], *(m or ('', '', 'unmatched', ''))])
 
-def parse_iowa_pdf():
-    """Parse Iowa's Future Ready High Demand list"""
-    import subprocess
-    result = subprocess.run(['pdftotext', '-layout', '/tmp/iowa_high_demand.pdf', '-'], capture_output=True, text=True)
-    text = result.stdout
-    
-    rows = []
-    # Parse the annual salary section (page 2, more precise)
-    # Pattern: "    Occupation Title ($XX,XXX)"
-    pattern = re.compile(r'^\s{4}(.+?)\s*\(\$([0-9,]+)\)\s*$', re.MULTILINE)
-    
-    seen = set()
-    for match in pattern.finditer(text):
-        title = match.group(1).strip()
-        wage_str = match.group(2).replace(',', '')
-        wage = int(wage_str)
-        
-        # Skip hourly wages (< $100 means it's hourly section)
-        if wage < 100:
-            continue
-        
-        # Deduplicate
-        if title in seen:
-            continue
-        seen.add(title)
-        
-        # Calculate hourly from annual (÷ 2080)
-        hourly = round(wage / 2080, 2)
-        
-        rows.append({
-            'state': 'IA',
-            'occupation_title': title,
-            'soc_code': lookup_soc(title),
-            'sector': classify_sector(title),
-            'priority_level': 'high_demand',
-            'designation_source': 'future_ready_iowa',
-            'scholarship_eligible': True,
-            'wioa_fundable': True,
-            'etpl_required': False,
-            'entry_hourly_wage': hourly,
-            'entry_annual_salary': wage,
-            'effective_year': '2026-2027',
-            'plan_cycle': 'AY2026-2027',
-            'source_url': 'https://workforce.iowa.gov/media/1999/download?inline',
-            'source_document': 'Iowa Last-Dollar Scholarship High Demand Occupations, Academic Year 26-27',
-            'last_verified': '2026-02-22T00:00:00Z',
-            'verified_by': 'cassidy',
-        })
-    
-    return rows
+# Source document per state (or regional board); --sources adds or replaces
+# entries. local_path is read when the document couldn't be fetched.
+STATE_SOURCES = [
+    {'state': 'IA', 'url': 'https://workforce.iowa.gov/media/1999/download?inline',
+     'source_name': 'Future Ready Iowa High Demand List', 'local_path': '/tmp/iowa_high_demand.pdf'},
+]
 
 
-def fetch_state_wioa_priorities(state, url, source_name):
-    """Generic fetcher for state WIOA in-demand lists (web pages)"""
-    try:
-        req = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0'})
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            html = resp.read().decode('utf-8', errors='replace')
-        return html
-    except Exception as e:
-        print(f"  ✗ Failed to fetch {state}: {e}")
-        return None
+def load_sources(path=None):
+    """STATE_SOURCES, with entries from a state, url, source_name CSV replacing those of the same state"""
+    sources = {src['state']: src for src in STATE_SOURCES}
+    if path:
+        with open(path, newline='') as f:
+            for r in csv.DictReader(f):
+                state = (r.get('state') or '').strip().upper()
+                url = (r.get('url') or '').strip()
+                if state and url:
+                    sources[state] = {'state': state, 'url': url, 'source_name': (r.get('source_name') or '').strip()}
+    return list(sources.values())
 
 
-def main():
-    print("🏛️ State Priority Occupations Ingestion\n")
-    
-    total_inserted = 0
-    states_loaded = 0
-    
-    # ── Iowa ──────────────────────────────────────────
-    print("📍 Iowa (Future Ready Iowa High Demand List)...")
-    iowa_rows = parse_iowa_pdf()
-    print(f"  {len(iowa_rows)} occupations parsed")
-    
-    if iowa_rows:
-        if supabase_upsert('intel_state_priorities', iowa_rows):
-            total_inserted += len(iowa_rows)
-            states_loaded += 1
-            print(f"  ✅ Iowa loaded\n")
-            
-            # Show by sector
-            sectors = {}
-            for r in iowa_rows:
-                s = r['sector']
-                sectors[s] = sectors.get(s, 0) + 1
-            for s, c in sorted(sectors.items(), key=lambda x: -x[1]):
-                print(f"    {s}: {c} occupations")
-    
-    # ── Other states via web scraping ─────────────────
-    # Each state publishes their list differently. Let me add the states
-    # that have easily parseable web pages.
-    
-    # We'll use AI extraction for complex pages in future passes.
-    # For now, seed with Iowa as the model.
+def fetch_sources(sources, fetcher):
+    """Fetch every state's source document concurrently; returns {state: FetchResult}"""
+    results = fetcher.fetch_all([src['url'] for src in sources])
+    by_state = {src['state']: results[src['url']] for src in sources}
+    counts = {}
+    for r in results.values():
+        counts[r.status] = counts.get(r.status, 0) + 1
+    print(f"📥 {len(results)} source document(s): " + ', '.join(f"{c} {s.replace('_', ' ')}" for s, c in sorted(counts.items())))
+    for state, r in by_state.items():
+        if r.status == 'failed':
+            kept = ' (using last cached copy)' if r.path else ''
+            print(f"  ✗ {state}: {r.url}: {r.error}{kept}")
+    return by_state
+
+
+# ── Upload ────────────────────────────────────────────
+def upload_state(supabase, state, rows, args, metrics):
+    """Upsert one state's rows; with --incremental only inserted/updated ones, deleting removed ones.
+
+    Returns (rows sent, True when the table now holds exactly these rows).
+    """
+    fp_path = row_delta.store_path(args.cache_dir, SUPABASE_URL, TABLE, state)
+    previous = row_delta.load_local(fp_path) if args.incremental else None
+    upload_rows, current, stale = rows, None, []
+    if previous is not None:
+        upload_rows, current, stale = row_delta.diff(rows, previous, PRIORITY_KEY)
+        inserted = sum(row_delta.row_key(r, PRIORITY_KEY) not in previous for r in upload_rows)
+        print(f"  🔁 delta: {inserted} inserted, {len(upload_rows) - inserted} updated, "
+              f"{len(rows) - len(upload_rows)} unchanged, {len(stale)} removed")
+    elif args.incremental:
+        print(f"  ⚠ No saved {state} fingerprints ({fp_path}); sending every row")
     
-    print(f"\n🎯 Done! {total_inserted} priority occupations across {states_loaded} state(s)")
+    failed = []
+    if upload_rows:
+        report = supabase_upsert(supabase, TABLE, upload_rows, metrics, args.cache_dir, state)
+        for f in report.failed:
+            failed.extend(upload_rows[f['first_row']:f['first_row'] + f['rows']])
+    undeleted = []
+    if stale:
+        with metrics.stage('delete_removed', state, rows=len(stale)):
+            undeleted = row_delta.delete_keys(supabase, TABLE, stale, PRIORITY_KEY)
+        print(f"  🗑  Deleted {len(stale) - len(undeleted)} rows no longer listed"
+              + (f" ({len(undeleted)} failed)" if undeleted else ''))
     
-    # Update freshness
-    supabase_update_freshness(total_inserted, states_loaded)
-    print("✅ Freshness table updated")
+    # Remember what the table holds: failed rows keep their old fingerprint
+    # (so the next run retries them), rows not deleted stay
+    if current is None:
+        current = {row_delta.row_key(r, PRIORITY_KEY): row_delta.fingerprint(r) for r in rows}
+    for r in failed:
+        k = row_delta.row_key(r, PRIORITY_KEY)
+        if previous and k in previous:
+            current[k] = previous[k]
+        else:
+            del current[k]
+    for k in undeleted:
+        current[k] = previous[k]
+    row_delta.save_local(fp_path, current)
+    return len(upload_rows) - len(failed), not failed and not undeleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest state WIOA priority occupation lists into intel_state_priorities')
+    parser.add_argument('--metrics-dir', default=ingest_metrics.DEFAULT_DIR,
+                        help=f'where the per-run JSON stage metrics are written (default: {ingest_metrics.DEFAULT_DIR})')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'where fetched documents, their extracted text and compiled SOC matchers are cached (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--sources', help='CSV of state, url, source_name documents to fetch (replacing the built-in entry for a state)')
+    parser.add_argument('--fetch-concurrency', type=int, default=8, help='source documents fetched at once (default: 8)')
+    parser.add_argument('--per-host', type=int, default=1, help='requests in flight to one host at a time (default: 1)')
+    parser.add_argument('--host-interval', type=float, default=1.0,
+                        help='minimum seconds between requests to one host (default: 1.0)')
+    parser.add_argument('--offline', action='store_true', help="don't fetch; use the cached source documents")
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='processes extracting and parsing documents (default: one per CPU, at most one per document)')
+    parser.add_argument('--soc-taxonomy',
+                        help='SOC taxonomy file (BLS soc_2018_definitions or O*NET Occupation Data; xlsx/csv/tsv) whose titles are matched too')
+    parser.add_argument('--soc-aliases',
+                        help='CSV of state, alias, soc_code title aliases (blank or * state = all states)')
+    parser.add_argument('--soc-fuzzy', type=float, default=0.0, metavar='MIN_SCORE',
+                        help='code titles no phrase matches by word overlap scoring at least this (0-1; default: off)')
+    parser.add_argument('--soc-report', help='append how each title was coded (rule, source, score) to this CSV')
+    parser.add_argument('--sector-rules', help='JSON sector rule table to use instead of sector_rules.DEFAULT_RULES')
+    parser.add_argument('--snapshot-dir', default=soc_snapshot.DEFAULT_DIR,
+                        help=f'where the SOC × state snapshot of {TABLE} is written (default: {soc_snapshot.DEFAULT_DIR})')
+    parser.add_argument('--no-snapshot', action='store_true', help="don't write the snapshot")
+    parser.add_argument('--incremental', action='store_true',
+                        help='skip states whose document and rules are unchanged since the last run; for the rest '
+                             'upsert only inserted/updated rows and delete removed ones')
+    args = parser.parse_args()
+    metrics = RunMetrics('state-priorities', vars(args))
+    supabase = SupabaseClient(SUPABASE_URL, SUPABASE_KEY)
+    try:
+        
+        print("🏛️ State Priority Occupations Ingestion\n")
+        
+        with metrics.stage('load_rules'):
+            matcher = load_matcher(SOC_LOOKUP, args.soc_taxonomy, args.soc_aliases, args.cache_dir)
+            classifier = load_sector_rules(args.sector_rules)
+        print(f"🔎 SOC matcher: {len(matcher.rules)} rules")
+        if args.soc_report and os.path.exists(args.soc_report):
+            os.remove(args.soc_report)
+        
+        sources = load_sources(args.sources)
+        fetcher = SourceFetcher(os.path.join(args.cache_dir, 'http'), args.fetch_concurrency, args.per_host,
+                                args.host_interval, offline=args.offline)
+        with metrics.stage('fetch', rows=len(sources)):
+            fetched = fetch_sources(sources, fetcher)
+        
+        # What each state's last successful load left in the table: its source
+        # fingerprint (document + parsing/coding rules), row count and date
+        manifest_path = row_delta.store_path(args.cache_dir, SUPABASE_URL, TABLE, 'sources')
+        manifest = row_delta.load_local(manifest_path) or {}
+        rules = row_delta.fingerprint([matcher.digest, classifier.table, args.soc_fuzzy, file_digest(state_parsers.__file__)])
+        
+        # ── Extract and parse, one process per document ───
+        docs, fingerprints, skipped = [], {}, []
+        for src in sources:
+            state, result = src['state'], fetched[src['state']]
+            path, sha256 = result.path, result.sha256
+            if not path and src.get('local_path') and os.path.exists(src['local_path']):
+                path, sha256 = src['local_path'], file_digest(src['local_path'])
+            if state not in PARSERS:
+                print(f"  ⚠ {state}: no parser registered; skipped")
+            elif not path:
+                print(f"  ✗ {state}: no document to parse; skipped")
+            else:
+                fingerprints[state] = row_delta.fingerprint([sha256, rules])
+                if args.incremental and manifest.get(state, {}).get('source') == fingerprints[state]:
+                    skipped.append(state)
+                else:
+                    docs.append((src, path, sha256, os.path.join(args.cache_dir, 'text')))
+        if skipped:
+            print(f"⏭  Unchanged since their last load, skipped: {', '.join(skipped)}")
+        names = {src['state']: src['source_name'] for src in sources}
+        
+        total_inserted = 0
+        states_loaded = 0
+        incomplete = []  # states whose rows didn't all land
+        snapshot_rows = []  # rows of every state loaded completely, for the snapshot
+        
+        def load_state(state, rows):
+            nonlocal total_inserted, states_loaded
+            print(f"\n📍 {state} ({names[state]})...")
+            print(f"  {len(rows)} occupations parsed")
+            with metrics.stage('classify', state, len(rows)):
+                matches = code_titles(rows, matcher, classifier, state, args.soc_fuzzy)
+            report_matches(state, rows, matches, args.soc_report)
+            if not rows:
+                return
+            sent, complete = upload_state(supabase, state, rows, args, metrics)
+            total_inserted += sent
+            if complete:
+                states_loaded += 1
+                manifest[state] = {'source': fingerprints[state], 'records': len(rows),
+                                   'refreshed_at': datetime.now().isoformat()}
+                snapshot_rows.extend(rows)
+                print(f"  ✅ {state} loaded\n")
+        
+                # Show by sector
+                sectors = {}
+                for r in rows:
+                    s = r['sector']
+                    sectors[s] = sectors.get(s, 0) + 1
+                for s, c in sorted(sectors.items(), key=lambda x: -x[1]):
+                    print(f"    {s}: {c} occupations")
+            else:
+                incomplete.append(state)
+        
+        jobs = min(args.jobs or os.cpu_count() or 1, len(docs))
+        if jobs <= 1:
+            for doc in docs:
+                try:
+                    state, rows, stages = parse_document(doc)
+                except Exception as e:
+                    print(f"  ✗ {doc[0]['state']}: {e!r}; skipped")
+                    continue
+                metrics.extend(stages)
+                load_state(state, rows)
+        else:
+            print(f"📄 Parsing {len(docs)} documents in {jobs} processes")
+            # States are classified and uploaded as their documents finish, while the rest parse
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(parse_document, doc): doc[0]['state'] for doc in docs}
+                for future in as_completed(futures):
+                    try:
+                        state, rows, stages = future.result()
+                    except Exception as e:
+                        print(f"  ✗ {futures[future]}: {e!r}; skipped")
+                        continue
+                    metrics.extend(stages)
+                    load_state(state, rows)
+        
+        print(f"\n🎯 Done! {total_inserted} priority occupations upserted across {states_loaded} state(s)"
+              + (f", {len(skipped)} unchanged state(s) skipped" if skipped else ''))
+        if incomplete:
+            print(f"  ✗ Not fully loaded (retried by the next run): {', '.join(sorted(incomplete))}")
+        row_delta.save_local(manifest_path, manifest)
+        
+        # Update freshness
+        if states_loaded:
+            with metrics.stage('freshness_update'):
+                supabase_update_freshness(supabase, manifest)
+            print("✅ Freshness table updated")
+        
+            # Snapshot: this run's states, plus the previous snapshot's rows of the others
+            if not args.no_snapshot:
+                if skipped and soc_snapshot.current(args.snapshot_dir, TABLE) is None:
+                    print(f"  ⚠ No previous snapshot to carry {', '.join(skipped)} over from; "
+                          f"run once without --incremental for a complete one")
+                with metrics.stage('snapshot', rows=len(snapshot_rows)):
+                    version = soc_snapshot.write_snapshot(args.snapshot_dir, TABLE, snapshot_rows, 'state',
+                                                          ('effective_year', 'occupation_title'))
+                    stamped = soc_snapshot.stamp_freshness(supabase, TABLE, version)
+                print(f"🗂  Snapshot {version} → {args.snapshot_dir}"
+                      + ('' if stamped else ' (⚠ not stamped into intel_data_freshness; is snapshot_version migrated?)'))
+        else:
+            print("✅ No state was refreshed; freshness and snapshot left as is")
+        
+        print(f"\n{metrics.summary()}")
+        print(f"   Metrics → {metrics.write(args.metrics_dir)}")
+        if incomplete:
+            sys.exit(1)
+    finally:
+        supabase.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,141 @@
+"""
+Per-state parsers for state priority occupation documents
+Each state's in-demand list comes in its own layout, so each state gets a
+parser, registered by state code:
+
+    @register('IA')
+    def parse_iowa(pages, source):
+        for page in pages:          # text of one page at a time
+            ...
+            yield row
+
+parse_document() is the process-pool worker state-priorities.py runs per
+document. It turns the fetched file into text once — `pdftotext -layout`
+for PDFs, decoded as-is for anything else — and caches that text under
+<text_dir>/<sha256 of the file>.txt, so an unchanged document is never
+extracted again. Pages are then streamed from the cached text (split on
+pdftotext's form feeds) through the state's parser, so a several-hundred-
+page state plan is never held in memory as one string.
+"""
+
+import os
+import re
+import subprocess
+
+from ingest_metrics import RunMetrics
+from file_hash import file_digest
+
+PDF_MAGIC = b'%PDF'
+PAGE_BREAK = '\f'
+CHUNK = 1 << 16
+
+PARSERS = {}
+
+
+def register(state):
+    def add(parser):
+        PARSERS[state] = parser
+        return parser
+    return add
+
+
+def is_pdf(path):
+    with open(path, 'rb') as f:
+        return f.read(4) == PDF_MAGIC
+
+
+def extract_text(path, text_path):
+    """Write the document's text to text_path (atomically). Returns the page count."""
+    tmp = f'{text_path}.{os.getpid()}.tmp'
+    try:
+        if is_pdf(path):
+            result = subprocess.run(['pdftotext', '-layout', path, tmp], capture_output=True, text=True)
+            if result.returncode:
+                raise RuntimeError(f'pdftotext failed on {path}: {result.stderr.strip()}')
+        else:
+            with open(path, 'rb') as src, open(tmp, 'w', encoding='utf-8') as dst:
+                dst.write(src.read().decode('utf-8', errors='replace').replace(PAGE_BREAK, ' '))
+        with open(tmp, encoding='utf-8') as f:
+            pages = sum(chunk.count(PAGE_BREAK) for chunk in iter(lambda: f.read(CHUNK), ''))
+        os.replace(tmp, text_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return max(pages, 1)
+
+
+def iter_pages(f):
+    """Yield the pages of an open text file one at a time, split on form feeds."""
+    buf = ''
+    for chunk in iter(lambda: f.read(CHUNK), ''):
+        buf += chunk
+        *pages, buf = buf.split(PAGE_BREAK)
+        yield from pages
+    if buf:
+        yield buf
+
+
+def parse_document(job):
+    """Worker: extract (or reuse the cached text of) one state's document and parse it.
+
+    job is (source, path, sha256, text_dir); returns (state, rows, stages measured in the worker).
+    """
+    source, path, sha256, text_dir = job
+    state = source['state']
+    metrics = RunMetrics(None)
+    sha256 = sha256 or file_digest(path)
+    text_path = os.path.join(text_dir, f'{sha256}.txt')
+    if not os.path.exists(text_path):
+        os.makedirs(text_dir, exist_ok=True)
+        with metrics.stage('pdf_extract', state) as stage:
+            stage['rows'] = extract_text(path, text_path)
+    with metrics.stage('parse', state) as stage:
+        with open(text_path, encoding='utf-8') as f:
+            rows = list(PARSERS[state](iter_pages(f), source))
+        stage['rows'] = len(rows)
+    return state, rows, metrics.stages
+
+
+# ── Iowa ──────────────────────────────────────────────
+# Pattern: "    Occupation Title ($XX,XXX)"
+IOWA_LINE = re.compile(r'^\s{4}(.+?)\s*\(\$([0-9,]+)\)\s*$', re.MULTILINE)
+
+
+@register('IA')
+def parse_iowa(pages, source):
+    """Iowa's Future Ready High Demand list"""
+    seen = set()
+    for page in pages:
+        # The annual salary section (page 2) is the more precise one
+        for match in IOWA_LINE.finditer(page):
+            title = match.group(1).strip()
+            wage = int(match.group(2).replace(',', ''))
+
+            # Skip hourly wages (< $100 means it's hourly section)
+            if wage < 100:
+                continue
+
+            # Deduplicate
+            if title in seen:
+                continue
+            seen.add(title)
+
+            yield {
+                'state': 'IA',
+                'occupation_title': title,
+                'soc_code': None,
+                'sector': None,
+                'priority_level': 'high_demand',
+                'designation_source': 'future_ready_iowa',
+                'scholarship_eligible': True,
+                'wioa_fundable': True,
+                'etpl_required': False,
+                'entry_hourly_wage': round(wage / 2080, 2),  # annual ÷ 2080
+                'entry_annual_salary': wage,
+                'effective_year': '2026-2027',
+                'plan_cycle': 'AY2026-2027',
+                'source_url': 'https://workforce.iowa.gov/media/1999/download?inline',
+                'source_document': 'Iowa Last-Dollar Scholarship High Demand Occupations, Academic Year 26-27',
+                'last_verified': '2026-02-22T00:00:00Z',
+                'verified_by': 'cassidy',
+            }
@@ -0,0 +1,259 @@
+"""
+Supabase (PostgREST) REST client for the Python ingest scripts
+Shared by h1b-lca.py and state-priorities.py:
+
+  - keep-alive HTTP(S) connections, pooled and reused across requests
+  - bulk upserts sent as concurrent batches (bounded number in flight),
+    cut by encoded payload size rather than a fixed row count, and split
+    further if the server answers 413
+  - retries with exponential backoff (honouring Retry-After) on 429/5xx
+    and dropped connections
+  - an UpsertReport of what was written and which batches failed,
+    instead of printing an error and moving on
+
+Only the base URL and key are needed, so it runs unchanged against a
+local stand-in PostgREST server.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import threading
+import http.client
+import urllib.parse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpsertReport:
+    """Outcome of SupabaseClient.upsert()."""
+
+    def __init__(self, table):
+        self.table = table
+        self.rows_sent = 0
+        self.batches_sent = 0
+        self.retries = 0
+        self.failed = []  # {'first_row', 'rows', 'status', 'error', 'body'}
+        self.latencies = []  # seconds per batch request, retries included
+        self.elapsed = 0.0
+
+    @property
+    def rows_failed(self):
+        return sum(f['rows'] for f in self.failed)
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def summary(self):
+        rate = self.rows_sent / self.elapsed if self.elapsed else 0
+        lines = [f"{self.rows_sent:,} rows in {self.batches_sent:,} batches → {self.table} "
+                 f"({self.elapsed:.1f}s, {rate:,.0f} rows/s, {self.retries} retries)"]
+        if self.failed:
+            lines.append(f"{len(self.failed)} batches ({self.rows_failed:,} rows) failed:")
+            for f in self.failed:
+                lines.append(f"  rows {f['first_row']:,}-{f['first_row'] + f['rows'] - 1:,}: "
+                             f"{f['status'] or 'no response'} {f['error'][:200]}")
+        return '\n'.join(lines)
+
+    def write(self, path):
+        """Save the failed batches, rows included, so they can be replayed."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as fh:
+            json.dump({
+                'table': self.table,
+                'created_at': datetime.now().isoformat(),
+                'rows_sent': self.rows_sent,
+                'failed': [{**{k: v for k, v in f.items() if k != 'body'}, 'payload': json.loads(f['body'])}
+                           for f in self.failed],
+            }, fh, indent=1)
+        return path
+
+
+class SupabaseClient:
+    def __init__(self, url, key, concurrency=4, retries=5, backoff=0.5, timeout=60):
+        parts = urllib.parse.urlsplit(url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.netloc
+        self.prefix = parts.path.rstrip('/') + '/rest/v1/'
+        self.key = key
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._pool = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    # ── connections ───────────────────────────────────
+    def _checkout(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            return cls(self.host, timeout=self.timeout)
+
+    def _checkin(self, conn):
+        # A closed connection reconnects on its next request, so keep it either way
+        self._pool.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def headers(self, prefer=None):
+        return {
+            'apikey': self.key,
+            'Authorization': f'Bearer {self.key}',
+            'Content-Type': 'application/json',
+            'Prefer': prefer or 'return=minimal',
+        }
+
+    def send(self, method, path, body=None, headers=None):
+        """One request on a pooled connection, retried on 429/5xx and connection errors.
+
+        Returns (status, response body, retries used); status is None when the
+        server never answered.
+        """
+        status, data = None, b''
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            conn = self._checkout()
+            try:
+                conn.request(method, path, body=body, headers=headers or self.headers())
+                resp = conn.getresponse()
+                status, data = resp.status, resp.read()
+                retry_after = resp.getheader('Retry-After')
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                status, data = None, str(e).encode()
+            finally:
+                self._checkin(conn)
+            if status is not None and status not in RETRY_STATUS:
+                return status, data, attempt
+            if attempt < self.retries:
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                time.sleep(delay)
+        return status, data, self.retries
+
+    def path(self, table, params=None):
+        path = self.prefix + table
+        if params:
+            path += '?' + urllib.parse.urlencode(params)
+        return path
+
+    def request(self, table, method='GET', data=None, params=None, prefer=None):
+        """Single REST call. Returns the decoded JSON body (or True when empty), None on error."""
+        body = json.dumps(data).encode() if data is not None else None
+        status, resp, _ = self.send(method, self.path(table, params), body, self.headers(prefer))
+        if status is None or status >= 300:
+            print(f"  ✗ Supabase error: {status or 'no response'} {resp.decode(errors='replace')[:200]}")
+            return None
+        return json.loads(resp) if resp.strip() else True
+
+    def select(self, table, params=None, order=None, page_size=1000):
+        """All rows matching params (PostgREST filters), fetched page by page; None on error."""
+        rows = []
+        while True:
+            page = self.request(table, params={**(params or {}), **({'order': order} if order else {}),
+                                               'limit': page_size, 'offset': len(rows)})
+            if page is None:
+                return None
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+
+    # ── bulk upsert ───────────────────────────────────
+    def upsert(self, table, rows, batch_bytes=512 * 1024, max_batch_rows=1000, progress=None, acked=None):
+        """Upsert rows (merge-duplicates) in concurrent byte-sized batches. Returns an UpsertReport.
+
+        progress(rows_sent, rows_failed) is called from this thread after each
+        batch, and acked(first_row, rows) for each batch the server accepted.
+        """
+        report = UpsertReport(table)
+        state = {'batch_bytes': batch_bytes}
+        start = time.time()
+
+        def batches():
+            items, size, first = [], 2, 0
+            for i, row in enumerate(rows):
+                item = json.dumps(row).encode()
+                if items and (size + len(item) + 1 > state['batch_bytes'] or len(items) >= max_batch_rows):
+                    yield first, items
+                    items, size, first = [], 2, i
+                items.append(item)
+                size += len(item) + 1
+            if items:
+                yield first, items
+
+        def finish(future):
+            for outcome in future.result():
+                report.retries += outcome['retries']
+                report.latencies.append(outcome['latency'])
+                if 'failed' in outcome:
+                    report.failed.append(outcome['failed'])
+                elif outcome['rows']:
+                    report.rows_sent += outcome['rows']
+                    report.batches_sent += 1
+                    if acked:
+                        acked(outcome['first_row'], outcome['rows'])
+            if progress:
+                progress(report.rows_sent, report.rows_failed)
+
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            in_flight = set()
+            for first, items in batches():
+                # Keep at most two batches per connection encoded and queued
+                if len(in_flight) >= 2 * self.concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        finish(f)
+                in_flight.add(pool.submit(self._post_batch, table, first, items, state))
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for f in done:
+                    finish(f)
+
+        report.failed.sort(key=lambda f: f['first_row'])
+        report.elapsed = time.time() - start
+        return report
+
+    def _post_batch(self, table, first, items, state):
+        """POST one batch (rows first.. of the input). Returns a list of outcome dicts.
+
+        On 413 the batch is split in half and the byte budget for the
+        batches still to be cut shrinks to match.
+        """
+        body = b'[' + b','.join(items) + b']'
+        start = time.perf_counter()
+        status, resp, retries = self.send('POST', self.path(table), body,
+                                          self.headers('resolution=merge-duplicates,return=minimal'))
+        latency = time.perf_counter() - start
+        if status == 413 and len(items) > 1:
+            with self._lock:
+                state['batch_bytes'] = min(state['batch_bytes'], len(body) // 2)
+            mid = len(items) // 2
+            return ([{'rows': 0, 'retries': retries, 'latency': latency}]
+                    + self._post_batch(table, first, items[:mid], state)
+                    + self._post_batch(table, first + mid, items[mid:], state))
+        if status is not None and status < 300:
+            return [{'first_row': first, 'rows': len(items), 'retries': retries, 'latency': latency}]
+        return [{'retries': retries, 'latency': latency, 'failed': {
+            'first_row': first, 'rows': len(items), 'status': status,
+            'error': resp.decode(errors='replace'), 'body': body,
+        }}]
@@ -0,0 +1,193 @@
+"""
+Tests for h1b-lca.py --resume after an interrupted upload
+Runs the script against a stand-in PostgREST server (http.server on a free
+port) that stores intel_h1b_demand rows by natural key and records the
+rows of every POST. The stub can hold POSTs past the first N (the run is
+then killed mid-upload) or reject them with 400 (the run ends with failed
+batches); the resumed run must send exactly the rows the interrupted run's
+upload log doesn't acknowledge.
+
+Run: python -m pytest scripts/ingest/test_h1b_resume.py
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import subprocess
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import lca_synth
+import lca_checkpoint
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'h1b-lca.py')
+FISCAL_YEAR = 'FY2025'
+SYNTH = {'socs': 40, 'states': 10, 'employers': 200, 'counties': 40, 'seed': 11}
+
+
+def natural_key(row):
+    return row['soc_code'], row['state'], row['fiscal_year']
+
+
+class StubPostgREST(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.rows = {}          # natural key → row
+        self.posts = []         # natural keys of each stored POST
+        self.accept = None      # POSTs still to store before hold/reject kicks in (None = all)
+        self.hold = False       # past accept: keep the request open until released
+        self.holding = 0
+        self.released = threading.Event()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def handle_error(self, request, client_address):
+        pass  # the held request's client was killed
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.reply(200, b'[]')
+
+    def do_PATCH(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.reply(204)
+
+    def do_POST(self):
+        rows = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        stub = self.server
+        with stub.lock:
+            refuse = stub.accept is not None and stub.accept <= 0
+            if not refuse:
+                for row in rows:
+                    stub.rows[natural_key(row)] = row
+                stub.posts.append([natural_key(r) for r in rows])
+                if stub.accept is not None:
+                    stub.accept -= 1
+            elif stub.hold:
+                stub.holding += 1
+        if not refuse:
+            return self.reply(201)
+        if stub.hold:
+            stub.released.wait(30)
+            return self.reply(503)
+        self.reply(400, b'{"message":"rejected by the test"}')
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubPostgREST()
+        self.tmp = tempfile.mkdtemp(prefix='h1b-resume-test-')
+        self.cache = os.path.join(self.tmp, 'cache')
+        self.env = {**os.environ, 'NEXT_PUBLIC_SUPABASE_URL': self.stub.url, 'SUPABASE_SERVICE_ROLE_KEY': 'test-key'}
+        self.log_path = os.path.join(lca_checkpoint.checkpoint_dir(self.cache, self.stub.url),
+                                     f'{FISCAL_YEAR}.upload.jsonl')
+
+    def tearDown(self):
+        self.stub.released.set()
+        self.stub.shutdown()
+        self.stub.server_close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def lca_file(self, rows):
+        return lca_synth.generate(os.path.join(self.tmp, f'LCA_{FISCAL_YEAR}_Q4.csv'), rows, **SYNTH)
+
+    def command(self, *args):
+        return [sys.executable, SCRIPT, *args, '--cache-dir', self.cache, '--metrics-dir', self.tmp,
+                '--no-snapshot', '--concurrency', '1', '--batch-kb', '4']
+
+    def run_script(self, *args):
+        return subprocess.run(self.command(*args), env=self.env, capture_output=True, text=True, timeout=120)
+
+    def sent_since(self, n):
+        """Natural keys of every row POSTed (and stored) after the first n POSTs."""
+        return [k for post in self.stub.posts[n:] for k in post]
+
+    def built_rows(self):
+        with open(os.path.join(os.path.dirname(self.log_path), f'{FISCAL_YEAR}.rows.json')) as f:
+            saved = json.load(f)
+        return saved['state_rows'] + saved['nat_rows']
+
+    def unacked_keys(self):
+        """Keys of the planned upload rows the checkpoint's upload log doesn't acknowledge."""
+        log = lca_checkpoint.UploadLog(self.log_path)
+        rows = self.built_rows()
+        planned = rows if log.plan['upload'] is None else [rows[i] for i in log.plan['upload']]
+        return sorted(natural_key(r) for i, r in enumerate(planned) if i not in log.acked)
+
+    def test_resume_after_kill_mid_upload(self):
+        path = self.lca_file(3000)
+        self.stub.accept, self.stub.hold = 3, True
+        proc = subprocess.Popen(self.command(path), env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 60
+            # Wait until a batch is held and the three stored ones are in the upload log
+            while not (self.stub.holding and os.path.exists(self.log_path)
+                       and len(lca_checkpoint.UploadLog(self.log_path).acked) == len(self.sent_since(0))):
+                self.assertIsNone(proc.poll(), 'the run ended before the upload was interrupted')
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.05)
+        finally:
+            proc.kill()
+            proc.wait()
+        self.stub.accept, self.stub.hold = None, False
+        self.stub.released.set()
+
+        first = len(self.stub.posts)
+        owed, built = self.unacked_keys(), self.built_rows()
+        self.assertTrue(owed)
+        resumed = self.run_script('--resume')
+        self.assertEqual(resumed.returncode, 0, resumed.stdout[-2000:] + resumed.stderr[-2000:])
+        self.assertEqual(sorted(self.sent_since(first)), owed)
+        self.assertEqual(self.stub.rows, {natural_key(r): r for r in built})
+        self.assertFalse(os.path.exists(self.log_path))
+
+    def test_resume_delta_after_rejected_batches(self):
+        loaded = self.run_script(self.lca_file(2500), '--delta', 'local')
+        self.assertEqual(loaded.returncode, 0, loaded.stdout[-2000:] + loaded.stderr[-2000:])
+        before = dict(self.stub.rows)
+
+        # More rows of the same fiscal year: the delta sends only new or changed rows
+        path = self.lca_file(3000)
+        self.stub.accept = 2
+        partial = self.run_script(path, '--delta', 'local')
+        self.assertEqual(partial.returncode, 1, partial.stdout[-2000:] + partial.stderr[-2000:])
+        self.assertIn('rows failed to upload', partial.stdout)
+        changed = sorted(natural_key(r) for r in self.built_rows() if before.get(natural_key(r)) != r)
+        log = lca_checkpoint.UploadLog(self.log_path)
+        self.assertEqual(len(log.plan['upload']), len(changed))
+        self.assertTrue(0 < len(log.acked) < len(changed))
+
+        self.stub.accept = None
+        first = len(self.stub.posts)
+        owed, built = self.unacked_keys(), self.built_rows()
+        resumed = self.run_script('--resume')
+        self.assertEqual(resumed.returncode, 0, resumed.stdout[-2000:] + resumed.stderr[-2000:])
+        self.assertEqual(sorted(self.sent_since(first)), owed)
+        self.assertEqual(len(owed), len(changed) - len(log.acked))
+        self.assertEqual(self.stub.rows, {**before, **{natural_key(r): r for r in built}})
+
+
+if __name__ == '__main__':
+    unittest.main()
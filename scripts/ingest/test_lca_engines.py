@@ -0,0 +1,144 @@
+"""
+Tests that every LCA aggregation path builds the same rows
+The serial rows engine is the reference; the vectorized engine, sharded
+xlsx scans, merged per-file aggregates and disk-spilled aggregates must
+match it exactly: key order, first-seen titles, medians and quartiles,
+and top-N tie order. The input is a small lca_synth workbook with enough
+employers per key that top-5 lists are cut inside runs of tied counts.
+
+Run: python -m pytest scripts/ingest/test_lca_engines.py
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import importlib.util
+from unittest import mock
+
+import lca_spill
+import lca_synth
+from lca_aggregate import aggregate_rows, build_rows, merge_aggregates
+
+try:
+    import lca_vectorized
+except ImportError:  # numpy missing
+    lca_vectorized = None
+
+FISCAL_YEAR = 'FY2025'
+SYNTH = {'socs': 40, 'states': 10, 'employers': 300, 'counties': 60, 'messy': 0.05, 'hourly_share': 0.1, 'seed': 7}
+
+
+def load_h1b_lca():
+    """h1b-lca.py as a module (registered so shard workers can unpickle its functions)."""
+    if 'h1b_lca' not in sys.modules:
+        # No request is sent; the script only needs the variables to be set
+        os.environ.setdefault('NEXT_PUBLIC_SUPABASE_URL', 'http://127.0.0.1:9')
+        os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', 'test-key')
+        spec = importlib.util.spec_from_file_location('h1b_lca', os.path.join(os.path.dirname(__file__), 'h1b-lca.py'))
+        module = sys.modules['h1b_lca'] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return sys.modules['h1b_lca']
+
+
+class EngineEquivalenceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.h1b = load_h1b_lca()
+        cls.tmp = tempfile.mkdtemp(prefix='lca-engines-test-')
+        cls.path = lca_synth.generate(os.path.join(cls.tmp, 'LCA_FY2025_Q4.xlsx'), 12000, **SYNTH)
+        _, agg, cls.row_count, cls.columns = cls.h1b.scan_workbook(cls.path, 1, encode=True)
+        cls.rows = list(cls.columns.rows())
+        cls.expected = build_rows(agg, FISCAL_YEAR)
+        cls.agg = agg
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def assert_rows(self, rows):
+        state_rows, nat_rows = rows[:2]
+        self.assertEqual(state_rows, self.expected[0])
+        self.assertEqual(nat_rows, self.expected[1])
+
+    def test_input_has_tied_top_lists(self):
+        cut_in_ties = 0
+        for e in self.agg.values():
+            counts = sorted(e['employers'].values(), reverse=True)
+            cut_in_ties += len(counts) > 5 and counts[4] == counts[5]
+        self.assertGreater(cut_in_ties, 50)
+        self.assertGreater(len(self.expected[0]), 100)
+
+    @unittest.skipIf(lca_vectorized is None, 'numpy not installed')
+    def test_vectorized_engine(self):
+        state_rows, nat_rows, row_count, key_count = lca_vectorized.build_rows(
+            self.columns.values, self.columns.codes, FISCAL_YEAR)
+        self.assert_rows((state_rows, nat_rows))
+        self.assertEqual((row_count, key_count), (self.row_count, len(self.agg)))
+
+    @unittest.skipIf(lca_vectorized is None, 'numpy not installed')
+    def test_vectorized_engine_normalized_employers(self):
+        agg, _ = aggregate_rows(self.rows, normalize_employers=True)
+        expected = build_rows(agg, FISCAL_YEAR)
+        rows = lca_vectorized.build_rows(self.columns.values, self.columns.codes, FISCAL_YEAR, normalize_employers=True)
+        self.assertEqual(rows[:2], expected)
+
+    def test_sharded_scan(self):
+        _, agg, row_count, _ = self.h1b.scan_workbook(self.path, 3, encode=False)
+        self.assertEqual(row_count, self.row_count)
+        self.assert_rows(build_rows(agg, FISCAL_YEAR))
+
+    def test_merged_parts(self):
+        parts = [aggregate_rows(self.rows[lo:lo + 4000])[0] for lo in range(0, len(self.rows), 4000)]
+        self.assert_rows(build_rows(merge_aggregates(parts), FISCAL_YEAR))
+
+    def test_spilled(self):
+        agg, row_count = lca_spill.aggregate_rows(iter(self.rows), 96 << 10, self.tmp)
+        self.assertIsInstance(agg, lca_spill.SpilledAggregate)
+        self.assertGreater(len(agg.runs), 2)
+        try:
+            self.assert_rows(agg.build_rows(FISCAL_YEAR))
+        finally:
+            agg.close()
+        self.assertGreater(agg.splits, 0)
+        self.assertEqual(row_count, self.row_count)
+        self.assertEqual(os.listdir(self.tmp), [os.path.basename(self.path)])
+
+    def test_sharded_and_spilled(self):
+        _, agg, _, _ = self.h1b.scan_workbook(self.path, 3, encode=False, budget=96 << 10, spill_dir=self.tmp)
+        self.assertIsInstance(agg, lca_spill.SpilledAggregate)
+        try:
+            self.assert_rows(agg.build_rows(FISCAL_YEAR))
+        finally:
+            agg.close()
+
+    def test_spilled_breakdown(self):
+        expected, _, _ = lca_spill.build_breakdown(iter(self.rows), 'county', FISCAL_YEAR)
+        expected = list(expected)
+        self.assertGreater(len(expected), 100)
+        # Few row files per merge, so the merge takes more than one pass
+        with mock.patch.object(lca_spill, 'FAN_IN', 4):
+            rows, row_count, spills = lca_spill.build_breakdown(iter(self.rows), 'county', FISCAL_YEAR,
+                                                                64 << 10, self.tmp)
+            self.assertGreater(spills, 1)
+            self.assertEqual(list(rows), expected)
+        self.assertEqual(row_count, self.row_count)
+        self.assertEqual(os.listdir(self.tmp), [os.path.basename(self.path)])
+
+    def test_spilled_breakdown_partitions_fit(self):
+        budget = 64 << 10
+        rows = list(lca_spill.breakdown_rows(iter(self.rows), 'employer'))
+        agg, _ = lca_spill.aggregate_rows(iter(rows), budget, self.tmp, by_key=True)
+        try:
+            agg.write_rows(FISCAL_YEAR, national=False)
+        finally:
+            agg.close()
+        self.assertGreater(agg.splits, 0)
+        # Only a single key, one piece per spill at most, may be loaded over the budget
+        biggest_key = max(e['total'] for e in aggregate_rows(rows)[0].values())
+        self.assertLessEqual(agg.largest, max(budget, lca_spill.estimate(len(agg.runs), biggest_key)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+"""
+Tests for source_fetch.SourceFetcher against a stand-in document server
+The stub (http.server on a free port) serves documents with an ETag and/or
+Last-Modified, answers conditional GETs with 304, can fail the next N
+requests with 503, and records the peak number of requests in flight per
+Host header.
+
+Run: python -m pytest scripts/ingest/test_source_fetch.py
+"""
+
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from source_fetch import SourceFetcher, interleave_by_host
+
+LAST_MODIFIED = 'Wed, 01 Oct 2025 00:00:00 GMT'
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.docs = {}          # path → (body, send ETag, send Last-Modified)
+        self.requests = []      # (path, request headers)
+        self.fail_next = 0
+        self.delay = 0.0
+        self.in_flight = {}
+        self.peak = {}
+        self.starts = {}        # Host → request start times
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub, host = self.server, self.headers['Host']
+        with stub.lock:
+            stub.requests.append((self.path, dict(self.headers)))
+            stub.in_flight[host] = stub.in_flight.get(host, 0) + 1
+            stub.peak[host] = max(stub.peak.get(host, 0), stub.in_flight[host])
+            stub.starts.setdefault(host, []).append(time.monotonic())
+            failing = stub.fail_next > 0
+            stub.fail_next -= failing
+        try:
+            if stub.delay:
+                time.sleep(stub.delay)
+            if failing:
+                return self.reply(503, headers=[('Retry-After', '0')])
+            if self.path not in stub.docs:
+                return self.reply(404)
+            body, etag, last_modified = stub.docs[self.path]
+            tag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            validators = ([('ETag', tag)] if etag else []) + ([('Last-Modified', LAST_MODIFIED)] if last_modified else [])
+            if (etag and self.headers.get('If-None-Match') == tag) or \
+                    (not etag and last_modified and self.headers.get('If-Modified-Since') == LAST_MODIFIED):
+                return self.reply(304, headers=validators)
+            self.reply(200, body, validators)
+        finally:
+            with stub.lock:
+                stub.in_flight[host] -= 1
+
+
+class SourceFetcherTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer()
+        self.cache = tempfile.mkdtemp(prefix='source-fetch-test-')
+
+    def tearDown(self):
+        self.stub.shutdown()
+        self.stub.server_close()
+        shutil.rmtree(self.cache, ignore_errors=True)
+
+    def fetcher(self, **options):
+        options = {'interval': 0, 'backoff': 0, 'timeout': 5, **options}
+        return SourceFetcher(self.cache, **options)
+
+    def url(self, path, host='127.0.0.1'):
+        return f'http://{host}:{self.stub.port}{path}'
+
+    def read(self, result):
+        with open(result.path, 'rb') as f:
+            return f.read()
+
+    def test_etag_round_trip(self):
+        self.stub.docs['/a.pdf'] = (b'%PDF first', True, True)
+        fetcher = self.fetcher()
+        first = fetcher.fetch(self.url('/a.pdf'))
+        self.assertEqual((first.status, first.http_status), ('downloaded', 200))
+        self.assertEqual(first.sha256, hashlib.sha256(b'%PDF first').hexdigest())
+
+        again = fetcher.fetch(self.url('/a.pdf'))
+        self.assertEqual((again.status, again.http_status), ('not_modified', 304))
+        self.assertEqual((again.path, again.sha256), (first.path, first.sha256))
+        self.assertEqual(self.read(again), b'%PDF first')
+        headers = self.stub.requests[-1][1]
+        self.assertTrue(headers.get('If-None-Match'))
+        self.assertEqual(headers.get('If-Modified-Since'), LAST_MODIFIED)
+
+        self.stub.docs['/a.pdf'] = (b'%PDF second', True, True)
+        changed = fetcher.fetch(self.url('/a.pdf'))
+        self.assertEqual(changed.status, 'downloaded')
+        self.assertEqual(self.read(changed), b'%PDF second')
+
+    def test_last_modified_round_trip(self):
+        self.stub.docs['/b.html'] = (b'<html>b</html>', False, True)
+        fetcher = self.fetcher()
+        self.assertEqual(fetcher.fetch(self.url('/b.html')).status, 'downloaded')
+        again = fetcher.fetch(self.url('/b.html'))
+        self.assertEqual(again.status, 'not_modified')
+        headers = self.stub.requests[-1][1]
+        self.assertNotIn('If-None-Match', headers)
+        self.assertEqual(headers.get('If-Modified-Since'), LAST_MODIFIED)
+        self.assertEqual(self.read(again), b'<html>b</html>')
+
+    def test_retries_then_falls_back_to_cache(self):
+        self.stub.docs['/c.csv'] = (b'state,title\n', True, False)
+        self.stub.fail_next = 1
+        fetcher = self.fetcher(retries=2)
+        first = fetcher.fetch(self.url('/c.csv'))
+        self.assertEqual(first.status, 'downloaded')
+        self.assertEqual(len(self.stub.requests), 2)
+
+        self.stub.fail_next = 10
+        failed = fetcher.fetch(self.url('/c.csv'))
+        self.assertEqual((failed.status, failed.http_status), ('failed', 503))
+        self.assertEqual(failed.path, first.path)
+        self.assertEqual(self.read(failed), b'state,title\n')
+
+    def test_offline_uses_cache_only(self):
+        self.stub.docs['/d.pdf'] = (b'%PDF d', True, False)
+        self.fetcher().fetch(self.url('/d.pdf'))
+        seen = len(self.stub.requests)
+        offline = self.fetcher(offline=True)
+        self.assertEqual(offline.fetch(self.url('/d.pdf')).status, 'cached')
+        self.assertEqual(offline.fetch(self.url('/missing.pdf')).status, 'failed')
+        self.assertEqual(len(self.stub.requests), seen)
+
+    def test_per_host_limit(self):
+        self.stub.delay = 0.1
+        paths = [f'/doc{i}.pdf' for i in range(6)]
+        for p in paths:
+            self.stub.docs[p] = (p.encode(), True, False)
+        urls = [self.url(p) for p in paths] + [self.url(p, 'localhost') for p in paths]
+        results = self.fetcher(concurrency=8, per_host=2).fetch_all(urls)
+        self.assertEqual(list(results), urls)
+        self.assertTrue(all(r.status == 'downloaded' for r in results.values()))
+        self.assertEqual(self.stub.peak, {f'127.0.0.1:{self.stub.port}': 2, f'localhost:{self.stub.port}': 2})
+
+    def test_host_interval(self):
+        for i in range(4):
+            self.stub.docs[f'/e{i}'] = (b'e', True, False)
+        self.fetcher(concurrency=4, per_host=4, interval=0.1).fetch_all(self.url(f'/e{i}') for i in range(4))
+        starts = self.stub.starts[f'127.0.0.1:{self.stub.port}']
+        gaps = [b - a for a, b in zip(starts, starts[1:])]
+        self.assertTrue(all(g >= 0.09 for g in gaps), gaps)
+
+    def test_interleave_by_host(self):
+        urls = ['http://a/1', 'http://a/2', 'http://a/3', 'http://b/1', 'http://c/1', 'http://b/2']
+        self.assertEqual(interleave_by_host(urls),
+                         ['http://a/1', 'http://b/1', 'http://c/1', 'http://a/2', 'http://b/2', 'http://a/3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
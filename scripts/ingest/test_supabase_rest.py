@@ -0,0 +1,137 @@
+"""
+Tests for supabase_rest.SupabaseClient.upsert against a stand-in PostgREST server
+The stub (http.server on a free port) stores upserted rows by id, can answer
+413 to bodies over a size limit, and can fail the next N POSTs with 503.
+
+Run: python -m pytest scripts/ingest/test_supabase_rest.py
+"""
+
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from supabase_rest import SupabaseClient
+
+
+class StubPostgREST(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.rows = {}
+        self.bodies = []       # sizes of the POST bodies stored
+        self.max_body = None   # 413 above this many bytes
+        self.fail_next = 0     # POSTs still to answer with 503
+        self.reject = False    # answer every POST with 400
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        stub = self.server
+        with stub.lock:
+            if stub.fail_next:
+                stub.fail_next -= 1
+                return self.reply(503, b'{"message":"unavailable"}', [('Retry-After', '0')])
+            if stub.reject:
+                return self.reply(400, b'{"message":"bad row"}')
+            if stub.max_body and len(body) > stub.max_body:
+                return self.reply(413, b'{"message":"payload too large"}')
+            for row in json.loads(body):
+                stub.rows[row['id']] = row
+            stub.bodies.append(len(body))
+        self.reply(201)
+
+
+def make_rows(n):
+    return [{'id': i, 'soc_code': f'15-{1000 + i % 900}', 'state': 'CA', 'note': 'x' * 40} for i in range(n)]
+
+
+class UpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubPostgREST()
+        self.client = SupabaseClient(self.stub.url, 'test-key', concurrency=3, retries=3, backoff=0)
+        self.acked = []
+
+    def tearDown(self):
+        self.client.close()
+        self.stub.shutdown()
+        self.stub.server_close()
+
+    def ack(self, first, n):
+        self.acked.append((first, n))
+
+    def assert_acked_exactly(self, n):
+        covered = sorted(i for first, count in self.acked for i in range(first, first + count))
+        self.assertEqual(covered, list(range(n)))
+
+    def test_batches_land_and_are_acked(self):
+        rows = make_rows(500)
+        report = self.client.upsert('t', rows, batch_bytes=4096, acked=self.ack)
+        self.assertEqual(report.failed, [])
+        self.assertEqual(report.rows_sent, 500)
+        self.assertGreater(report.batches_sent, 1)
+        self.assertEqual(self.stub.rows, {r['id']: r for r in rows})
+        self.assert_acked_exactly(500)
+        self.assertTrue(all(size <= 4096 for size in self.stub.bodies))
+
+    def test_413_splits_batches(self):
+        self.stub.max_body = 3000
+        rows = make_rows(300)
+        report = self.client.upsert('t', rows, batch_bytes=1 << 20, acked=self.ack)
+        self.assertEqual(report.failed, [])
+        self.assertEqual(report.rows_sent, 300)
+        self.assertEqual(len(self.stub.rows), 300)
+        self.assertTrue(all(size <= 3000 for size in self.stub.bodies))
+        self.assert_acked_exactly(300)
+
+    def test_retries_after_5xx(self):
+        self.stub.fail_next = 2
+        rows = make_rows(50)
+        report = self.client.upsert('t', rows, acked=self.ack)
+        self.assertEqual(report.failed, [])
+        self.assertEqual(report.retries, 2)
+        self.assertEqual(len(self.stub.rows), 50)
+        self.assert_acked_exactly(50)
+
+    def test_failed_batches_are_reported_not_acked(self):
+        self.stub.reject = True
+        rows = make_rows(120)
+        report = self.client.upsert('t', rows, batch_bytes=4096, acked=self.ack)
+        self.assertEqual(report.rows_sent, 0)
+        self.assertEqual(report.rows_failed, 120)
+        self.assertTrue(all(f['status'] == 400 for f in report.failed))
+        self.assertEqual(sorted(i for f in report.failed for i in range(f['first_row'], f['first_row'] + f['rows'])),
+                         list(range(120)))
+        self.assertEqual(self.acked, [])
+
+    def test_retries_exhausted(self):
+        self.stub.fail_next = 10
+        report = self.client.upsert('t', make_rows(5), acked=self.ack)
+        self.assertEqual(report.rows_failed, 5)
+        self.assertEqual(report.failed[0]['status'], 503)
+        self.assertEqual(self.acked, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,7 @@
+-- Snapshot version per dataset
+-- The ingest scripts write a versioned SOC × state snapshot file of the
+-- table they load (scripts/ingest/soc_snapshot.py); readers compare this
+-- with the version they have mapped to know when to reload.
+
+ALTER TABLE intel_data_freshness
+  ADD COLUMN IF NOT EXISTS snapshot_version TEXT;   -- e.g. '20261016T120000Z-3f2a9c1b7d4e'
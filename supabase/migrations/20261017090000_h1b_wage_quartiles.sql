@@ -0,0 +1,7 @@
+-- Offered wage quartiles for H-1B demand signals
+-- scripts/ingest/h1b-lca.py computes p25/p75 from the same exact wage
+-- samples as the median (linear interpolation between order statistics).
+
+ALTER TABLE intel_h1b_demand
+  ADD COLUMN IF NOT EXISTS p25_offered_wage INTEGER,   -- 25th percentile wage offered
+  ADD COLUMN IF NOT EXISTS p75_offered_wage INTEGER;   -- 75th percentile wage offered